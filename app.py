@@ -1,14 +1,124 @@
-from flask import Flask, request, render_template
-import numpy as np
-import pandas as pd
+import os
+import threading
+from types import SimpleNamespace
 
-from sklearn.preprocessing import StandardScaler
-from src.pipeline.predict_pipeline import CustomData, PredictPipeline
+from flask import Flask, request, render_template, jsonify, Response, stream_with_context
+
+# Only light modules at import: pandas, scikit-learn and scikit-survival come with the
+# pipelines, imported by load_model() (at startup in preload mode, on the first request in lazy mode)
+from src.metrics import metrics
+from src.instrumentation import profile_request, trace_request
+from src.startup import (
+    StartupConfig, import_heavy_modules, record_first_prediction, startup_phase
+)
 
 application = Flask(__name__)
 
 app = application
 
+startup_config = StartupConfig()
+
+# Median-like patient predicted once after loading (first call costs of the preprocessor and forest)
+WARMUP_PATIENT = dict(
+    BM_BLAST=5.0, WBC=4.0, ANC=2.0, MONOCYTES=0.3, HB=10.0, PLT=150.0, Nmut=3.0,
+    CENTER="CHU", CYTOGENETICS="46,xy[20]",
+    mutations=[
+        dict(GENE="TET2", EFFECT="stop_gained", VAF=0.4),
+        dict(GENE="ASXL1", EFFECT="frameshift_variant", VAF=0.3),
+        dict(GENE="SRSF2", EFFECT="non_synonymous_codon", VAF=0.35),
+    ],
+)
+
+# Patients per /api/v1/predict/batch request (larger cohorts go to /predictbatch, streamed)
+API_MAX_BATCH_SIZE = int(os.environ.get("API_MAX_BATCH_SIZE", "1000"))
+# Patients per JSON body on /predictbatch (files are not limited)
+PREDICTBATCH_MAX_JSON_PATIENTS = int(os.environ.get("PREDICTBATCH_MAX_JSON_PATIENTS", "100000"))
+
+_model_registry = None
+_services = None
+_services_lock = threading.Lock()
+
+
+def load_model():
+    '''
+    Imports the pipelines and loads the model and preprocessor into the process-wide registry.
+    With gunicorn --preload this runs once in the master: the workers inherit the loaded
+    model (copy-on-write) instead of each loading it.
+    '''
+    global _model_registry
+    if _model_registry is not None:
+        return _model_registry
+
+    import_heavy_modules()
+    from src.pipeline.model_registry import get_registry
+    from src.pipeline.predict_pipeline import PredictPipeline, patient_frames
+
+    # Model and preprocessor are loaded once, then hot-reloaded when artifacts change
+    model_registry = get_registry()
+    with startup_phase("model_load"):
+        model_registry.load()
+
+    if startup_config.warmup:
+        with startup_phase("warmup"):
+            PredictPipeline(registry=model_registry).predict(*patient_frames([WARMUP_PATIENT]))
+
+    _model_registry = model_registry
+    return model_registry
+
+
+def get_services():
+    '''
+    Serving objects of this process, built on first use. The prediction cache (SQLite
+    connection) and the micro-batcher (thread) are never created before a fork.
+    '''
+    global _services
+    if _services is None:
+        with _services_lock:
+            if _services is None:
+                _services = _build_services()
+    return _services
+
+
+def _build_services():
+    model_registry = load_model()
+    from src.pipeline.predict_pipeline import PredictPipeline, TIME_HORIZON
+    from src.pipeline.batch_predict_pipeline import BatchPredictPipeline
+    from src.pipeline.explain_pipeline import ExplainPipeline
+    from src.pipeline.micro_batcher import MicroBatcher, MicroBatcherConfig
+    from src.pipeline.inference_pool import InferencePool
+    from src.pipeline.prediction_cache import PredictionCache, PredictionCacheConfig
+
+    # Cache of recent predictions ("memory", "file" to share it between workers, or "none")
+    cache_backend = os.environ.get('PREDICTION_CACHE', 'memory')
+    prediction_cache = None
+    if cache_backend != 'none':
+        prediction_cache = PredictionCache(PredictionCacheConfig(backend=cache_backend))
+
+    predict_pipeline = PredictPipeline(registry=model_registry, cache=prediction_cache)
+
+    # Optional serving mode: concurrent /predictdata requests are coalesced into one forest call
+    micro_batcher = None
+    if os.environ.get('MICRO_BATCHING', '0') == '1':
+        micro_batcher = MicroBatcher(predict_pipeline, MicroBatcherConfig(
+            max_wait_ms=float(os.environ.get('MICRO_BATCH_MAX_WAIT_MS', MicroBatcherConfig.max_wait_ms)),
+            max_batch_size=int(os.environ.get('MICRO_BATCH_MAX_SIZE', MicroBatcherConfig.max_batch_size)),
+            time_horizons=[TIME_HORIZON]
+        ))
+
+    return SimpleNamespace(
+        model_registry=model_registry,
+        predict_pipeline=predict_pipeline,
+        batch_predict_pipeline=BatchPredictPipeline(registry=model_registry),
+        explain_pipeline=ExplainPipeline(registry=model_registry),
+        micro_batcher=micro_batcher,
+        # Bounded threads for the predictions: full pool -> 429, late result -> 504
+        inference_pool=InferencePool(),
+    )
+
+
+if startup_config.mode == "preload":
+    load_model()
+
 ## Route for the home page
 @app.route('/')
 def index():
@@ -19,32 +129,203 @@ def predict_datapoint():
     if request.method == 'GET':
         return render_template('home.html')
     else:
-        data = CustomData(
-            BM_BLAST=float(request.form.get('BM_BLAST')),
-            WBC=float(request.form.get('WBC')),
-            ANC=float(request.form.get('ANC')),
-            MONOCYTES=float(request.form.get('MONOCYTES')),
-            HB=float(request.form.get('HB')),
-            PLT=float(request.form.get('PLT')),
-            Nmut=float(request.form.get('Nmut')), 
-            CENTER=request.form.get('CENTER')       
-        )
-        
-        # Convert to DataFrame (ready for the model)
-        pred_df = data.get_data_as_data_frame()
-        print(pred_df)
-        print("Before Prediction")
-
-        # Launch Prediction
-        predict_pipeline = PredictPipeline()
-        print("Mid Prediction")
-        
-        results = predict_pipeline.predict(pred_df)
-        print("After Prediction")
+        services = get_services()
+        from src.pipeline.api_schema import SchemaError, validate_form
+        from src.pipeline.inference_pool import InferenceTimeout, PoolOverloaded
+        from src.pipeline.predict_pipeline import patient_frames
+
+        try:
+            record = validate_form(request.form.to_dict())
+        except SchemaError as e:
+            return render_template('home.html', results=str(e)), 400
         
+        # Convert to DataFrames (ready for the model): clinical features and the mutation list
+        pred_df, molecular = patient_frames([record])
+
+        def predict():
+            # Runs in an inference thread: the profiler samples that thread
+            with profile_request('predictdata'):
+                return services.predict_pipeline.predict(pred_df, molecular)
+
+        # Launch Prediction (the pipeline is shared, the model is already in memory)
+        # Spans (transform, predict, survival evaluation) are logged as one trace line per request
+        try:
+            with trace_request('predictdata'):
+                if services.micro_batcher is not None:
+                    # The batcher thread runs the batch: the request holds a pool slot (429 when
+                    # full, 504 on timeout) without parking an inference thread while it waits
+                    results = services.predict_pipeline.format_results(*services.inference_pool.run_future(
+                        lambda: services.micro_batcher.submit(pred_df, molecular)
+                    ))
+                else:
+                    results = services.inference_pool.run(predict)
+        except PoolOverloaded:
+            return render_template('home.html', results="Service surchargé, réessayez dans un instant"), 429
+        except InferenceTimeout:
+            return render_template('home.html', results="Délai de prédiction dépassé"), 504
+        record_first_prediction()
+
         # For Survival Analysis, the result is a "Risk Score".
         # Higher score = Higher risk (lower survival time).
         return render_template('home.html', results=results[0])
 
+
+def _api_error(status, error, message, details=None):
+    body = {"error": error, "message": message}
+    if details is not None:
+        body["details"] = details
+    response = jsonify(body)
+    response.status_code = status
+    if status == 429:
+        response.headers["Retry-After"] = "1"
+    return response
+
+
+def _profiled(route, function):
+    '''
+    function run under profile_request(route), as in /predictdata: called in an inference
+    thread, the profiler samples the thread doing the work, not the waiting request.
+    '''
+    def run(*args):
+        with profile_request(route):
+            return function(*args)
+    return run
+
+
+def _predict_json(route, records, time_horizons):
+    '''
+    Validated patients -> JSON predictions, run in the inference pool.
+    '''
+    services = get_services()
+    from src.pipeline.inference_pool import InferenceTimeout, PoolOverloaded
+    from src.pipeline.predict_pipeline import TIME_HORIZON, patient_frames
+
+    time_horizons = time_horizons or [TIME_HORIZON]
+    features, molecular = patient_frames(records)
+    try:
+        with trace_request(route):
+            risk_scores, survival = services.inference_pool.run(
+                _profiled(route, services.predict_pipeline.predict_survival), features, time_horizons, molecular
+            )
+    except PoolOverloaded as e:
+        return _api_error(429, "overloaded", str(e))
+    except InferenceTimeout as e:
+        return _api_error(504, "timeout", str(e))
+    record_first_prediction()
+
+    horizons = [f"{horizon:g}" for horizon in time_horizons]
+    predictions = [
+        {"risk_score": float(risk_score), "survival": dict(zip(horizons, row.tolist()))}
+        for risk_score, row in zip(risk_scores, survival)
+    ]
+    return jsonify(model_version=services.model_registry.version, predictions=predictions)
+
+
+@app.route('/api/v1/predict', methods=['POST'])
+def api_predict():
+    # One patient: the CustomData fields and "mutations", plus optional "time_horizons" (years)
+    from src.pipeline.api_schema import SchemaError, validate_single_request
+
+    payload = request.get_json(silent=True)
+    try:
+        record = validate_single_request(payload)
+    except SchemaError as e:
+        return _api_error(400, "invalid_request", "Request body does not match the patient schema", e.errors)
+    time_horizons = record.pop("time_horizons")
+    return _predict_json('api_predict', [record], time_horizons)
+
+
+@app.route('/api/v1/predict/batch', methods=['POST'])
+def api_predict_batch():
+    # {"patients": [...], "time_horizons": [...]} or a JSON array of patients
+    from src.pipeline.api_schema import SchemaError, validate_batch_request
+
+    payload = request.get_json(silent=True)
+    try:
+        records, time_horizons = validate_batch_request(payload, API_MAX_BATCH_SIZE)
+    except SchemaError as e:
+        return _api_error(400, "invalid_request", "Request body does not match the batch schema", e.errors)
+    return _predict_json('api_predict_batch', records, time_horizons)
+
+@app.route('/api/v1/explain', methods=['POST'])
+def api_explain():
+    # One patient (same body as /api/v1/predict) plus optional "top": contributions returned
+    services = get_services()
+    from src.pipeline.api_schema import SchemaError, validate_explain_request
+    from src.pipeline.explain_pipeline import ExplainerUnavailable
+    from src.pipeline.inference_pool import InferenceTimeout, PoolOverloaded
+    from src.pipeline.predict_pipeline import TIME_HORIZON, patient_frames
+
+    payload = request.get_json(silent=True)
+    try:
+        record = validate_explain_request(payload)
+    except SchemaError as e:
+        return _api_error(400, "invalid_request", "Request body does not match the patient schema", e.errors)
+    time_horizons = record.pop("time_horizons") or [TIME_HORIZON]
+    top = record.pop("top")
+
+    features, molecular = patient_frames([record])
+    try:
+        with trace_request('api_explain'):
+            explanation = services.inference_pool.run(
+                _profiled('api_explain', services.explain_pipeline.explain),
+                features, time_horizons, int(top) if top else None, molecular
+            )
+    except ExplainerUnavailable as e:
+        return _api_error(503, "explainer_unavailable", str(e))
+    except PoolOverloaded as e:
+        return _api_error(429, "overloaded", str(e))
+    except InferenceTimeout as e:
+        return _api_error(504, "timeout", str(e))
+    return jsonify(explanation)
+
+@app.route('/predictbatch', methods=['POST'])
+def predict_batch():
+    services = get_services()
+    from src.pipeline.api_schema import SchemaError, validate_batch_request, validate_cohort_patient
+    from src.pipeline.batch_predict_pipeline import cohort_frames, read_mutations, read_patients, stream_predictions
+
+    # Input: uploaded files ("file" field, csv/json/parquet, and the "mutations" field with
+    # one row per mutation: ID, GENE, EFFECT, VAF), or a JSON body shaped like
+    # /api/v1/predict/batch whose patients may carry an "ID"
+    # Everything is read and checked here, before the response starts: a bad row
+    # found while streaming would end a response already sent as 200
+    time_horizons = None
+    try:
+        if 'file' in request.files:
+            df = read_patients(request.files['file'], request.args.get('format'))
+            molecular = read_mutations(request.files['mutations']) if 'mutations' in request.files else None
+        else:
+            records, time_horizons = validate_batch_request(
+                request.get_json(silent=True), PREDICTBATCH_MAX_JSON_PATIENTS, validate=validate_cohort_patient
+            )
+            df, molecular = cohort_frames(records)
+        # A model with molecular features needs the mutations
+        df = services.batch_predict_pipeline.check_cohort(df, molecular)
+    except SchemaError as e:
+        return _api_error(400, "invalid_request", "Cohort does not match the patient schema", e.errors)
+
+    # Output is streamed chunk by chunk: CSV by default, NDJSON on request
+    output_format = request.args.get('output', 'csv')
+    mimetype = 'application/x-ndjson' if output_format == 'ndjson' else 'text/csv'
+    def generate():
+        # The work happens while the response is streamed: the trace covers the generator
+        with trace_request('predictbatch'), profile_request('predictbatch'):
+            yield from stream_predictions(services.batch_predict_pipeline, df, output_format, molecular, time_horizons)
+        record_first_prediction()
+
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    # Prometheus text exposition format
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/stats')
+def stats():
+    model_version = _services.model_registry.version if _services is not None else None
+    return jsonify(model_version=model_version, metrics=metrics.snapshot())
+
 if __name__=="__main__":
-    app.run(host="0.0.0.0", port=5001, debug=True)
\ No newline at end of file
+    # Development server only: serve with gunicorn (gunicorn -c gunicorn.conf.py app:app)
+    app.run(host="0.0.0.0", port=5001, debug=os.environ.get("FLASK_DEBUG", "0") == "1", threaded=True)
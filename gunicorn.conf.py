@@ -0,0 +1,23 @@
+# gunicorn -c gunicorn.conf.py app:app
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:5001")
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+# Request threads only parse, validate and wait: predictions run in each worker's bounded inference
+# pool (INFERENCE_WORKERS + INFERENCE_QUEUE). Keep more threads than that, so an overload is answered
+# with a 429 instead of piling up unseen in the listen backlog
+threads = int(os.environ.get("GUNICORN_THREADS", "32"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+
+# Preload: app.py (heavy modules + model) is imported once in the master, the workers are
+# forked from it and share those pages copy-on-write. STARTUP_MODE=lazy: each worker loads on first request.
+preload_app = os.environ.get("STARTUP_MODE", "preload") == "preload"
+
+
+def when_ready(server):
+    # Runs in the master after the preload, before the first workers are forked
+    if preload_app:
+        from src.startup import freeze_for_fork
+        freeze_for_fork()
+        server.log.info("Preloaded app frozen for copy-on-write sharing")
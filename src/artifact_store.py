@@ -0,0 +1,170 @@
+import io
+import os
+import sys
+import json
+import lzma
+import mmap
+import zlib
+import pickle
+import struct
+import hashlib
+
+from src.exception import CustomException
+
+# Layout of an artifact file:
+#   MAGIC | header length (uint32) | JSON header | padding | pickle stream | buffers...
+# Every numpy array above INLINE_THRESHOLD is written raw (pickle protocol 5, out-of-band)
+# at an aligned offset, so it can be used straight from a memory map.
+ARTIFACT_MAGIC = b"MLPRJART"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+INLINE_THRESHOLD = 4096
+
+# (path, mtime, size) of the files whose checksum was already verified by this process
+_verified = set()
+
+_CODECS = {
+    "zlib": (lambda data: zlib.compress(data, 6), zlib.decompress),
+    "lzma": (lzma.compress, lzma.decompress),
+}
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def is_artifact_file(file_path):
+    '''
+    True if the file was written by save_artifact (and not by plain pickle).
+    '''
+    with open(file_path, "rb") as file_obj:
+        return file_obj.read(len(ARTIFACT_MAGIC)) == ARTIFACT_MAGIC
+
+
+def read_header(file_path):
+    '''
+    Header of an artifact file (format version, compression, sections, sha256 of the data).
+    '''
+    with open(file_path, "rb") as file_obj:
+        if file_obj.read(len(ARTIFACT_MAGIC)) != ARTIFACT_MAGIC:
+            raise ValueError(f"{file_path} is not an artifact file")
+        (header_length,) = struct.unpack("<I", file_obj.read(4))
+        return json.loads(file_obj.read(header_length))
+
+
+def save_artifact(file_path, obj, compress=None):
+    '''
+    Saves obj with its large arrays stored as raw buffers.
+    compress: None (uncompressed, can be memory-mapped), "zlib" or "lzma" (archival).
+    '''
+    try:
+        if compress is not None and compress not in _CODECS:
+            raise ValueError(f"Unknown compression: {compress} (expected None, 'zlib' or 'lzma')")
+
+        buffers = []
+
+        def buffer_callback(buffer):
+            # Returning True keeps small buffers inside the pickle stream
+            raw = buffer.raw()
+            if raw.nbytes < INLINE_THRESHOLD:
+                return True
+            buffers.append(raw)
+            return False
+
+        stream = pickle.dumps(obj, protocol=5, buffer_callback=buffer_callback)
+        sections = [stream] + buffers
+        if compress is not None:
+            encode = _CODECS[compress][0]
+            sections = [encode(section) for section in sections]
+
+        # Offsets are relative to the start of the data section
+        digest = hashlib.sha256()
+        layout = []
+        offset = 0
+        for section in sections:
+            offset = _align(offset)
+            length = memoryview(section).nbytes
+            layout.append({"offset": offset, "length": length})
+            digest.update(section)
+            offset += length
+
+        header = json.dumps({
+            "format_version": FORMAT_VERSION,
+            "compression": compress,
+            "sections": layout,
+            "sha256": digest.hexdigest(),
+        }).encode()
+
+        data_start = _align(len(ARTIFACT_MAGIC) + 4 + len(header))
+
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, "wb") as file_obj:
+            file_obj.write(ARTIFACT_MAGIC)
+            file_obj.write(struct.pack("<I", len(header)))
+            file_obj.write(header)
+            for section, entry in zip(sections, layout):
+                file_obj.seek(data_start + entry["offset"])
+                file_obj.write(section)
+
+        os.replace(tmp_path, file_path)
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def load_artifact(file_path, mmap_mode="r", verify=False):
+    '''
+    Loads an object written by save_artifact.
+    mmap_mode: "r" (read-only arrays backed by the page cache), "c" (copy-on-write) or None
+    (read the file into memory). Only arrays the object keeps as they are stay backed by the
+    map (e.g. CompiledForest); sklearn trees copy their node arrays when unpickled.
+    verify: check the sha256 of the data section before unpickling. It reads the whole file,
+    so it is opt-in and done once per file version (path, mtime, size) in a process.
+    '''
+    try:
+        stat = os.stat(file_path)
+        file_version = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+        with open(file_path, "rb") as file_obj:
+            if file_obj.read(len(ARTIFACT_MAGIC)) != ARTIFACT_MAGIC:
+                raise ValueError(f"{file_path} is not an artifact file")
+            (header_length,) = struct.unpack("<I", file_obj.read(4))
+            header = json.loads(file_obj.read(header_length))
+
+            if header["format_version"] > FORMAT_VERSION:
+                raise ValueError(
+                    f"{file_path} uses artifact format {header['format_version']}, "
+                    f"this code reads up to {FORMAT_VERSION}"
+                )
+
+            compression = header["compression"]
+            if compression is None and mmap_mode is not None:
+                access = mmap.ACCESS_READ if mmap_mode == "r" else mmap.ACCESS_COPY
+                view = memoryview(mmap.mmap(file_obj.fileno(), 0, access=access))
+            else:
+                file_obj.seek(0)
+                view = memoryview(file_obj.read())
+
+        data_start = _align(len(ARTIFACT_MAGIC) + 4 + header_length)
+        sections = [
+            view[data_start + entry["offset"]:data_start + entry["offset"] + entry["length"]]
+            for entry in header["sections"]
+        ]
+
+        if verify and file_version not in _verified:
+            digest = hashlib.sha256()
+            for section in sections:
+                digest.update(section)
+            if digest.hexdigest() != header["sha256"]:
+                raise ValueError(f"Checksum mismatch for {file_path}, the artifact is corrupted")
+            _verified.add(file_version)
+
+        if compression is not None:
+            decode = _CODECS[compression][1]
+            sections = [decode(section) for section in sections]
+
+        stream, buffers = sections[0], sections[1:]
+        return pickle.load(io.BytesIO(stream), buffers=buffers)
+
+    except Exception as e:
+        raise CustomException(e, sys)
@@ -0,0 +1,193 @@
+import re
+import sys
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.base import BaseEstimator, TransformerMixin
+
+from src.exception import CustomException
+
+CYTOGENETICS_FEATURES = [
+    "CYTO_MISSING",
+    "CYTO_NORMAL",
+    "CYTO_COMPLEX",
+    "CYTO_MONOSOMAL",
+    "CYTO_N_CLONES",
+    "CYTO_N_ABNORMALITIES",
+    "CYTO_N_MONOSOMIES",
+    "CYTO_N_TRISOMIES",
+    "CYTO_N_DELETIONS",
+    "CYTO_N_TRANSLOCATIONS",
+    "CYTO_DEL_5Q",
+    "CYTO_MONOSOMY_7",
+    "CYTO_DEL_7Q",
+    "CYTO_TRISOMY_8",
+    "CYTO_DEL_20Q",
+    "CYTO_ABN_17P",
+    "CYTO_LOSS_Y",
+]
+
+# ISCN grammar, compiled once
+# Cell counts of a clone: [20], [cp3]
+CELL_COUNT_RE = re.compile(r"\[[^\]]*\]")
+# Whole-chromosome gain or loss: +8, -7, -y
+NUMERIC_RE = re.compile(r"^([+-])(\d{1,2}|x|y)c?$")
+# Marker / ring / double minute chromosomes: +mar, +2mar, +2-3mar1, +r, dmin
+MARKER_RE = re.compile(r"^[+-]?(?:\d+(?:-\d+)?)?(?:mar|r|dmin)\d*$")
+# Structural rearrangement: del(5)(q13q33), del(5q), t(3;7)(?q26;q21), +der(1;7)(q10;p10)
+STRUCTURAL_RE = re.compile(
+    r"^[+-]?(?P<kind>del|add|t|der|inv|i|dic|idic|dup|ins|ider|r|hsr|tas|trp)"
+    r"\((?P<chromosomes>[^)]*)\)(?:\((?P<bands>[^)]*)\))?"
+)
+# First chromosome of a rearrangement and arm of a chromosome or band: 5q, q13, ?q26, p11.2
+CHROMOSOME_RE = re.compile(r"\d{1,2}|x|y")
+ARM_RE = re.compile(r"\??([pq])")
+
+AUTOSOMES = {str(chromosome) for chromosome in range(1, 23)}
+
+
+def _deleted_arm(chromosomes, bands):
+    '''
+    Arm lost by a deletion: from the compact form del(5q) or from the first band of del(5)(q13q33).
+    '''
+    arm = ARM_RE.search(chromosomes) or (ARM_RE.search(bands) if bands else None)
+    return arm.group(1) if arm else None
+
+
+def _parse_clone(clone):
+    '''
+    Abnormalities of one clone as a set of normalized tokens. Every token is tried:
+    the chromosome count, the sex chromosomes (absent in "45,-7" or "47,idem,+8")
+    and stemline references (idem, sl, sdl) match no abnormality pattern.
+    '''
+    tokens = [token.strip() for token in CELL_COUNT_RE.sub("", clone).split(",")]
+    return {
+        token for token in tokens
+        if NUMERIC_RE.match(token) or MARKER_RE.match(token) or STRUCTURAL_RE.match(token)
+    }
+
+
+def parse_missing():
+    return (1.0,) + (0.0,) * (len(CYTOGENETICS_FEATURES) - 1)
+
+
+@lru_cache(maxsize=65536)
+def parse_karyotype(karyotype):
+    '''
+    Parses one ISCN karyotype (e.g. "46,xy,del(20)(q12)[2]/46,xy[18]")
+    into a tuple of features ordered as CYTOGENETICS_FEATURES.
+    Memoized: karyotype strings repeat heavily across patients.
+    '''
+    text = karyotype.strip().lower().replace(" ", "")
+    if not text:
+        return parse_missing()
+
+    clones = [clone for clone in text.split("/") if clone]
+    # Abnormalities of all clones together: a subclone's "idem" / "sl" only repeats the
+    # stemline's, which are already counted
+    abnormalities = set().union(*map(_parse_clone, clones))
+
+    monosomies, trisomies = set(), set()
+    deletions, translocations = 0, 0
+    del_5q = del_7q = del_20q = abn_17p = loss_y = False
+    n_structural = 0
+
+    for token in abnormalities:
+        numeric = NUMERIC_RE.match(token)
+        if numeric:
+            sign, chromosome = numeric.groups()
+            if sign == "-":
+                monosomies.add(chromosome)
+                loss_y |= chromosome == "y"
+            else:
+                trisomies.add(chromosome)
+            continue
+
+        structural = STRUCTURAL_RE.match(token)
+        if structural is None:
+            continue
+        n_structural += 1
+        kind = structural.group("kind")
+        chromosomes = structural.group("chromosomes")
+        bands = structural.group("bands")
+        chromosome = CHROMOSOME_RE.match(chromosomes)
+        chromosome = chromosome.group() if chromosome else None
+
+        if kind == "del":
+            deletions += 1
+            arm = _deleted_arm(chromosomes, bands)
+            del_5q |= chromosome == "5" and arm == "q"
+            del_7q |= chromosome == "7" and arm == "q"
+            del_20q |= chromosome == "20" and arm == "q"
+            abn_17p |= chromosome == "17" and arm == "p"
+        elif kind in ("t", "der", "dic", "idic"):
+            translocations += 1
+        elif kind == "i" and chromosome == "17":
+            # i(17q): loss of 17p
+            abn_17p = True
+
+    autosomal_monosomies = monosomies & AUTOSOMES
+    n_abnormalities = len(abnormalities)
+
+    return (
+        0.0,
+        float(n_abnormalities == 0),
+        # Complex karyotype: 3 or more abnormalities
+        float(n_abnormalities >= 3),
+        # Monosomal karyotype: 2 autosomal monosomies, or 1 with a structural abnormality
+        float(len(autosomal_monosomies) >= 2 or (len(autosomal_monosomies) == 1 and n_structural > 0)),
+        float(len(clones)),
+        float(n_abnormalities),
+        float(len(autosomal_monosomies)),
+        float(len(trisomies & AUTOSOMES)),
+        float(deletions),
+        float(translocations),
+        float(del_5q or "5" in monosomies),
+        float("7" in monosomies),
+        float(del_7q),
+        float("8" in trisomies),
+        float(del_20q),
+        float(abn_17p or "17" in monosomies),
+        float(loss_y),
+    )
+
+
+def cytogenetics_features(values):
+    '''
+    Feature matrix (n_rows x len(CYTOGENETICS_FEATURES)) of a column of karyotypes.
+    Each distinct string is parsed once; rows are then filled by indexing.
+    '''
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+    table = np.array(
+        [parse_karyotype(value) if isinstance(value, str) else parse_missing() for value in uniques]
+        + [parse_missing()],
+        dtype=np.float32,
+    ).reshape(-1, len(CYTOGENETICS_FEATURES))
+    # Missing values (code -1) point to the last row of the table
+    codes = np.where(codes < 0, len(uniques), codes)
+    return table[codes]
+
+
+class CytogeneticsFeatureExtractor(BaseEstimator, TransformerMixin):
+    '''
+    ColumnTransformer step turning the CYTOGENETICS column into
+    structured karyotype features (sparse CSR float32 output).
+    '''
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X):
+        try:
+            if isinstance(X, pd.DataFrame):
+                values = X.iloc[:, 0]
+            else:
+                values = np.asarray(X, dtype=object).reshape(len(X), -1)[:, 0]
+            return sparse.csr_matrix(cytogenetics_features(values))
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray(CYTOGENETICS_FEATURES, dtype=object)
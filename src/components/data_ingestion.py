@@ -1,7 +1,12 @@
 import os
 import sys
+import time
+import resource
+from contextlib import contextmanager
 from src.exception import CustomException
 from src.logger import logging
+from src.components.datasets import INGESTION_DTYPES, write_frame
+import numpy as np
 import pandas as pd
 
 from sklearn.model_selection import train_test_split
@@ -10,9 +15,60 @@ from dataclasses import dataclass
 
 @dataclass
 class DataIngestionConfig:
-    train_data_path: str = os.path.join('artifacts', "train.csv")
-    test_data_path: str = os.path.join('artifacts', "test.csv")
-    raw_data_path: str = os.path.join('artifacts', "data.csv")
+    train_data_path: str = os.path.join('artifacts', "train.parquet")
+    test_data_path: str = os.path.join('artifacts', "test.parquet")
+    raw_data_path: str = os.path.join('artifacts', "data.parquet")
+    # The splits are passed in memory to the next stage; writing them (.parquet or .feather) is optional
+    persist_data: bool = True
+    clinical_data_path: str = os.path.join('notebook', 'data', 'X_train', "clinical_train.csv")
+    molecular_data_path: str = os.path.join('notebook', 'data', 'X_train', "molecular_train.csv")
+    target_data_path: str = os.path.join('notebook', 'data', "target_train.csv")
+    # Streaming mode: sources read in chunks, splits written as partitioned Parquet (bounded memory)
+    streaming: bool = False
+    chunk_size: int = 100_000
+    partitioned_data_dir: str = os.path.join('artifacts', "ingested")
+    test_size: float = 0.2
+    random_state: int = 42
+
+
+def peak_rss_mb():
+    # Highest RSS of the process since it started (not of one stage); ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@contextmanager
+def stage_monitor(stage):
+    '''
+    Logs the duration and rows/s of an ingestion stage, with the process peak RSS so far
+    (a stage only shows up there when it raises the peak); the caller adds the processed rows
+    to the yielded dict.
+    '''
+    stats = {"rows": 0}
+    start = time.perf_counter()
+    yield stats
+    elapsed = time.perf_counter() - start
+    logging.info(
+        f"[ingestion] {stage}: {stats['rows']} rows in {elapsed:.2f}s "
+        f"({stats['rows'] / max(elapsed, 1e-9):,.0f} rows/s), process peak RSS so far {peak_rss_mb():.0f} MB"
+    )
+
+
+def test_split_mask(ids, test_size, random_state):
+    '''
+    Deterministic train/test assignment from a hash of the patient ID,
+    so every chunk can be split on its own.
+    '''
+    hashes = pd.util.hash_pandas_object(ids, index=False, hash_key=f"{random_state:016d}"[-16:]).to_numpy()
+    return (hashes % 10_000) < test_size * 10_000
+
+
+def partition_paths(partitioned_data_dir, split):
+    '''
+    Part files of one split of the partitioned output, in write order.
+    '''
+    split_dir = os.path.join(partitioned_data_dir, f"split={split}")
+    return [os.path.join(split_dir, name) for name in sorted(os.listdir(split_dir))]
+
 
 class DataIngestion:
     def __init__(self):
@@ -20,44 +76,120 @@ class DataIngestion:
 
     def initiate_data_ingestion(self):
         logging.info("Entered the data ingestion method")
+        if self.ingestion_config.streaming:
+            return self.initiate_streaming_ingestion()
         try:
             # 1. READING RAW DATA
             logging.info("Reading the 3 raw datasets")
 
-            df_clinical = pd.read_csv('notebook/data/X_train/clinical_train.csv')
-            df_molecular = pd.read_csv('notebook/data/X_train/molecular_train.csv')
-            df_target = pd.read_csv('notebook/data/target_train.csv')
+            df_clinical = pd.read_csv(self.ingestion_config.clinical_data_path, dtype=INGESTION_DTYPES)
+            df_molecular = pd.read_csv(self.ingestion_config.molecular_data_path, usecols=['ID'], dtype={'ID': str})
+            df_target = pd.read_csv(self.ingestion_config.target_data_path, dtype=INGESTION_DTYPES)
 
             logging.info("Calculating Nmut (mutations per patient)")
-            molecular_counts = df_molecular.groupby('ID').size().reset_index(name='Nmut')
+            molecular_counts = df_molecular.groupby('ID').size().rename('Nmut')
 
             logging.info("Merging datasets into a single dataframe")
             
             df = pd.merge(df_clinical, df_target, on='ID')
-            df = pd.merge(df, molecular_counts, on='ID', how='left')
+            df = df.join(molecular_counts, on='ID')
       
-            df['Nmut'] = df['Nmut'].fillna(0)
+            df['Nmut'] = df['Nmut'].fillna(0).astype(np.int32)
 
             logging.info(f"Merged Dataframe shape: {df.shape}")
 
-            os.makedirs(os.path.dirname(self.ingestion_config.train_data_path), exist_ok=True)
-
-            df.to_csv(self.ingestion_config.raw_data_path, index=False, header=True)
-
             logging.info("Train test split initiated")
 
             train_set, test_set = train_test_split(df, test_size=0.2, random_state=42)
 
-            train_set.to_csv(self.ingestion_config.train_data_path, index=False, header=True)
-            test_set.to_csv(self.ingestion_config.test_data_path, index=False, header=True)
+            if self.ingestion_config.persist_data:
+                write_frame(df, self.ingestion_config.raw_data_path)
+                write_frame(train_set, self.ingestion_config.train_data_path)
+                write_frame(test_set, self.ingestion_config.test_data_path)
 
             logging.info("Ingestion of the data is completed")
 
             return (
-                self.ingestion_config.train_data_path,
-                self.ingestion_config.test_data_path
+                train_set,
+                test_set
             )
 
         except Exception as e:
             raise CustomException(e, sys)
 
+    def initiate_streaming_ingestion(self):
+        '''
+        Out-of-core variant: only per-patient aggregates (mutation counts, targets)
+        are held in memory, the clinical rows are joined and written chunk by chunk.
+        Returns the part files of the train and test splits (read by the next stage).
+        '''
+        logging.info("Entered the streaming data ingestion method")
+        try:
+            config = self.ingestion_config
+            chunk_size = config.chunk_size
+
+            # 1. MOLECULAR: mutation counts accumulated chunk by chunk
+            with stage_monitor("molecular counts") as stats:
+                molecular_counts = pd.Series(dtype=np.int64, name='Nmut')
+                for chunk in pd.read_csv(
+                    config.molecular_data_path, usecols=['ID'], dtype={'ID': str}, chunksize=chunk_size
+                ):
+                    molecular_counts = molecular_counts.add(chunk['ID'].value_counts(), fill_value=0)
+                    stats["rows"] += len(chunk)
+
+            # 2. TARGETS: one row per patient, hashed index on ID for the join
+            with stage_monitor("targets") as stats:
+                target_chunks = []
+                for chunk in pd.read_csv(config.target_data_path, dtype=INGESTION_DTYPES, chunksize=chunk_size):
+                    target_chunks.append(chunk.set_index('ID'))
+                    stats["rows"] += len(chunk)
+                df_target = pd.concat(target_chunks)
+                del target_chunks
+
+            # 3. CLINICAL: joined, split and written one chunk at a time
+            with stage_monitor("clinical join + write") as stats:
+                for split in ("train", "test"):
+                    split_dir = os.path.join(config.partitioned_data_dir, f"split={split}")
+                    os.makedirs(split_dir, exist_ok=True)
+                    # Part files of a previous run would be read back with the new ones
+                    for name in os.listdir(split_dir):
+                        os.remove(os.path.join(split_dir, name))
+
+                for part, chunk in enumerate(pd.read_csv(
+                    config.clinical_data_path, dtype=INGESTION_DTYPES, chunksize=chunk_size
+                )):
+                    stats["rows"] += len(chunk)
+                    target_rows = df_target.index.get_indexer(chunk['ID'])
+                    matched = target_rows >= 0
+                    chunk = chunk[matched].reset_index(drop=True)
+                    targets = df_target.iloc[target_rows[matched]].reset_index(drop=True)
+                    chunk = pd.concat([chunk, targets], axis=1)
+                    chunk['Nmut'] = molecular_counts.reindex(chunk['ID']).fillna(0).to_numpy().astype(np.int32)
+
+                    is_test = test_split_mask(chunk['ID'], config.test_size, config.random_state)
+                    for split, rows in (("train", ~is_test), ("test", is_test)):
+                        if rows.any():
+                            write_frame(
+                                chunk[rows],
+                                os.path.join(config.partitioned_data_dir, f"split={split}", f"part-{part:05d}.parquet"),
+                            )
+
+            # 4. The part files are handed over as they are: nothing is read back here
+            train_set = partition_paths(config.partitioned_data_dir, "train")
+            test_set = partition_paths(config.partitioned_data_dir, "test")
+            for split, paths in (("train", train_set), ("test", test_set)):
+                if not paths:
+                    raise ValueError(
+                        f"The hash split put no patient in the {split} split "
+                        f"(test_size={config.test_size}, {stats['rows']} clinical rows)"
+                    )
+
+            logging.info(f"Streaming ingestion completed: {len(train_set)} train / {len(test_set)} test part files")
+
+            return (
+                train_set,
+                test_set
+            )
+
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -1,22 +1,97 @@
 import sys
 from dataclasses import dataclass
 
-import numpy as np 
-import pandas as pd
+import numpy as np
+from scipy import sparse
 from sklearn.compose import ColumnTransformer
 from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, StandardScaler
 
 from src.exception import CustomException
 from src.logger import logging
 import os
 
 from src.utils import save_object
+from src.components.datasets import (
+    SurvivalDataset, TransformedData, TARGET_COLUMNS, matrix_nbytes, read_partitions, survival_target
+)
+from src.components.cytogenetics_features import CytogeneticsFeatureExtractor
+from src.components.molecular_features import MolecularFeatureBuilder, MolecularFeatureConfig
+
+def to_float32_csr(X):
+    '''
+    Last step of the preprocessor: CSR matrix in float32.
+    '''
+    return sparse.csr_matrix(X, dtype=np.float32)
+
+def patient_ids(X):
+    '''
+    Patient identifiers of a feature frame: the ID column, or the index when there is none.
+    '''
+    return X["ID"].to_numpy() if "ID" in X.columns else X.index.to_numpy()
+
+
+def transform_features(preprocessor, X, molecular=None):
+    '''
+    Applies a fitted preprocessor; molecular is ignored by preprocessors
+    saved without molecular features.
+    '''
+    if isinstance(preprocessor, SurvivalPreprocessor):
+        return preprocessor.transform(X, molecular=molecular)
+    return preprocessor.transform(X)
+
+
+def uses_molecular_features(preprocessor):
+    '''
+    True when the preprocessor builds per-gene / per-effect features from a mutation table.
+    '''
+    return isinstance(preprocessor, SurvivalPreprocessor)
+
+
+class SurvivalPreprocessor:
+    '''
+    Clinical preprocessor (ColumnTransformer pipeline) followed by the
+    molecular features of the same patients, stacked as one CSR float32 matrix.
+    The molecular vocabulary is the one fitted on the training patients, so
+    a raw mutation list (ID, GENE, EFFECT, VAF) is enough at inference.
+    '''
+    def __init__(self, clinical, molecular_builder):
+        self.clinical = clinical
+        self.molecular_builder = molecular_builder
+
+    def fit(self, X, molecular):
+        self.clinical.fit(X)
+        self.molecular_builder.fit(molecular, patient_ids=patient_ids(X))
+        return self
+
+    def transform(self, X, molecular=None):
+        clinical = self.clinical.transform(X)
+        if molecular is None:
+            # Patients without mutation data: empty molecular block
+            n_molecular = len(self.molecular_builder.get_feature_names_out())
+            molecular_block = sparse.csr_matrix((clinical.shape[0], n_molecular), dtype=np.float32)
+        else:
+            molecular_block = self.molecular_builder.transform(molecular, patient_ids(X))
+        return sparse.hstack([clinical, molecular_block], format="csr", dtype=np.float32)
+
+    def fit_transform(self, X, molecular):
+        return self.fit(X, molecular).transform(X, molecular)
+
+    def get_feature_names_out(self):
+        return np.concatenate([
+            self.clinical.get_feature_names_out(),
+            self.molecular_builder.get_feature_names_out(),
+        ]).astype(object)
+
 
 @dataclass
 class DataTransformationConfig:
     preprocessor_obj_file_path = os.path.join('artifacts', "preprocessor.pkl")
+    artifact_format = "mmap"
+    # Mutation file the per-gene / per-effect features are built from (None: clinical features only)
+    molecular_data_path = os.path.join('notebook', 'data', 'X_train', "molecular_train.csv")
+    molecular_feature_config = MolecularFeatureConfig()
 
 class DataTransformation:
     def __init__(self):
@@ -42,6 +117,10 @@ class DataTransformation:
                 "CENTER"
             ]
 
+            cytogenetics_columns = [
+                "CYTOGENETICS"
+            ]
+
             # 2. Numerical Pipeline
             # Median Imputation + Standardization
             num_pipeline = Pipeline(
@@ -64,12 +143,27 @@ class DataTransformation:
 
             logging.info(f"Categorical columns: {categorical_columns}")
             logging.info(f"Numerical columns: {numerical_columns}")
+            logging.info(f"Cytogenetics columns: {cytogenetics_columns}")
 
             # 4. Creating the Global Preprocessor
-            preprocessor = ColumnTransformer(
+            # sparse_threshold=1.0: the one-hot block stays sparse, the output is never densified
+            column_transformer = ColumnTransformer(
                 transformers=[
                     ("num_pipeline", num_pipeline, numerical_columns),
-                    ("cat_pipelines", cat_pipeline, categorical_columns)
+                    ("cat_pipelines", cat_pipeline, categorical_columns),
+                    # ISCN karyotype parsed into clone count, monosomies, del(5q), complex karyotype...
+                    ("cyto_pipeline", CytogeneticsFeatureExtractor(), cytogenetics_columns)
+                ],
+                sparse_threshold=1.0
+            )
+
+            # 5. Compact output: CSR float32 (the forest works in float32 anyway)
+            preprocessor = Pipeline(
+                steps=[
+                    ("column_transformer", column_transformer),
+                    ("to_float32", FunctionTransformer(
+                        to_float32_csr, accept_sparse=True, feature_names_out="one-to-one"
+                    ))
                 ]
             )
 
@@ -78,75 +172,78 @@ class DataTransformation:
         except Exception as e:
             raise CustomException(e, sys)
         
-    def initiate_data_transformation(self, train_path, test_path):
-
+    def initiate_data_transformation(self, train_df, test_df):
+        '''
+        train_df / test_df: DataFrames, or the part files of partitioned splits (streaming ingestion).
+        '''
         try:
-            # Reading train and test files
-            train_df = pd.read_csv(train_path)
-            test_df = pd.read_csv(test_path)
-
-            logging.info("Read train and test data completed")
+            logging.info("Received train and test dataframes from ingestion")
+            if isinstance(train_df, list):
+                # Partitioned splits are only read when the transformation actually runs
+                train_df, test_df = read_partitions(train_df), read_partitions(test_df)
 
             # --- PRELIMINARY CLEANING ---
-            # Cleaning targets before transformation
+            # Drop rows where survival info is missing (no copy of the kept rows is made here)
             logging.info("Cleaning targets before transformation")
-            
-            for df in [train_df, test_df]:
-                # Drop rows where survival info is missing
-                df.dropna(subset=['OS_YEARS', 'OS_STATUS'], inplace=True)
-                # Ensure boolean is readable (0/1) for models
-                df['OS_STATUS'] = df['OS_STATUS'].astype(int) 
-                df['OS_YEARS'] = pd.to_numeric(df['OS_YEARS'], errors='coerce')
+            train_df = train_df.dropna(subset=TARGET_COLUMNS)
+            test_df = test_df.dropna(subset=TARGET_COLUMNS)
 
             # --- DEFINING TARGETS AND FEATURES ---
-            target_column_names = ["OS_STATUS", "OS_YEARS"]
-            
-            # Dropping ID and CYTOGENETICS from training dataset
-            drop_columns = target_column_names + ["ID", "CYTOGENETICS"]
-
             logging.info("Obtaining preprocessing object")
             preprocessing_obj = self.get_data_transformer_object()
-
-            input_feature_train_df = train_df.drop(columns=drop_columns, axis=1)
-            target_feature_train_df = train_df[target_column_names]
-
-            input_feature_test_df = test_df.drop(columns=drop_columns, axis=1)
-            target_feature_test_df = test_df[target_column_names]
+            molecular_data_path = self.data_transformation_config.molecular_data_path
 
             logging.info("Applying preprocessing object on training and testing dataframes.")
 
             # Feature Transformation
-            input_feature_train_arr = preprocessing_obj.fit_transform(input_feature_train_df)
-            input_feature_test_arr = preprocessing_obj.transform(input_feature_test_df)
-
-            # --- SPARSE MATRIX BUG FIX ---
-            # If OneHotEncoder returns a sparse matrix, convert to dense
-            # otherwise np.c_ will fail with a dimension error.
-            if hasattr(input_feature_train_arr, "toarray"):
-                input_feature_train_arr = input_feature_train_arr.toarray()
-            
-            if hasattr(input_feature_test_arr, "toarray"):
-                input_feature_test_arr = input_feature_test_arr.toarray()
-
-            # --- FINAL CONCATENATION ---
-            # Concatenating features and targets into a large numpy array
-            # The last 2 columns will be OS_STATUS and OS_YEARS
-            train_arr = np.c_[
-                input_feature_train_arr, np.array(target_feature_train_df)
-            ]
-            test_arr = np.c_[input_feature_test_arr, np.array(target_feature_test_df)]
+            # (the ColumnTransformer only selects its own columns: ID and targets are dropped)
+            if molecular_data_path is None:
+                input_feature_train_arr = preprocessing_obj.fit_transform(train_df)
+                input_feature_test_arr = preprocessing_obj.transform(test_df)
+            else:
+                # Gene/effect vocabulary learned on the training patients only
+                preprocessing_obj = SurvivalPreprocessor(
+                    preprocessing_obj,
+                    MolecularFeatureBuilder(self.data_transformation_config.molecular_feature_config),
+                )
+                input_feature_train_arr = preprocessing_obj.fit_transform(train_df, molecular_data_path)
+                input_feature_test_arr = preprocessing_obj.transform(test_df, molecular_data_path)
+
+            # Sparse float32 matrix vs the former dense float64 one
+            n_features = input_feature_train_arr.shape[1]
+            logging.info(
+                f"Feature matrix memory per sample: {8 * n_features} bytes dense float64 -> "
+                f"{matrix_nbytes(input_feature_train_arr) / input_feature_train_arr.shape[0]:.1f} bytes CSR float32"
+            )
+
+            # --- TYPED SPLITS ---
+            # Features and structured Surv targets stay separate
+            feature_names = preprocessing_obj.get_feature_names_out().tolist()
+            train_data = SurvivalDataset(
+                X=input_feature_train_arr,
+                y=survival_target(train_df),
+                feature_names=feature_names,
+                ids=train_df["ID"].to_numpy(),
+            )
+            test_data = SurvivalDataset(
+                X=input_feature_test_arr,
+                y=survival_target(test_df),
+                feature_names=feature_names,
+                ids=test_df["ID"].to_numpy(),
+            )
 
             logging.info("Saved preprocessing object.")
 
             save_object(
                 file_path=self.data_transformation_config.preprocessor_obj_file_path,
-                obj=preprocessing_obj
+                obj=preprocessing_obj,
+                artifact_format=self.data_transformation_config.artifact_format
             )
 
-            return (
-                train_arr,
-                test_arr,
-                self.data_transformation_config.preprocessor_obj_file_path,
+            return TransformedData(
+                train=train_data,
+                test=test_data,
+                preprocessor_path=self.data_transformation_config.preprocessor_obj_file_path,
             )
         except Exception as e:
-            raise CustomException(e, sys)
\ No newline at end of file
+            raise CustomException(e, sys)
@@ -0,0 +1,139 @@
+import os
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sksurv.util import Surv
+
+from src.exception import CustomException
+
+TARGET_COLUMNS = ["OS_STATUS", "OS_YEARS"]
+
+# Explicit dtypes of the ingested data (identifiers and free text stay as strings)
+INGESTION_DTYPES = {
+    "ID": str,
+    "CENTER": str,
+    "CYTOGENETICS": str,
+    "BM_BLAST": np.float64,
+    "WBC": np.float64,
+    "ANC": np.float64,
+    "MONOCYTES": np.float64,
+    "HB": np.float64,
+    "PLT": np.float64,
+    "OS_YEARS": np.float64,
+    "OS_STATUS": np.float64,
+}
+
+
+def write_frame(df, file_path):
+    '''
+    Writes a DataFrame as Parquet or Feather (chosen from the file extension).
+    '''
+    try:
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        if file_path.endswith(".feather"):
+            df.reset_index(drop=True).to_feather(file_path)
+        elif file_path.endswith(".parquet"):
+            df.to_parquet(file_path, index=False)
+        else:
+            raise ValueError(f"Unsupported data format for {file_path} (expected .parquet or .feather)")
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def read_frame(file_path):
+    try:
+        if file_path.endswith(".feather"):
+            return pd.read_feather(file_path)
+        return pd.read_parquet(file_path)
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def read_partitions(file_paths):
+    '''
+    Concatenates the part files of a partitioned split, in order.
+    '''
+    if not file_paths:
+        raise ValueError("No part files to read: the split is empty")
+    return pd.concat([read_frame(file_path) for file_path in file_paths], ignore_index=True)
+
+
+def survival_target(df):
+    '''
+    Structured (event, time) array expected by scikit-survival.
+    '''
+    return Surv.from_arrays(
+        event=df["OS_STATUS"].to_numpy().astype(bool),
+        time=df["OS_YEARS"].to_numpy(dtype=np.float64),
+    )
+
+
+def matrix_nbytes(X):
+    '''
+    Memory used by a dense or CSR/CSC feature matrix.
+    '''
+    if sparse.issparse(X):
+        return X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    return X.nbytes
+
+
+@dataclass
+class SurvivalDataset:
+    '''
+    One split ready for the model: feature matrix, structured Surv target
+    and the column metadata, kept separate (no concatenation of X and y).
+    '''
+    X: object
+    y: np.ndarray
+    feature_names: list
+    ids: np.ndarray = None
+
+    @property
+    def n_samples(self):
+        return self.X.shape[0]
+
+    def save(self, directory, name):
+        '''
+        Writes the split as .npy/.npz files and returns {output name: path}.
+        '''
+        is_sparse = sparse.issparse(self.X)
+        paths = {
+            f"{name}_X": os.path.join(directory, f"{name}_X.npz" if is_sparse else f"{name}_X.npy"),
+            f"{name}_y": os.path.join(directory, f"{name}_y.npy"),
+            f"{name}_meta": os.path.join(directory, f"{name}_meta.npz"),
+        }
+        if is_sparse:
+            sparse.save_npz(paths[f"{name}_X"], self.X, compressed=False)
+        else:
+            np.save(paths[f"{name}_X"], self.X)
+        np.save(paths[f"{name}_y"], self.y)
+        np.savez(
+            paths[f"{name}_meta"],
+            feature_names=np.asarray(self.feature_names, dtype=str),
+            ids=np.asarray(self.ids if self.ids is not None else [], dtype=str),
+        )
+        return paths
+
+    @classmethod
+    def load(cls, paths, name):
+        meta = np.load(paths[f"{name}_meta"])
+        ids = meta["ids"]
+        X_path = paths[f"{name}_X"]
+        return cls(
+            X=sparse.load_npz(X_path) if X_path.endswith(".npz") else np.load(X_path),
+            y=np.load(paths[f"{name}_y"]),
+            feature_names=meta["feature_names"].tolist(),
+            ids=ids if len(ids) else None,
+        )
+
+
+@dataclass
+class TransformedData:
+    train: SurvivalDataset
+    test: SurvivalDataset
+    preprocessor_path: str
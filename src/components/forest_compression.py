@@ -0,0 +1,178 @@
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+from sksurv.metrics import concordance_index_censored
+
+from src.exception import CustomException
+from src.logger import logging
+from src.utils import save_object, save_json, survival_at_horizons
+
+
+@dataclass
+class ForestCompressionConfig:
+    # Opt-in: the served engine is forest_engine.pkl, and compressing holds out part of the training split
+    enabled: bool = False
+    # Fraction of the training split held out (before fitting) to tune and report the compression
+    validation_fraction: float = 0.2
+    random_state: int = 42
+    # Leaf curves are resampled onto this many time points
+    time_grid_size: int = 256
+    # "quantile": points at quantiles of the distinct training event times, "uniform": evenly spaced
+    time_grid: str = "quantile"
+    # Horizons (years) always kept on the grid, so survival there is not interpolated
+    horizons: list = field(default_factory=lambda: [1, 2, 3, 5])
+    # "uint16" (scaled), "float16", "float32" or "float64"
+    curve_dtype: str = "uint16"
+    # Drop trees whose removal does not lower the validation C-index by more than prune_tolerance
+    prune_trees: bool = False
+    prune_tolerance: float = 0.0
+    min_trees: int = 25
+    # Set to the served engine path (artifacts/forest_engine.pkl) to predict with the compressed forest
+    compressed_engine_file_path: str = os.path.join("artifacts", "forest_engine_compressed.pkl")
+    report_file_path: str = os.path.join("artifacts", "compression_report.json")
+    artifact_format: str = "mmap"
+    # Single-row requests timed for the latency comparison
+    latency_rows: int = 50
+
+
+def c_index(y, risk_scores):
+    event_field, time_field = y.dtype.names
+    return concordance_index_censored(y[event_field], y[time_field], risk_scores)[0]
+
+
+def make_time_grid(engine, config):
+    '''
+    Time points the compressed leaf curves are stored at (sorted, unique).
+    '''
+    event_times = engine.unique_times_[engine.is_event_time_]
+    if config.time_grid == "quantile":
+        grid = np.quantile(event_times, np.linspace(0, 1, config.time_grid_size), method="lower")
+    elif config.time_grid == "uniform":
+        grid = np.linspace(engine.unique_times_[0], event_times[-1], config.time_grid_size)
+    else:
+        raise ValueError(f"Unknown time grid: {config.time_grid} (expected 'quantile' or 'uniform')")
+    return np.union1d(grid, np.asarray(config.horizons, dtype=np.float64))
+
+
+def prune_trees(engine, X, y, tolerance=0.0, min_trees=1):
+    '''
+    Backward elimination on the validation set: trees are visited from the
+    weakest (own C-index) to the strongest, and a tree is dropped when the
+    C-index of the remaining forest stays within tolerance of the full forest's.
+    Returns the indexes of the kept trees.
+    '''
+    # Risk score of every tree for every sample: one traversal for the whole forest
+    tree_risks = engine.leaf_risk[engine.apply(X)]
+    reference = c_index(y, tree_risks.sum(1))
+    order = np.argsort([c_index(y, tree_risks[:, tree]) for tree in range(engine.n_trees)], kind="stable")
+
+    kept = np.ones(engine.n_trees, dtype=bool)
+    total = tree_risks.sum(1)
+    for tree in order:
+        if kept.sum() <= min_trees:
+            break
+        candidate = total - tree_risks[:, tree]
+        # The ranking of a sum is the ranking of the mean: no division needed
+        if c_index(y, candidate) >= reference - tolerance:
+            kept[tree] = False
+            total = candidate
+
+    return np.flatnonzero(kept)
+
+
+def engine_summary(engine, X, y, horizons, latency_rows):
+    '''
+    Size, validation C-index and serving latency (survival_at_horizons) of an engine.
+    '''
+    single_row = []
+    for row in range(min(latency_rows, X.shape[0])):
+        start = time.perf_counter()
+        survival_at_horizons(engine, X[row:row + 1], horizons)
+        single_row.append(time.perf_counter() - start)
+
+    batch = []
+    for _ in range(3):
+        start = time.perf_counter()
+        risk_scores, _ = survival_at_horizons(engine, X, horizons)
+        batch.append(time.perf_counter() - start)
+
+    return {
+        "n_trees": engine.n_trees,
+        "n_times": len(engine.unique_times_),
+        "curve_dtype": str(engine.leaf_survival.dtype),
+        "memory_mb": engine.nbytes / 1024 ** 2,
+        "c_index": c_index(y, risk_scores),
+        "single_row_p50_ms": float(np.median(single_row) * 1000),
+        "batch_ms": float(np.median(batch) * 1000),
+        "batch_rows": X.shape[0],
+    }
+
+
+class ForestCompression:
+    def __init__(self, config=None):
+        self.forest_compression_config = config or ForestCompressionConfig()
+
+    def initiate_forest_compression(self, engine, X_val, y_val):
+        '''
+        Prunes (optionally) and resamples / quantizes a CompiledForest, saves it
+        with a before / after report (size, latency, C-index, survival error).
+        Returns the compressed engine.
+        '''
+        try:
+            config = self.forest_compression_config
+            compressed = engine
+            kept_trees = np.arange(engine.n_trees)
+
+            if config.prune_trees:
+                kept_trees = prune_trees(engine, X_val, y_val, config.prune_tolerance, config.min_trees)
+                compressed = compressed.select_trees(kept_trees)
+                logging.info(f"Forest pruning: {len(kept_trees)} of {engine.n_trees} trees kept")
+
+            compressed = compressed.resample(make_time_grid(engine, config), config.curve_dtype)
+
+            # Survival error on the compressed grid, against the full forest at the same times
+            columns = np.searchsorted(engine.unique_times_, compressed.unique_times_, side="right") - 1
+            errors = np.abs(
+                compressed.predict_survival_function(X_val)
+                - engine.predict_survival_function(X_val)[:, np.clip(columns, 0, None)]
+            )
+
+            horizons = config.horizons
+            report = {
+                "config": {
+                    "time_grid": config.time_grid,
+                    "time_grid_size": config.time_grid_size,
+                    "curve_dtype": config.curve_dtype,
+                    "prune_trees": config.prune_trees,
+                    "prune_tolerance": config.prune_tolerance,
+                },
+                "validation_samples": X_val.shape[0],
+                "before": engine_summary(engine, X_val, y_val, horizons, config.latency_rows),
+                "after": engine_summary(compressed, X_val, y_val, horizons, config.latency_rows),
+                "survival_max_abs_error": float(errors.max()),
+                "survival_mean_abs_error": float(errors.mean()),
+                "kept_trees": kept_trees,
+            }
+
+            save_object(
+                file_path=config.compressed_engine_file_path,
+                obj=compressed,
+                artifact_format=config.artifact_format
+            )
+            report["after"]["file_mb"] = os.path.getsize(config.compressed_engine_file_path) / 1024 ** 2
+            save_json(config.report_file_path, report)
+
+            before, after = report["before"], report["after"]
+            logging.info(
+                f"Forest compression: {before['memory_mb']:.1f} MB -> {after['memory_mb']:.1f} MB, "
+                f"C-index {before['c_index']:.4f} -> {after['c_index']:.4f}, "
+                f"single row {before['single_row_p50_ms']:.2f} -> {after['single_row_p50_ms']:.2f} ms, "
+                f"max survival error {report['survival_max_abs_error']:.2e}"
+            )
+            return compressed
+
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -0,0 +1,307 @@
+import sys
+
+import numpy as np
+from scipy import sparse
+
+from src.exception import CustomException
+
+# sklearn marks leaves with children_left == -1
+TREE_LEAF = -1
+
+# Storage types of the leaf curves (see CompiledForest.resample)
+CURVE_DTYPES = ("float64", "float32", "float16", "uint16")
+UINT16_MAX = np.iinfo(np.uint16).max
+
+
+def is_survival_forest(model):
+    '''
+    True for fitted forests of survival trees (RandomSurvivalForest, ExtraSurvivalTrees),
+    the models CompiledForest can be built from (gradient boosting has estimators_ too, not is_event_time_).
+    '''
+    return all(hasattr(model, name) for name in ("estimators_", "unique_times_", "is_event_time_"))
+
+
+class CompiledForest:
+    '''
+    Inference-only export of a fitted survival forest (RandomSurvivalForest /
+    ExtraSurvivalTrees): the nodes of every tree are concatenated into flat,
+    contiguous arrays, and only the leaves keep their cumulative hazard and
+    survival curves.
+
+    All trees are traversed at once with vectorized NumPy (one gather per depth
+    level for the whole batch x trees grid), then leaf values are reduced across
+    trees. The reduction runs tree by tree in the same order as sksurv
+    (cumulative sum), so the outputs are bit-identical to the forest's.
+
+    resample() and select_trees() build smaller, approximate engines
+    (fixed time grid, quantized curves, subset of the trees).
+    '''
+    # Dequantization factor of uint16 leaf tables, by attribute name (empty: stored as floats)
+    curve_scales = {}
+
+    def __init__(self, feature, threshold, left, right, missing_go_to_left, leaf_index, roots,
+                 max_depth, leaf_risk, leaf_chf, leaf_survival, unique_times, is_event_time,
+                 n_features_in, source_digest=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_go_to_left = missing_go_to_left
+        self.leaf_index = leaf_index
+        self.roots = roots
+        self.max_depth = max_depth
+        self.leaf_risk = leaf_risk
+        self.leaf_chf = leaf_chf
+        self.leaf_survival = leaf_survival
+        self.unique_times_ = unique_times
+        self.is_event_time_ = is_event_time
+        self.n_features_in_ = n_features_in
+        # content_digest of the model file this engine was exported from (None when compiled in memory)
+        self.source_digest = source_digest
+
+    @classmethod
+    def from_forest(cls, forest, source_digest=None):
+        try:
+            features, thresholds, lefts, rights, missing_left, leaf_indexes, roots = [], [], [], [], [], [], []
+            leaf_chf, leaf_survival = [], []
+            node_offset, leaf_offset = 0, 0
+
+            for estimator in forest.estimators_:
+                tree = estimator.tree_
+                n_nodes = tree.node_count
+                is_leaf = tree.children_left == TREE_LEAF
+                nodes = np.arange(n_nodes)
+
+                # Leaves point to themselves: extra traversal steps leave them in place
+                lefts.append(np.where(is_leaf, nodes, tree.children_left) + node_offset)
+                rights.append(np.where(is_leaf, nodes, tree.children_right) + node_offset)
+                features.append(np.where(is_leaf, 0, tree.feature))
+                thresholds.append(tree.threshold)
+                missing_left.append(
+                    tree.missing_go_to_left.astype(bool) if hasattr(tree, "missing_go_to_left")
+                    else np.zeros(n_nodes, dtype=bool)
+                )
+
+                leaves = np.flatnonzero(is_leaf)
+                leaf_index = np.full(n_nodes, -1, dtype=np.int64)
+                leaf_index[leaves] = leaf_offset + np.arange(len(leaves))
+                leaf_indexes.append(leaf_index)
+                # value[..., 0]: cumulative hazard, value[..., 1]: survival
+                leaf_chf.append(tree.value[leaves, :, 0])
+                leaf_survival.append(tree.value[leaves, :, 1])
+
+                roots.append(node_offset)
+                node_offset += n_nodes
+                leaf_offset += len(leaves)
+
+            leaf_chf = np.ascontiguousarray(np.concatenate(leaf_chf))
+            is_event_time = np.asarray(forest.is_event_time_)
+
+            return cls(
+                feature=np.concatenate(features).astype(np.intp),
+                threshold=np.concatenate(thresholds).astype(np.float64),
+                left=np.concatenate(lefts).astype(np.intp),
+                right=np.concatenate(rights).astype(np.intp),
+                missing_go_to_left=np.concatenate(missing_left),
+                leaf_index=np.concatenate(leaf_indexes),
+                roots=np.asarray(roots, dtype=np.intp),
+                max_depth=max(estimator.tree_.max_depth for estimator in forest.estimators_),
+                # Per-leaf risk score, summed exactly as SurvivalTree.predict does
+                leaf_risk=leaf_chf[:, is_event_time].sum(1),
+                leaf_chf=leaf_chf,
+                leaf_survival=np.ascontiguousarray(np.concatenate(leaf_survival)),
+                unique_times=np.asarray(forest.unique_times_),
+                is_event_time=is_event_time,
+                n_features_in=forest.n_features_in_,
+                source_digest=source_digest,
+            )
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        '''
+        Memory used by the node and leaf arrays.
+        '''
+        return sum(value.nbytes for value in vars(self).values() if isinstance(value, np.ndarray))
+
+    def _leaf_values(self, name, index):
+        # Gathered rows of a leaf table, as float64
+        values = getattr(self, name)[index]
+        if values.dtype == np.float64:
+            return values
+        return values.astype(np.float64) * self.curve_scales.get(name, 1.0)
+
+    def _tree_ranges(self):
+        # (node start, node end, leaf start, leaf end) of every tree
+        node_ends = np.append(self.roots[1:], len(self.feature))
+        # Leaves are numbered in node order: a tree's first leaf is the number of leaf nodes before its root
+        leaf_starts = np.searchsorted(np.flatnonzero(self.leaf_index >= 0), self.roots)
+        leaf_ends = np.append(leaf_starts[1:], len(self.leaf_risk))
+        return zip(self.roots, node_ends, leaf_starts, leaf_ends)
+
+    def select_trees(self, trees):
+        '''
+        Engine restricted to the given trees (indexes in self.roots order).
+        '''
+        try:
+            ranges = list(self._tree_ranges())
+            nodes, leaves, roots = [], [], []
+            node_offset, leaf_offset = 0, 0
+            for tree in trees:
+                node_start, node_end, leaf_start, leaf_end = ranges[tree]
+                nodes.append(np.arange(node_start, node_end))
+                leaves.append(np.arange(leaf_start, leaf_end))
+                roots.append(node_offset)
+                node_offset += node_end - node_start
+                leaf_offset += leaf_end - leaf_start
+
+            nodes = np.concatenate(nodes)
+            leaves = np.concatenate(leaves)
+            # Old node / leaf index -> new one
+            node_map = np.full(len(self.feature), -1, dtype=np.intp)
+            node_map[nodes] = np.arange(len(nodes))
+            leaf_map = np.full(len(self.leaf_risk), -1, dtype=np.int64)
+            leaf_map[leaves] = np.arange(len(leaves))
+            leaf_index = self.leaf_index[nodes]
+
+            engine = CompiledForest(
+                feature=self.feature[nodes],
+                threshold=self.threshold[nodes],
+                left=node_map[self.left[nodes]],
+                right=node_map[self.right[nodes]],
+                missing_go_to_left=self.missing_go_to_left[nodes],
+                leaf_index=np.where(leaf_index >= 0, leaf_map[leaf_index], -1),
+                roots=np.asarray(roots, dtype=np.intp),
+                max_depth=self.max_depth,
+                leaf_risk=self.leaf_risk[leaves],
+                leaf_chf=self.leaf_chf[leaves],
+                leaf_survival=self.leaf_survival[leaves],
+                unique_times=self.unique_times_,
+                is_event_time=self.is_event_time_,
+                n_features_in=self.n_features_in_,
+                source_digest=self.source_digest,
+            )
+            engine.curve_scales = dict(self.curve_scales)
+            return engine
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def resample(self, time_grid, curve_dtype="float32"):
+        '''
+        Engine whose leaf curves are only stored at the time_grid points (step-function
+        values, as StepFunction evaluates them) in curve_dtype. uint16 curves are
+        scaled to [0, max] of each table. The leaf risk scores are kept as they are,
+        so the risk ranking is unchanged.
+        '''
+        try:
+            if curve_dtype not in CURVE_DTYPES:
+                raise ValueError(f"Unknown curve dtype: {curve_dtype} (expected one of {CURVE_DTYPES})")
+
+            time_grid = np.unique(np.asarray(time_grid, dtype=np.float64))
+            columns = np.clip(np.searchsorted(self.unique_times_, time_grid, side="right") - 1, 0, None)
+            all_leaves = np.arange(len(self.leaf_risk))
+
+            tables, scales = {}, {}
+            for name in ("leaf_chf", "leaf_survival"):
+                # Dequantized first: resampling an already compressed engine is allowed
+                values = self._leaf_values(name, (all_leaves[:, None], columns))
+                if curve_dtype == "uint16":
+                    scale = max(values.max(), np.finfo(np.float64).tiny) / UINT16_MAX
+                    tables[name] = np.rint(values / scale).astype(np.uint16)
+                    scales[name] = scale
+                else:
+                    tables[name] = np.ascontiguousarray(values, dtype=curve_dtype)
+
+            engine = CompiledForest(
+                feature=self.feature,
+                threshold=self.threshold,
+                left=self.left,
+                right=self.right,
+                missing_go_to_left=self.missing_go_to_left,
+                leaf_index=self.leaf_index,
+                roots=self.roots,
+                max_depth=self.max_depth,
+                leaf_risk=self.leaf_risk,
+                leaf_chf=tables["leaf_chf"],
+                leaf_survival=tables["leaf_survival"],
+                unique_times=time_grid,
+                is_event_time=self.is_event_time_[columns],
+                n_features_in=self.n_features_in_,
+                source_digest=self.source_digest,
+            )
+            engine.curve_scales = scales
+            return engine
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def apply(self, X):
+        '''
+        Leaf reached by every sample in every tree, as rows of the leaf tables (n_samples, n_trees).
+        '''
+        # Same input as sklearn's trees: float32 (thresholds are compared in float64)
+        X = X.toarray() if sparse.issparse(X) else np.asarray(X)
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[-1]} features, the forest expects {self.n_features_in_}")
+
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.n_trees)).copy()
+        has_missing = np.isnan(X).any()
+
+        for depth in range(self.max_depth):
+            values = X[rows, self.feature[nodes]]
+            go_left = values <= self.threshold[nodes]
+            if has_missing:
+                go_left = np.where(np.isnan(values), self.missing_go_to_left[nodes], go_left)
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+            # Shallow trees: stop as soon as every sample reached a leaf
+            if depth % 8 == 7 and (self.leaf_index[nodes] >= 0).all():
+                break
+
+        return self.leaf_index[nodes]
+
+    def _tree_mean(self, values):
+        '''
+        Mean over the tree axis (axis 1), accumulated tree by tree like sksurv.
+        '''
+        return np.cumsum(values, axis=1)[:, -1] / self.n_trees
+
+    def predict(self, X):
+        return self._tree_mean(self.leaf_risk[self.apply(X)])
+
+    def _curves(self, name, X, max_values=1 << 24):
+        # (n_samples, n_trees, n_times) is gathered a block of rows at a time to bound memory
+        leaves = self.apply(X)
+        n_times = len(self.unique_times_)
+        block = max(1, max_values // (self.n_trees * n_times))
+        return np.concatenate([
+            self._tree_mean(self._leaf_values(name, leaves[start:start + block]))
+            for start in range(0, len(leaves), block)
+        ]) if len(leaves) else np.empty((0, n_times))
+
+    def predict_cumulative_hazard_function(self, X):
+        return self._curves("leaf_chf", X)
+
+    def predict_survival_function(self, X):
+        return self._curves("leaf_survival", X)
+
+    def predict_at_horizons(self, X, horizon_idx):
+        '''
+        Risk scores (n_samples,) and survival at the given unique_times_ indexes
+        (n_samples, n_horizons) from a single traversal; only the needed
+        columns of the survival curves are gathered.
+        '''
+        return self.reduce_at_horizons(self.apply(X), horizon_idx)
+
+    def reduce_at_horizons(self, leaves, horizon_idx):
+        risk_scores = self._tree_mean(self.leaf_risk[leaves])
+        survival = self._tree_mean(self._leaf_values("leaf_survival", (leaves[..., None], np.asarray(horizon_idx))))
+        return risk_scores, survival
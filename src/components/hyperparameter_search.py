@@ -0,0 +1,307 @@
+import sys
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+# HalvingRandomSearchCV is still flagged experimental in scikit-learn
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import GridSearchCV, HalvingRandomSearchCV, KFold, ParameterGrid, ParameterSampler
+from sklearn.utils import check_array
+from sksurv.metrics import concordance_index_censored
+
+from src.exception import CustomException
+from src.logger import logging
+
+
+@dataclass
+class HyperparameterSearchConfig:
+    # Successive halving: every round keeps the best 1/factor candidates
+    # and gives them factor times more trees
+    resource: str = "n_estimators"
+    min_resources: int = 16
+    max_resources: int = 150
+    factor: int = 3
+    # Number of configurations sampled for the first round (18 -> 6 -> 2 with 16, 48, 144 trees)
+    n_candidates: int = 18
+    cv: int = 3
+    n_jobs: int = -1
+    random_state: int = 42
+
+
+@dataclass
+class WarmStartSearchConfig:
+    # Forest sizes at which the held-out C-index is measured while the forest grows
+    n_estimators_checkpoints: list = field(default_factory=lambda: [10, 25, 50, 75, 100, 150])
+    # The smallest forest whose CV C-index is within tolerance of the best one is kept
+    tolerance: float = 0.002
+    # Only used when the parameter space contains distributions instead of lists
+    n_candidates: int = 18
+    cv: int = 3
+    n_jobs: int = -1
+    random_state: int = 42
+
+
+@dataclass
+class GridSearchConfig:
+    # Exhaustive grid, for models without an n_estimators-like resource (CoxNet, ...)
+    cv: int = 3
+    n_jobs: int = -1
+
+
+@dataclass
+class SearchResult:
+    best_estimator_: object
+    best_params_: dict
+    best_score_: float
+    report: dict
+
+
+def search_hyperparameters(model, param_distributions, X_train, y_train, config=None):
+    '''
+    Successive-halving search over the number of trees, with the other
+    parameters sampled at random from param_distributions.
+    The best configuration is refit on the whole training set,
+    so search.best_estimator_ can be used directly.
+    '''
+    try:
+        config = config or HyperparameterSearchConfig()
+
+        # The search already runs the fits in parallel: one thread per forest inside it,
+        # instead of n_jobs forests each starting n_jobs threads
+        search_model = clone(model)
+        if "n_jobs" in search_model.get_params():
+            search_model.set_params(n_jobs=1)
+
+        search = HalvingRandomSearchCV(
+            search_model,
+            param_distributions,
+            n_candidates=config.n_candidates,
+            resource=config.resource,
+            min_resources=config.min_resources,
+            max_resources=config.max_resources,
+            factor=config.factor,
+            cv=config.cv,
+            refit=False,
+            n_jobs=config.n_jobs,
+            random_state=config.random_state,
+        )
+
+        start = time.perf_counter()
+        search.fit(X_train, y_train)
+        elapsed = time.perf_counter() - start
+
+        # The final refit runs alone: it uses the model's own n_jobs
+        best_estimator = clone(model).set_params(**search.best_params_).fit(X_train, y_train)
+
+        # Fit time and C-index of every evaluated configuration
+        results = search.cv_results_
+        for i, params in enumerate(results["params"]):
+            logging.info(
+                f"[search] round={results['iter'][i]} {config.resource}={results['n_resources'][i]} "
+                f"params={params} fit_time={results['mean_fit_time'][i]:.2f}s "
+                f"c_index={results['mean_test_score'][i]:.4f}"
+            )
+
+        logging.info(
+            f"Hyperparameter search done in {elapsed:.1f}s "
+            f"({len(results['params'])} fits x {config.cv} folds), "
+            f"best params: {search.best_params_}, best CV C-index: {search.best_score_:.4f}"
+        )
+
+        report = {
+            "strategy": "halving",
+            "best_params": search.best_params_,
+            "best_cv_c_index": float(search.best_score_),
+            "search_seconds": elapsed,
+            "configurations": [
+                {
+                    "round": int(results["iter"][i]),
+                    config.resource: int(results["n_resources"][i]),
+                    "params": params,
+                    "fit_time": float(results["mean_fit_time"][i]),
+                    "c_index": float(results["mean_test_score"][i]),
+                }
+                for i, params in enumerate(results["params"])
+            ],
+        }
+
+        return SearchResult(
+            best_estimator_=best_estimator,
+            best_params_=search.best_params_,
+            best_score_=search.best_score_,
+            report=report,
+        )
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def grid_search(model, param_grid, X_train, y_train, config=None):
+    '''
+    Cross-validated grid search (C-index, the score of sksurv estimators),
+    refit on the whole training set.
+    '''
+    try:
+        config = config or GridSearchConfig()
+
+        search = GridSearchCV(model, param_grid, cv=config.cv, refit=True, n_jobs=config.n_jobs)
+        start = time.perf_counter()
+        search.fit(X_train, y_train)
+        elapsed = time.perf_counter() - start
+
+        results = search.cv_results_
+        logging.info(
+            f"Grid search done in {elapsed:.1f}s ({len(results['params'])} configurations x {config.cv} folds), "
+            f"best params: {search.best_params_}, best CV C-index: {search.best_score_:.4f}"
+        )
+
+        report = {
+            "strategy": "grid",
+            "best_params": search.best_params_,
+            "best_cv_c_index": float(search.best_score_),
+            "search_seconds": elapsed,
+            "configurations": [
+                {
+                    "params": params,
+                    "fit_time": float(results["mean_fit_time"][i]),
+                    "c_index": float(results["mean_test_score"][i]),
+                }
+                for i, params in enumerate(results["params"])
+            ],
+        }
+
+        return SearchResult(
+            best_estimator_=search.best_estimator_,
+            best_params_=search.best_params_,
+            best_score_=search.best_score_,
+            report=report,
+        )
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def _grow_forest_on_fold(model, params, X, y, train_idx, val_idx, checkpoints):
+    '''
+    Grows one forest with warm_start through every checkpoint and scores it
+    on the held-out fold. Only the trees added since the previous checkpoint
+    are evaluated: the forest risk score is the mean of the tree risk scores.
+    '''
+    event_field, time_field = y.dtype.names
+    y_val = y[val_idx]
+    # Converted once to the layouts the forest uses (CSC to fit, CSR to predict),
+    # so X is not re-validated at every checkpoint and every tree
+    X_fit = check_array(X[train_idx], dtype=np.float32, accept_sparse="csc")
+    X_val = check_array(X[val_idx], dtype=np.float32, accept_sparse="csr")
+
+    # Folds x candidates already run in parallel: one core per forest (no nested parallelism)
+    forest = clone(model).set_params(warm_start=True, n_jobs=1, **params)
+    risk_sum = np.zeros(len(val_idx))
+    scores, fit_times = [], []
+    fit_time = 0.0
+
+    for n_estimators in checkpoints:
+        n_before = len(getattr(forest, "estimators_", []))
+
+        start = time.perf_counter()
+        forest.set_params(n_estimators=n_estimators).fit(X_fit, y[train_idx])
+        fit_time += time.perf_counter() - start
+
+        for tree in forest.estimators_[n_before:]:
+            risk_sum += tree.predict(X_val)
+
+        c_index = concordance_index_censored(y_val[event_field], y_val[time_field], risk_sum / n_estimators)[0]
+        scores.append(c_index)
+        fit_times.append(fit_time)
+
+    return scores, fit_times
+
+
+def warm_start_search(model, param_space, X_train, y_train, config=None):
+    '''
+    For every configuration of the other parameters, grows a single forest
+    with warm_start and scores it at each n_estimators checkpoint on the CV
+    folds: the full n_estimators curve costs about as much as the largest fit.
+    Keeps the smallest forest within tolerance of the best CV C-index and
+    refits it on the whole training set.
+    '''
+    try:
+        config = config or WarmStartSearchConfig()
+        checkpoints = sorted(config.n_estimators_checkpoints)
+
+        if all(isinstance(values, list) for values in param_space.values()):
+            candidates = list(ParameterGrid(param_space))
+        else:
+            candidates = list(ParameterSampler(
+                param_space, n_iter=config.n_candidates, random_state=config.random_state
+            ))
+
+        folds = list(KFold(n_splits=config.cv, shuffle=True, random_state=config.random_state).split(X_train))
+
+        start = time.perf_counter()
+        fold_results = Parallel(n_jobs=config.n_jobs)(
+            delayed(_grow_forest_on_fold)(model, params, X_train, y_train, train_idx, val_idx, checkpoints)
+            for params in candidates
+            for train_idx, val_idx in folds
+        )
+        elapsed = time.perf_counter() - start
+
+        # fold_results is ordered candidate by candidate, fold by fold
+        scores = np.array([scores for scores, _ in fold_results]).reshape(len(candidates), len(folds), -1)
+        fit_times = np.array([times for _, times in fold_results]).reshape(len(candidates), len(folds), -1)
+        mean_scores = scores.mean(axis=1)
+
+        curves = []
+        for params, candidate_scores, candidate_std, candidate_times in zip(
+            candidates, mean_scores, scores.std(axis=1), fit_times.mean(axis=1)
+        ):
+            curves.append({
+                "params": params,
+                "n_estimators": checkpoints,
+                "mean_c_index": candidate_scores.tolist(),
+                "std_c_index": candidate_std.tolist(),
+                "cumulative_fit_time": candidate_times.tolist(),
+            })
+            logging.info(
+                f"[warm-start] params={params} "
+                + " ".join(f"{n}:{c:.4f}" for n, c in zip(checkpoints, candidate_scores))
+                + f" fit_time={candidate_times[-1]:.2f}s"
+            )
+
+        # Smallest forest within tolerance of the best score, best candidate at that size
+        best_score = mean_scores.max()
+        within_tolerance = mean_scores >= best_score - config.tolerance
+        checkpoint_idx = int(np.argmax(within_tolerance.any(axis=0)))
+        candidate_idx = int(np.argmax(np.where(within_tolerance[:, checkpoint_idx], mean_scores[:, checkpoint_idx], -np.inf)))
+
+        best_params = dict(candidates[candidate_idx], n_estimators=checkpoints[checkpoint_idx])
+        # The final refit runs alone: it uses the model's own n_jobs
+        best_estimator = clone(model).set_params(**best_params).fit(X_train, y_train)
+
+        logging.info(
+            f"Warm-start search done in {elapsed:.1f}s ({len(candidates)} configurations x {config.cv} folds), "
+            f"best CV C-index: {best_score:.4f}, selected {best_params} "
+            f"(CV C-index {mean_scores[candidate_idx, checkpoint_idx]:.4f})"
+        )
+
+        report = {
+            "strategy": "warm_start",
+            "best_params": best_params,
+            "best_cv_c_index": float(best_score),
+            "selected_cv_c_index": float(mean_scores[candidate_idx, checkpoint_idx]),
+            "tolerance": config.tolerance,
+            "search_seconds": elapsed,
+            "curves": curves,
+        }
+
+        return SearchResult(
+            best_estimator_=best_estimator,
+            best_params_=best_params,
+            best_score_=float(mean_scores[candidate_idx, checkpoint_idx]),
+            report=report,
+        )
+
+    except Exception as e:
+        raise CustomException(e, sys)
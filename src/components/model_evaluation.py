@@ -0,0 +1,227 @@
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+from joblib import Parallel, delayed
+from sksurv.metrics import (
+    concordance_index_censored, concordance_index_ipcw, cumulative_dynamic_auc, integrated_brier_score
+)
+from sksurv.nonparametric import CensoringDistributionEstimator
+
+from src.exception import CustomException
+from src.logger import logging
+from src.utils import save_json, survival_at_horizons
+
+
+@dataclass
+class EvaluationConfig:
+    # Years at which AUC and Brier score are reported; the IBS is integrated between the first and last one
+    horizons: list = field(default_factory=lambda: [1, 2, 3, 5])
+    ibs_points: int = 50
+    n_bootstrap: int = 1000
+    confidence: float = 0.95
+    # Bootstrap replicates are split in chunks evaluated by parallel threads (NumPy releases the GIL)
+    n_jobs: int = -1
+    chunk_size: int = 100
+    random_state: int = 42
+    report_file_path: str = os.path.join("artifacts", "evaluation_report.json")
+
+
+def _survival_fields(y):
+    event_field, time_field = y.dtype.names
+    return y[event_field].astype(bool), y[time_field].astype(np.float64)
+
+
+def _pairwise_concordance(risk_scores, tied_tol=1e-8):
+    # K[i, j] = 1 if i is ranked riskier than j, 0.5 on ties (same tolerance as scikit-survival)
+    difference = risk_scores[:, None] - risk_scores[None, :]
+    ties = np.abs(difference) <= tied_tol
+    return (difference > 0) * ~ties + 0.5 * ties
+
+
+class EvaluationStatistics:
+    '''
+    Every metric written as a function of the per-patient bootstrap counts W
+    (n_replicates, n_patients), from matrices computed once from the predictions:
+    the C-indexes and AUCs are ratios of quadratic forms W A W^T, the Brier
+    scores are linear in W. W = 1 gives the usual (point) estimates.
+    '''
+    def __init__(self, y_train, y_test, risk_scores, survival, horizons, ibs_times, ibs_survival):
+        event, event_time = _survival_fields(y_test)
+        censoring = CensoringDistributionEstimator().fit(y_train)
+        concordance = _pairwise_concordance(risk_scores)
+
+        # Harrell: i had the event before j's time (or at the time j was censored)
+        comparable = event[:, None] & (
+            (event_time[:, None] < event_time[None, :])
+            | ((event_time[:, None] == event_time[None, :]) & ~event[None, :])
+        )
+        self.harrell = (comparable * concordance, comparable.astype(np.float64))
+
+        # Uno: same pairs weighted by 1 / G(t_i)^2, truncated at the last horizon
+        tau = max(horizons)
+        ipcw = censoring.predict_ipcw(y_test) ** 2
+        uno_pairs = comparable * (event_time[:, None] < tau) * ipcw[:, None]
+        self.uno = (uno_pairs * concordance, uno_pairs)
+
+        # Cumulative/dynamic AUC: cases (event by t, weighted by 1 / G(t_i)) against controls (alive at t)
+        case_weight = censoring.predict_ipcw(y_test)
+        self.auc = []
+        for horizon in horizons:
+            cases = case_weight * (event_time <= horizon)
+            controls = (event_time > horizon).astype(np.float64)
+            self.auc.append((cases, controls, concordance))
+
+        # Brier score contributions of every patient at the horizons and on the IBS grid
+        prob_cens_y = censoring.predict_proba(event_time)
+        prob_cens_y[prob_cens_y == 0] = np.inf
+
+        def brier_contributions(times, estimate):
+            prob_cens_t = censoring.predict_proba(times)
+            prob_cens_t[prob_cens_t == 0] = np.inf
+            is_case = (event_time[:, None] <= times[None, :]) & event[:, None]
+            is_control = event_time[:, None] > times[None, :]
+            return (np.square(estimate) * is_case / prob_cens_y[:, None]
+                    + np.square(1.0 - estimate) * is_control / prob_cens_t[None, :])
+
+        self.brier = brier_contributions(np.asarray(horizons, dtype=np.float64), survival)
+        self.ibs_times = ibs_times
+        self.ibs = brier_contributions(ibs_times, ibs_survival)
+
+    @staticmethod
+    def _quadratic_ratio(weights, numerator, denominator):
+        return ((weights @ numerator) * weights).sum(1) / ((weights @ denominator) * weights).sum(1)
+
+    def evaluate(self, weights):
+        '''
+        Metrics for every row of weights: dict of arrays (n_replicates,) or (n_replicates, n_horizons).
+        '''
+        n_patients = weights.sum(1, keepdims=True)
+        auc = np.column_stack([
+            ((weights * cases) @ concordance * (weights * controls)).sum(1)
+            / ((weights @ cases) * (weights @ controls))
+            for cases, controls, concordance in self.auc
+        ])
+        ibs_curves = (weights @ self.ibs) / n_patients
+        return {
+            "harrell_c_index": self._quadratic_ratio(weights, *self.harrell),
+            "uno_c_index": self._quadratic_ratio(weights, *self.uno),
+            "auc": auc,
+            "brier_score": (weights @ self.brier) / n_patients,
+            "integrated_brier_score": np.trapezoid(ibs_curves, self.ibs_times, axis=1)
+            / (self.ibs_times[-1] - self.ibs_times[0]),
+        }
+
+
+def bootstrap_weights(n_patients, n_replicates, rng):
+    '''
+    Resampling with replacement as counts: row b holds how many times each patient is drawn.
+    '''
+    draws = rng.integers(0, n_patients, size=(n_replicates, n_patients))
+    weights = np.zeros((n_replicates, n_patients))
+    np.add.at(weights, (np.arange(n_replicates)[:, None], draws), 1.0)
+    return weights
+
+
+def confidence_interval(estimate, replicates, confidence):
+    '''
+    Point estimate, percentile interval and standard error of every column of replicates.
+    '''
+    alpha = (1 - confidence) / 2
+    low, high = np.nanquantile(replicates, [alpha, 1 - alpha], axis=0)
+    return {
+        "estimate": estimate,
+        "ci_low": low,
+        "ci_high": high,
+        "std": np.nanstd(replicates, axis=0),
+    }
+
+
+class ModelEvaluation:
+    def __init__(self, config=None):
+        self.evaluation_config = config or EvaluationConfig()
+
+    def initiate_model_evaluation(self, model, X_test, y_test, y_train):
+        '''
+        Harrell's and Uno's C-index, cumulative/dynamic AUC, Brier score at the horizons and
+        integrated Brier score, with bootstrap confidence intervals. The model predicts once;
+        every replicate reuses those predictions. Saves and returns the report.
+        '''
+        try:
+            config = self.evaluation_config
+            start = time.perf_counter()
+            event, event_time = _survival_fields(y_test)
+
+            # Horizons must fall inside the follow-up of the test set
+            horizons = [h for h in sorted(config.horizons) if event_time.min() <= h < event_time.max()]
+            if len(horizons) < len(config.horizons):
+                logging.warning(f"Horizons outside the test follow-up dropped: kept {horizons}")
+            ibs_times = np.linspace(horizons[0], horizons[-1], config.ibs_points)
+
+            # --- Predictions, computed once ---
+            times = np.concatenate([horizons, ibs_times])
+            risk_scores, survival = survival_at_horizons(model, X_test, times)
+            survival, ibs_survival = survival[:, :len(horizons)], survival[:, len(horizons):]
+            predict_seconds = time.perf_counter() - start
+
+            statistics = EvaluationStatistics(
+                y_train, y_test, risk_scores, survival, horizons, ibs_times, ibs_survival
+            )
+            point = {name: values[0] for name, values in statistics.evaluate(np.ones((1, len(risk_scores)))).items()}
+
+            # --- Bootstrap: vectorized over chunks of replicates, chunks in parallel threads ---
+            rng = np.random.default_rng(config.random_state)
+            chunks = [
+                bootstrap_weights(len(risk_scores), min(config.chunk_size, config.n_bootstrap - offset), rng)
+                for offset in range(0, config.n_bootstrap, config.chunk_size)
+            ]
+            results = Parallel(n_jobs=config.n_jobs, prefer="threads")(
+                delayed(statistics.evaluate)(weights) for weights in chunks
+            )
+            replicates = {name: np.concatenate([result[name] for result in results]) for name in point}
+            intervals = {
+                name: confidence_interval(point[name], replicates[name], config.confidence) for name in point
+            }
+
+            # Per-horizon metrics keyed by horizon
+            for name in ("auc", "brier_score"):
+                intervals[name] = {
+                    str(horizon): {key: value[i] for key, value in intervals[name].items()}
+                    for i, horizon in enumerate(horizons)
+                }
+
+            # Reference values from scikit-survival (point estimates only)
+            _, mean_auc = cumulative_dynamic_auc(y_train, y_test, risk_scores, horizons)
+            reference = {
+                "harrell_c_index": concordance_index_censored(event, event_time, risk_scores)[0],
+                "uno_c_index": concordance_index_ipcw(y_train, y_test, risk_scores, tau=max(horizons))[0],
+                "integrated_brier_score": integrated_brier_score(y_train, y_test, ibs_survival, ibs_times),
+                "mean_auc": mean_auc,
+            }
+
+            report = {
+                "n_test": len(risk_scores),
+                "n_events": int(event.sum()),
+                "horizons": horizons,
+                "n_bootstrap": config.n_bootstrap,
+                "confidence": config.confidence,
+                "metrics": intervals,
+                "scikit_survival_reference": reference,
+                "predict_seconds": predict_seconds,
+                "total_seconds": time.perf_counter() - start,
+            }
+            save_json(config.report_file_path, report)
+
+            harrell, uno, ibs = (intervals[name] for name in ("harrell_c_index", "uno_c_index", "integrated_brier_score"))
+            logging.info(
+                f"[evaluation] Harrell C={harrell['estimate']:.4f} [{harrell['ci_low']:.4f}, {harrell['ci_high']:.4f}] "
+                f"Uno C={uno['estimate']:.4f} [{uno['ci_low']:.4f}, {uno['ci_high']:.4f}] "
+                f"IBS={ibs['estimate']:.4f} [{ibs['ci_low']:.4f}, {ibs['ci_high']:.4f}] "
+                f"({config.n_bootstrap} bootstrap replicates in {report['total_seconds']:.1f}s)"
+            )
+            return report
+
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -0,0 +1,229 @@
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from joblib import Parallel, delayed
+from scipy import sparse
+from sksurv.metrics import concordance_index_censored
+
+from src.exception import CustomException
+from src.logger import logging
+from src.utils import save_object, save_json, survival_at_horizons
+
+
+@dataclass
+class ExplanationConfig:
+    enabled: bool = True
+    # Permutation importance: every input feature is shuffled n_repeats times on the test split
+    n_repeats: int = 5
+    # Features are spread over joblib workers (-1: every core); the repeats of a feature share one predict call
+    n_jobs: int = -1
+    # Training patients the per-patient contributions are measured against
+    background_size: int = 16
+    random_state: int = 42
+    explainer_file_path: str = os.path.join("artifacts", "explainer.pkl")
+    report_file_path: str = os.path.join("artifacts", "permutation_importance.json")
+
+
+def feature_group(name):
+    '''
+    Input a transformed column comes from: the clinical column for the ColumnTransformer
+    outputs ("num_pipeline__WBC", "cat_pipelines__CENTER_MSK", "cyto_pipeline__CYTO_COMPLEX"),
+    the gene for the per-gene molecular columns (indicator and VAFs), the column itself otherwise.
+    '''
+    transformer, _, column = name.rpartition("__")
+    if transformer == "cyto_pipeline":
+        return "CYTOGENETICS"
+    if transformer == "cat_pipelines":
+        return column.split("_", 1)[0]
+    if transformer:
+        return column
+    for prefix in ("VAF_MAX_", "VAF_MEAN_", "GENE_"):
+        if column.startswith(prefix):
+            return "GENE_" + column[len(prefix):]
+    return column
+
+
+def feature_groups(feature_names):
+    '''
+    Ordered {input feature: indexes of its transformed columns}.
+    '''
+    groups = {}
+    for index, name in enumerate(feature_names):
+        groups.setdefault(feature_group(name), []).append(index)
+    return {group: np.asarray(columns) for group, columns in groups.items()}
+
+
+def _dense(X):
+    return np.asarray(X.toarray() if sparse.issparse(X) else X, dtype=np.float32)
+
+
+def _permuted_c_indexes(predictor, X, event, event_time, columns, n_repeats, seed):
+    '''
+    C-index after each of n_repeats shuffles of the given columns (shuffled together, the
+    same row permutation for all of them). The repeats are stacked into one predict call.
+    '''
+    rng = np.random.default_rng(seed)
+    n_samples = X.shape[0]
+    stacked = np.tile(X, (n_repeats, 1))
+    for repeat in range(n_repeats):
+        rows = slice(repeat * n_samples, (repeat + 1) * n_samples)
+        stacked[rows, columns] = X[rng.permutation(n_samples)][:, columns]
+
+    risk_scores = predictor.predict(stacked).reshape(n_repeats, n_samples)
+    return np.array([concordance_index_censored(event, event_time, risk)[0] for risk in risk_scores])
+
+
+def permutation_importance(predictor, X, y, groups, n_repeats=5, n_jobs=-1, random_state=42):
+    '''
+    Drop of the C-index when each group of columns is shuffled.
+    Returns {group: (mean drop, std drop)} and the unshuffled C-index.
+    '''
+    X = _dense(X)
+    event_field, time_field = y.dtype.names
+    event, event_time = y[event_field].astype(bool), y[time_field]
+    baseline = concordance_index_censored(event, event_time, predictor.predict(X))[0]
+
+    # One seed per group: the result does not depend on how the groups are scheduled
+    c_indexes = Parallel(n_jobs=n_jobs)(
+        delayed(_permuted_c_indexes)(predictor, X, event, event_time, columns, n_repeats, [random_state, index])
+        for index, columns in enumerate(groups.values())
+    )
+    importance = {
+        group: (float(np.mean(baseline - values)), float(np.std(baseline - values)))
+        for group, values in zip(groups, c_indexes)
+    }
+    return importance, baseline
+
+
+class FeatureExplainer:
+    '''
+    Per-patient contributions of every input feature: how much the prediction moves
+    when the feature takes the values of background (training) patients instead of the
+    patient's own. All perturbed rows of a patient go through the model in one batch.
+    '''
+    def __init__(self, feature_names, background, expected_risk, importance=None, source_digest=None):
+        groups = feature_groups(feature_names)
+        self.feature_names = list(feature_names)
+        self.group_names = list(groups)
+        self.background = _dense(background)
+        self.expected_risk = float(expected_risk)
+        self.importance = importance or {}
+        # content_digest of the model file the explainer was built for (checked by the registry)
+        self.source_digest = source_digest
+
+        # Perturbed row g * K + k: group g of the patient replaced by background patient k.
+        # Stored as the (row, column, value) entries written over the patient's row
+        n_background = len(self.background)
+        rows, columns, values = [], [], []
+        for group_index, group_columns in enumerate(groups.values()):
+            for k in range(n_background):
+                rows.append(np.full(len(group_columns), group_index * n_background + k))
+                columns.append(group_columns)
+                values.append(self.background[k, group_columns])
+        self.perturb_rows = np.concatenate(rows)
+        self.perturb_columns = np.concatenate(columns)
+        self.perturb_values = np.concatenate(values)
+
+    @property
+    def n_rows(self):
+        return len(self.group_names) * len(self.background)
+
+    def perturbations(self, x):
+        '''
+        Batch to predict for the patient row x: x itself first, then only the perturbed rows
+        that differ from x (e.g. a gene neither the patient nor the background patient has
+        mutated changes nothing). position maps every perturbed row to its batch row (0: x).
+        '''
+        changed = self.perturb_values != x[self.perturb_columns]
+        differs = np.zeros(self.n_rows, dtype=bool)
+        differs[self.perturb_rows[changed]] = True
+
+        position = np.zeros(self.n_rows, dtype=np.intp)
+        position[differs] = np.arange(1, differs.sum() + 1)
+
+        batch = np.repeat(x[None, :], differs.sum() + 1, axis=0)
+        batch[position[self.perturb_rows[changed]], self.perturb_columns[changed]] = self.perturb_values[changed]
+        return batch, position
+
+    def explain(self, predictor, X, time_horizons):
+        '''
+        Risk score, survival at time_horizons and per-feature contributions of one patient
+        (X: one transformed row). A contribution is the patient's prediction minus the mean
+        prediction with that feature taken from the background patients: positive risk
+        contributions raise the risk score, negative survival contributions lower survival.
+        '''
+        x = _dense(X)[0]
+        batch, position = self.perturbations(x)
+        risk_scores, survival = survival_at_horizons(predictor, batch, time_horizons)
+
+        shape = (len(self.group_names), len(self.background))
+        perturbed_risk = risk_scores[position].reshape(shape).mean(1)
+        perturbed_survival = survival[position].reshape(shape + (survival.shape[1],)).mean(1)
+        return {
+            "risk_score": float(risk_scores[0]),
+            "survival": survival[0],
+            "risk_contribution": risk_scores[0] - perturbed_risk,
+            "survival_contribution": survival[0] - perturbed_survival,
+            "batch_rows": len(batch),
+        }
+
+
+class ModelExplanation:
+    def __init__(self, config=None):
+        self.explanation_config = config or ExplanationConfig()
+
+    def initiate_model_explanation(self, predictor, train_data, test_data, source_digest=None):
+        '''
+        Permutation importance of every input feature on the test split, then the
+        FeatureExplainer served by the app (background sampled from the training split).
+        Saves both and returns the importance report.
+        '''
+        try:
+            config = self.explanation_config
+            start = time.perf_counter()
+            groups = feature_groups(train_data.feature_names)
+
+            importance, baseline = permutation_importance(
+                predictor, test_data.X, test_data.y, groups, config.n_repeats, config.n_jobs, config.random_state
+            )
+            importance_seconds = time.perf_counter() - start
+
+            rng = np.random.default_rng(config.random_state)
+            background_rows = np.sort(rng.choice(
+                train_data.n_samples, min(config.background_size, train_data.n_samples), replace=False
+            ))
+            background = train_data.X[background_rows]
+            explainer = FeatureExplainer(
+                train_data.feature_names, background,
+                expected_risk=predictor.predict(_dense(background)).mean(),
+                importance={group: mean for group, (mean, _) in importance.items()},
+                source_digest=source_digest,
+            )
+            save_object(file_path=config.explainer_file_path, obj=explainer)
+
+            ranking = sorted(importance.items(), key=lambda item: -item[1][0])
+            report = {
+                "c_index": baseline,
+                "n_repeats": config.n_repeats,
+                "n_features": len(groups),
+                "seconds": importance_seconds,
+                "importance": [
+                    {"feature": group, "importance_mean": mean, "importance_std": std, "n_columns": len(groups[group])}
+                    for group, (mean, std) in ranking
+                ],
+                "explainer": {"background_size": len(background_rows), "perturbed_rows": explainer.n_rows},
+            }
+            save_json(config.report_file_path, report)
+
+            logging.info(
+                f"[explanation] permutation importance of {len(groups)} features x {config.n_repeats} repeats "
+                f"in {importance_seconds:.1f}s, top: "
+                + ", ".join(f"{group}={mean:.4f}" for group, (mean, _) in ranking[:5])
+            )
+            return report
+
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -0,0 +1,252 @@
+import os
+import re
+import sys
+import time
+import dataclasses
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+import numpy as np
+from scipy import sparse
+from sklearn.base import BaseEstimator, clone
+from sksurv.ensemble import (
+    ComponentwiseGradientBoostingSurvivalAnalysis, GradientBoostingSurvivalAnalysis, RandomSurvivalForest
+)
+from sksurv.linear_model import CoxnetSurvivalAnalysis
+from threadpoolctl import threadpool_limits
+
+from src.exception import CustomException
+from src.logger import logging
+from src.utils import save_object, load_object, save_json, evaluate_models, survival_at_horizons
+from src.components.forest_engine import CompiledForest, is_survival_forest
+from src.components.hyperparameter_search import GridSearchConfig, WarmStartSearchConfig
+
+
+class DenseInputModel(BaseEstimator):
+    '''
+    Survival model that only accepts dense input (CoxNet, component-wise boosting):
+    the CSR feature matrix is densified before every call.
+    '''
+    def __init__(self, estimator):
+        self.estimator = estimator
+
+    @staticmethod
+    def _dense(X):
+        return X.toarray() if sparse.issparse(X) else X
+
+    def fit(self, X, y):
+        self.estimator_ = clone(self.estimator).fit(self._dense(X), y)
+        return self
+
+    def predict(self, X):
+        return self.estimator_.predict(self._dense(X))
+
+    def predict_survival_function(self, X, return_array=False):
+        return self.estimator_.predict_survival_function(self._dense(X), return_array=return_array)
+
+    def predict_cumulative_hazard_function(self, X, return_array=False):
+        return self.estimator_.predict_cumulative_hazard_function(self._dense(X), return_array=return_array)
+
+    def score(self, X, y):
+        return self.estimator_.score(self._dense(X), y)
+
+    @property
+    def unique_times_(self):
+        return self.estimator_.unique_times_
+
+
+def model_families():
+    '''
+    Candidate model families: name -> (estimator, parameter space, search config).
+    The search n_jobs is set by the scheduler from the core budget.
+    '''
+    return {
+        "Random Survival Forest": (
+            RandomSurvivalForest(random_state=42),
+            {"min_samples_leaf": [5, 10, 20], "max_features": ["sqrt"], "max_depth": [None, 10]},
+            WarmStartSearchConfig(),
+        ),
+        "Gradient Boosting Survival": (
+            GradientBoostingSurvivalAnalysis(random_state=42),
+            {"learning_rate": [0.05, 0.1], "n_estimators": [200], "max_depth": [3], "subsample": [0.8]},
+            GridSearchConfig(),
+        ),
+        "CoxNet": (
+            DenseInputModel(CoxnetSurvivalAnalysis(l1_ratio=0.5, fit_baseline_model=True)),
+            {"estimator__alphas": [[0.1], [0.03], [0.01]]},
+            GridSearchConfig(),
+        ),
+        "Componentwise Gradient Boosting": (
+            DenseInputModel(ComponentwiseGradientBoostingSurvivalAnalysis(random_state=42)),
+            {"estimator__n_estimators": [100, 300], "estimator__learning_rate": [0.1]},
+            GridSearchConfig(),
+        ),
+    }
+
+
+@dataclass
+class LeaderboardConfig:
+    # Families evaluated (keys of model_families()); all of them by default
+    families: list = field(default_factory=lambda: list(model_families()))
+    # Cores shared by the whole leaderboard
+    n_cores: int = field(default_factory=lambda: int(os.environ.get("TRAIN_CORES", os.cpu_count() or 1)))
+    # Families trained at the same time (None: as many as the budget allows);
+    # each one gets n_cores // outer_jobs cores
+    outer_jobs: int = None
+    # Single-patient serving latency (p50) a model must stay under to be selected
+    latency_budget_ms: float = 50.0
+    latency_rows: int = 50
+    time_horizons: list = field(default_factory=lambda: [3])
+    work_dir: str = os.path.join("artifacts", "leaderboard")
+    report_file_path: str = os.path.join("artifacts", "leaderboard.json")
+
+
+def core_split(n_cores, n_families, outer_jobs=None):
+    '''
+    (outer, inner): families trained concurrently and cores given to each one,
+    with outer * inner <= n_cores.
+    '''
+    outer = max(1, min(outer_jobs or n_cores, n_families, n_cores))
+    return outer, max(1, n_cores // outer)
+
+
+def serving_predictor(model):
+    '''
+    What the registry predicts with: the compiled forest for survival forests, the model otherwise.
+    '''
+    if is_survival_forest(model):
+        return CompiledForest.from_forest(model)
+    return model
+
+
+def predict_latency(predictor, X, time_horizons, n_rows):
+    '''
+    p50 latency (ms) of survival_at_horizons on single rows.
+    '''
+    seconds = []
+    for row in range(min(n_rows, X.shape[0])):
+        start = time.perf_counter()
+        survival_at_horizons(predictor, X[row:row + 1], time_horizons)
+        seconds.append(time.perf_counter() - start)
+    return float(np.median(seconds) * 1000)
+
+
+def _train_family(name, model, params, search_config, n_jobs, data, model_file_path, config):
+    '''
+    Runs in a pool worker: searches one family with n_jobs cores,
+    saves the refitted model and returns its leaderboard row.
+    '''
+    X_train, y_train, X_test, y_test = data
+    # The family's cores go to the search (candidates x folds, one core each) and to the final
+    # refit (forest n_jobs); BLAS stays single-threaded
+    if "n_jobs" in model.get_params():
+        model = clone(model).set_params(n_jobs=n_jobs)
+    search_config = dataclasses.replace(search_config, n_jobs=n_jobs)
+
+    with threadpool_limits(limits=1):
+        start = time.perf_counter()
+        models = {name: model}
+        scores, search_reports = evaluate_models(
+            X_train, y_train, X_test, y_test, models, {name: params}, search_config
+        )
+        fit_seconds = time.perf_counter() - start
+
+        best_model = models[name]
+        latency_ms = predict_latency(serving_predictor(best_model), X_test, config.time_horizons, config.latency_rows)
+
+    save_object(model_file_path, best_model, artifact_format="mmap")
+    return {
+        "model": name,
+        "test_c_index": float(scores[name]),
+        "cv_c_index": float(search_reports[name]["best_cv_c_index"]),
+        "best_params": search_reports[name]["best_params"],
+        "fit_seconds": fit_seconds,
+        "predict_p50_ms": latency_ms,
+        "n_jobs": n_jobs,
+        "model_file_path": model_file_path,
+    }
+
+
+def select_model(rows, latency_budget_ms):
+    '''
+    Best cross-validated C-index among the rows within the latency budget
+    (the fastest model when none is). The test split is only reported.
+    '''
+    within_budget = [row for row in rows if row["predict_p50_ms"] <= latency_budget_ms]
+    if within_budget:
+        return max(within_budget, key=lambda row: row["cv_c_index"])
+    logging.warning(f"No model within the {latency_budget_ms} ms latency budget, selecting the fastest one")
+    return min(rows, key=lambda row: row["predict_p50_ms"])
+
+
+class ModelLeaderboard:
+    def __init__(self, config=None):
+        self.leaderboard_config = config or LeaderboardConfig()
+
+    def run(self, X_train, y_train, X_test, y_test):
+        '''
+        Trains the model families in a process pool under the core budget.
+        Returns (selected model, leaderboard report).
+        '''
+        try:
+            config = self.leaderboard_config
+            families = model_families()
+            unknown = set(config.families) - set(families)
+            if unknown:
+                raise ValueError(f"Unknown model families: {sorted(unknown)} (expected some of {list(families)})")
+
+            outer, inner = core_split(config.n_cores, len(config.families), config.outer_jobs)
+            logging.info(
+                f"Leaderboard: {len(config.families)} families, {config.n_cores} cores "
+                f"= {outer} concurrent families x {inner} cores"
+            )
+
+            os.makedirs(config.work_dir, exist_ok=True)
+            data = (X_train, y_train, X_test, y_test)
+            rows = []
+            with ProcessPoolExecutor(max_workers=outer) as executor:
+                futures = {}
+                for name in config.families:
+                    model, params, search_config = families[name]
+                    model_file_path = os.path.join(config.work_dir, re.sub(r"\W+", "_", name.lower()) + ".pkl")
+                    futures[executor.submit(
+                        _train_family, name, model, params, search_config, inner, data, model_file_path, config
+                    )] = name
+
+                for future in as_completed(futures):
+                    try:
+                        row = future.result()
+                    except Exception as e:
+                        # One failing family does not stop the others
+                        logging.error(f"[leaderboard] {futures[future]} failed: {e}")
+                        continue
+                    rows.append(row)
+                    logging.info(
+                        f"[leaderboard] {row['model']}: CV C-index={row['cv_c_index']:.4f} "
+                        f"test C-index={row['test_c_index']:.4f} "
+                        f"fit={row['fit_seconds']:.1f}s predict p50={row['predict_p50_ms']:.2f}ms"
+                    )
+
+            if not rows:
+                raise RuntimeError("Every model family failed")
+
+            rows.sort(key=lambda row: -row["cv_c_index"])
+            selected = select_model(rows, config.latency_budget_ms)
+            report = {
+                "n_cores": config.n_cores,
+                "outer_jobs": outer,
+                "inner_jobs": inner,
+                "latency_budget_ms": config.latency_budget_ms,
+                "selected": selected["model"],
+                "leaderboard": rows,
+            }
+            save_json(config.report_file_path, report)
+            logging.info(
+                f"[leaderboard] selected {selected['model']} (CV C-index {selected['cv_c_index']:.4f}, "
+                f"test C-index {selected['test_c_index']:.4f})"
+            )
+
+            return load_object(selected["model_file_path"]), report
+
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -2,92 +2,182 @@ import os
 import sys
 from dataclasses import dataclass
 
+from scipy.stats import randint
+from sklearn.model_selection import train_test_split
 from sksurv.ensemble import RandomSurvivalForest
-from sksurv.util import Surv
 
 from src.exception import CustomException
 from src.logger import logging
 
-from src.utils import save_object, evaluate_models
+from src.utils import save_object, save_json, evaluate_models, content_digest
+from src.components.forest_engine import CompiledForest, is_survival_forest
+from src.components.model_leaderboard import LeaderboardConfig, ModelLeaderboard
+from src.components.model_evaluation import EvaluationConfig, ModelEvaluation
+from src.components.model_explanation import ExplanationConfig, ModelExplanation
+from src.components.forest_compression import ForestCompression, ForestCompressionConfig
+from src.components.hyperparameter_search import HyperparameterSearchConfig, WarmStartSearchConfig
 
 @dataclass
 class ModelTrainerConfig:
     trained_model_file_path = os.path.join("artifacts", "model.pkl")
+    # "mmap": raw array buffers (faster load; sklearn trees still copy them when unpickled), "pickle": plain pickle
+    artifact_format = "mmap"
+    # None, or "zlib" / "lzma" for archival (compressed artifacts are not memory-mapped)
+    artifact_compression = None
+    training_report_file_path = os.path.join("artifacts", "training_report.json")
+    # Flat-array export of the forest loaded by the serving side (see CompiledForest)
+    engine_file_path = os.path.join("artifacts", "forest_engine.pkl")
+    # Fixed time grid + quantized leaf curves (+ optional tree pruning), tuned on a validation fold
+    # held out of the training split (opt-in)
+    compression_config = ForestCompressionConfig()
+    # Harrell/Uno C-index, time-dependent AUC and (integrated) Brier score with bootstrap CIs
+    evaluation_config = EvaluationConfig()
+    # Permutation importance (C-index drop per input feature) and the per-patient explainer served by the app
+    explanation_config = ExplanationConfig()
+    # "warm_start": n_estimators curve per configuration, "halving": successive halving + random search,
+    # "leaderboard": RSF, gradient boosting, CoxNet and component-wise boosting compared (process pool)
+    search_strategy = "warm_start"
+    leaderboard_config = LeaderboardConfig()
+    warm_start_search_config = WarmStartSearchConfig()
+    halving_search_config = HyperparameterSearchConfig()
 
 class ModelTrainer:
     def __init__(self):
         self.model_trainer_config = ModelTrainerConfig()
 
-    def initiate_model_trainer(self, train_array, test_array):
+    def initiate_model_trainer(self, train_data, test_data):
         try:
             logging.info("Split training and test input data")
             
             # --- 1. DATA PREPARATION ---
-            # X = All columns except the last two
-            X_train = train_array[:, :-2]
-            X_test = test_array[:, :-2]
-
-            # y = The last two columns (Status and Time)
-            
-            y_train_status = train_array[:, -2].astype(bool) 
-            y_train_time = train_array[:, -1]               
-            
-            y_test_status = test_array[:, -2].astype(bool)
-            y_test_time = test_array[:, -1]
-
-            # Create the structured array expected by the model
-            y_train = Surv.from_arrays(event=y_train_status, time=y_train_time)
-            y_test = Surv.from_arrays(event=y_test_status, time=y_test_time)
+            # SurvivalDataset: feature matrix + structured (event, time) target
+            X_train, y_train = train_data.X, train_data.y
+            X_test, y_test = test_data.X, test_data.y
+
+            compression_config = self.model_trainer_config.compression_config
+            if compression_config.enabled:
+                # The compression is tuned and reported on patients the model is not fitted on,
+                # and the test split stays untouched until the final evaluation
+                X_train, X_val, y_train, y_val = train_test_split(
+                    X_train, y_train,
+                    test_size=compression_config.validation_fraction,
+                    random_state=compression_config.random_state,
+                    stratify=y_train[y_train.dtype.names[0]],
+                )
+                logging.info(f"{X_val.shape[0]} training patients held out for the forest compression")
 
             logging.info("Input data formatted for Survival Analysis")
 
-            # --- 2. SINGLE MODEL DEFINITION ---
-            models = {
-                "Random Survival Forest": RandomSurvivalForest(
-                    random_state=42, 
-                    n_jobs=-1  
+            if self.model_trainer_config.search_strategy == "leaderboard":
+                # --- 2-4. MODEL FAMILIES TRAINED CONCURRENTLY ---
+                # Best cross-validated C-index among the models within the serving latency budget
+                # (the test split is only scored and reported, it does not choose the model)
+                best_model, leaderboard = ModelLeaderboard(self.model_trainer_config.leaderboard_config).run(
+                    X_train, y_train, X_test, y_test
                 )
-            }
-
-            # --- 3. HYPERPARAMETER GRID (GRID SEARCH) ---
-    
-            params = {
-                "Random Survival Forest": {
-                    'n_estimators': [50, 100, 150],      
-                    'min_samples_leaf': [5, 10, 20],     
-                    'max_features': ['sqrt'],            
-                    'max_depth': [None, 10]            
+                save_json(self.model_trainer_config.training_report_file_path, {"leaderboard": leaderboard})
+                best_model_name = leaderboard["selected"]
+                best_model_score = best_model.score(X_test, y_test)
+            else:
+                # --- 2. SINGLE MODEL DEFINITION ---
+                models = {
+                    "Random Survival Forest": RandomSurvivalForest(
+                        random_state=42, 
+                        n_jobs=-1  
+                    )
                 }
-            }
 
-            # --- 4. EVALUATION VIA UTILS (With GridCV) ---
-            model_report: dict = evaluate_models(
-                X_train=X_train, y_train=y_train, 
-                X_test=X_test, y_test=y_test,
-                models=models, param=params
-            )
+                # --- 3. HYPERPARAMETER SPACE ---
+                # n_estimators is not part of the space: it is grown with warm_start
+                # (checkpoints in WarmStartSearchConfig) or used as the halving resource
+                if self.model_trainer_config.search_strategy == "warm_start":
+                    search_config = self.model_trainer_config.warm_start_search_config
+                    params = {
+                        "Random Survival Forest": {
+                            'min_samples_leaf': [5, 10, 20],
+                            'max_features': ['sqrt'],
+                            'max_depth': [None, 10]
+                        }
+                    }
+                else:
+                    search_config = self.model_trainer_config.halving_search_config
+                    params = {
+                        "Random Survival Forest": {
+                            'min_samples_leaf': randint(3, 31),
+                            'max_features': ['sqrt', 'log2', 0.3],
+                            'max_depth': [None, 5, 10, 20]
+                        }
+                    }
+
+                # --- 4. EVALUATION VIA UTILS ---
+                model_report, search_reports = evaluate_models(
+                    X_train=X_train, y_train=y_train, 
+                    X_test=X_test, y_test=y_test,
+                    models=models, param=params,
+                    search_config=search_config
+                )
+
+                # Search results (n_estimators curves or halving rounds) go to the training report
+                save_json(self.model_trainer_config.training_report_file_path, {"models": search_reports})
             
-            # Retrieve the score of the (single) model
-            best_model_score = max(sorted(model_report.values()))
+                # Retrieve the score of the (single) model
+                best_model_score = max(sorted(model_report.values()))
 
-            # Retrieve the model name
-            best_model_name = list(model_report.keys())[
-                list(model_report.values()).index(best_model_score)
-            ]
+                # Retrieve the model name
+                best_model_name = list(model_report.keys())[
+                    list(model_report.values()).index(best_model_score)
+                ]
             
-            best_model = models[best_model_name]
+                best_model = models[best_model_name]
 
-            logging.info(f"Random Forest trained. Best C-Index found: {best_model_score}")
+            logging.info(f"{best_model_name} trained. Best C-Index found: {best_model_score}")
 
             if best_model_score < 0.5:
                 raise CustomException("Model is not better than random guessing")
             
             save_object(
                 file_path=self.model_trainer_config.trained_model_file_path,
-                obj=best_model
+                obj=best_model,
+                artifact_format=self.model_trainer_config.artifact_format,
+                compress=self.model_trainer_config.artifact_compression
             )
 
-            # --- 5. FINAL SCORE ---
+            predictor = best_model
+            # The engine and the explainer record the digest of the model file they were built from
+            model_digest = content_digest(self.model_trainer_config.trained_model_file_path)
+            # Files of a previous run that do not match this model are removed
+            stale_files = [compression_config.compressed_engine_file_path, compression_config.report_file_path]
+            if is_survival_forest(best_model):
+                engine = predictor = CompiledForest.from_forest(best_model, source_digest=model_digest)
+                save_object(
+                    file_path=self.model_trainer_config.engine_file_path,
+                    obj=engine,
+                    artifact_format=self.model_trainer_config.artifact_format
+                )
+
+                if compression_config.enabled:
+                    ForestCompression(compression_config).initiate_forest_compression(engine, X_val, y_val)
+                    stale_files = []
+            else:
+                # Other model families are served as they are: no engine left over from a previous forest
+                stale_files.append(self.model_trainer_config.engine_file_path)
+
+            for file_path in stale_files:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+
+            # --- 5. EVALUATION REPORT (next to model.pkl) ---
+            ModelEvaluation(self.model_trainer_config.evaluation_config).initiate_model_evaluation(
+                predictor, X_test, y_test, y_train
+            )
+
+            # --- 6. EXPLANATIONS ---
+            if self.model_trainer_config.explanation_config.enabled:
+                ModelExplanation(self.model_trainer_config.explanation_config).initiate_model_explanation(
+                    predictor, train_data, test_data, source_digest=model_digest
+                )
+
+            # --- 7. FINAL SCORE ---
             # Return the C-Index on the test set
             final_score = best_model.score(X_test, y_test)
             return final_score
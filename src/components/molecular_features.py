@@ -0,0 +1,158 @@
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from src.exception import CustomException
+from src.logger import logging
+
+MOLECULAR_COLUMNS = ["ID", "GENE", "EFFECT", "VAF"]
+MOLECULAR_DTYPES = {"ID": str, "GENE": str, "EFFECT": str, "VAF": np.float64}
+
+
+@dataclass
+class MolecularFeatureConfig:
+    # Genes mutated in fewer training patients are left out of the vocabulary
+    min_patients_per_gene: int = 10
+    min_patients_per_effect: int = 10
+    # Rows read at once from the molecular file
+    chunk_size: int = 100_000
+
+
+def iter_molecular_chunks(source, chunk_size):
+    '''
+    Yields DataFrames with the ID, GENE, EFFECT and VAF columns from a CSV path
+    (read in chunks), a DataFrame, or a list of mutation records.
+    '''
+    if isinstance(source, str):
+        yield from pd.read_csv(source, usecols=MOLECULAR_COLUMNS, dtype=MOLECULAR_DTYPES, chunksize=chunk_size)
+        return
+
+    df = source if isinstance(source, pd.DataFrame) else pd.DataFrame(list(source))
+    df = df.reindex(columns=MOLECULAR_COLUMNS)
+    # At least one (possibly empty) chunk, so patients without mutations still get a row
+    for start in range(0, max(len(df), 1), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+
+class MolecularFeatureBuilder:
+    '''
+    Per-patient molecular features built from the mutation table:
+    gene indicators, counts per effect, max and mean VAF per gene.
+    All aggregations are vectorized groupbys over chunks of the file, and the
+    result is a sparse patient x feature matrix. The gene/effect vocabulary is
+    learned once on the training patients and reused at inference.
+    '''
+    def __init__(self, config=None):
+        self.molecular_config = config or MolecularFeatureConfig()
+
+    def fit(self, source, patient_ids=None):
+        try:
+            train_ids = pd.Index(patient_ids) if patient_ids is not None else None
+            gene_pairs, effect_pairs = [], []
+
+            for chunk in iter_molecular_chunks(source, self.molecular_config.chunk_size):
+                if train_ids is not None:
+                    chunk = chunk[chunk["ID"].isin(train_ids)]
+                gene_pairs.append(chunk[["ID", "GENE"]].dropna().drop_duplicates())
+                effect_pairs.append(chunk[["ID", "EFFECT"]].dropna().drop_duplicates())
+
+            # A (patient, gene) pair can span two chunks: deduplicate again before counting
+            gene_counts = pd.concat(gene_pairs).drop_duplicates()["GENE"].value_counts()
+            effect_counts = pd.concat(effect_pairs).drop_duplicates()["EFFECT"].value_counts()
+
+            self.genes_ = np.sort(
+                gene_counts.index[gene_counts >= self.molecular_config.min_patients_per_gene].to_numpy(dtype=str)
+            )
+            self.effects_ = np.sort(
+                effect_counts.index[effect_counts >= self.molecular_config.min_patients_per_effect].to_numpy(dtype=str)
+            )
+
+            logging.info(f"Molecular vocabulary: {len(self.genes_)} genes, {len(self.effects_)} effects")
+            return self
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def get_feature_names_out(self):
+        return np.concatenate([
+            "GENE_" + self.genes_.astype(object),
+            "EFFECT_" + self.effects_.astype(object),
+            "VAF_MAX_" + self.genes_.astype(object),
+            "VAF_MEAN_" + self.genes_.astype(object),
+        ]).astype(object)
+
+    def transform(self, source, patient_ids):
+        '''
+        Returns a CSR float32 matrix with one row per patient of patient_ids
+        (patients without mutations get an empty row).
+        '''
+        try:
+            patient_index = pd.Index(patient_ids)
+            if not patient_index.is_unique:
+                # A patient listed twice (e.g. the same ID in two requests of a batch) gets the same row twice
+                unique_ids = patient_index.unique()
+                return self.transform(source, unique_ids)[unique_ids.get_indexer(patient_index)]
+
+            gene_index = pd.Index(self.genes_)
+            effect_index = pd.Index(self.effects_)
+            n_genes, n_effects = len(gene_index), len(effect_index)
+
+            gene_parts, effect_parts = [], []
+            for chunk in iter_molecular_chunks(source, self.molecular_config.chunk_size):
+                rows = patient_index.get_indexer(chunk["ID"])
+                gene_cols = gene_index.get_indexer(chunk["GENE"])
+                effect_cols = effect_index.get_indexer(chunk["EFFECT"])
+
+                keep = (rows >= 0) & (gene_cols >= 0)
+                genes = pd.DataFrame({"row": rows[keep], "col": gene_cols[keep], "VAF": chunk["VAF"].to_numpy()[keep]})
+                gene_parts.append(
+                    genes.groupby(["row", "col"]).agg(
+                        vaf_sum=("VAF", "sum"), vaf_count=("VAF", "count"), vaf_max=("VAF", "max")
+                    )
+                )
+
+                keep = (rows >= 0) & (effect_cols >= 0)
+                effects = pd.DataFrame({"row": rows[keep], "col": effect_cols[keep]})
+                effect_parts.append(effects.groupby(["row", "col"]).size().rename("count"))
+
+            # Partial aggregates of each chunk are combined (sum of sums/counts, max of maxima)
+            genes = pd.concat(gene_parts).groupby(level=["row", "col"]).agg(
+                {"vaf_sum": "sum", "vaf_count": "sum", "vaf_max": "max"}
+            )
+            effects = pd.concat(effect_parts).groupby(level=["row", "col"]).sum()
+
+            gene_rows = genes.index.get_level_values("row").to_numpy()
+            gene_cols = genes.index.get_level_values("col").to_numpy()
+            effect_rows = effects.index.get_level_values("row").to_numpy()
+            effect_cols = effects.index.get_level_values("col").to_numpy()
+
+            vaf_count = genes["vaf_count"].to_numpy()
+            vaf_mean = np.divide(
+                genes["vaf_sum"].to_numpy(), vaf_count, out=np.zeros(len(genes)), where=vaf_count > 0
+            )
+            vaf_max = np.nan_to_num(genes["vaf_max"].to_numpy())
+
+            # Blocks: [gene indicators | effect counts | VAF max | VAF mean]
+            rows = np.concatenate([gene_rows, effect_rows, gene_rows, gene_rows])
+            cols = np.concatenate([
+                gene_cols,
+                n_genes + effect_cols,
+                n_genes + n_effects + gene_cols,
+                2 * n_genes + n_effects + gene_cols,
+            ])
+            data = np.concatenate([np.ones(len(gene_rows)), effects.to_numpy(), vaf_max, vaf_mean])
+
+            matrix = sparse.csr_matrix(
+                (data.astype(np.float32), (rows, cols)),
+                shape=(len(patient_index), 3 * n_genes + n_effects),
+                dtype=np.float32,
+            )
+            # Explicit zeros (e.g. VAF of 0) are not worth storing
+            matrix.eliminate_zeros()
+            return matrix
+
+        except Exception as e:
+            raise CustomException(e, sys)
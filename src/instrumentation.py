@@ -0,0 +1,169 @@
+import os
+import sys
+import json
+import time
+import threading
+from collections import Counter as StackCounter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+
+from src.logger import logging
+from src.metrics import metrics
+
+# Stages range from sub-millisecond inference steps to minutes of training
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Spans of the request being handled in this thread / context (None outside trace_request)
+_current_trace = ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def span(stage):
+    '''
+    Times a pipeline stage or inference sub-step: feeds the
+    stage_duration_seconds histogram and the call/error counters,
+    and adds the duration to the current request trace.
+    '''
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        metrics.counter("stage_errors_total", "Stages that raised an exception", labels={"stage": stage}).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.histogram(
+            "stage_duration_seconds", "Duration of pipeline stages and inference sub-steps",
+            buckets=STAGE_BUCKETS, labels={"stage": stage},
+        ).observe(elapsed)
+        metrics.counter("stage_calls_total", "Calls of pipeline stages and inference sub-steps", labels={"stage": stage}).inc()
+
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.append((stage, elapsed))
+
+
+def traced(stage):
+    '''
+    Decorator version of span().
+    '''
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def trace_request(route):
+    '''
+    Collects the spans of one request and logs them as a single JSON line;
+    also feeds the per-route request counter and latency histogram.
+    '''
+    spans = []
+    token = _current_trace.set(spans)
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield spans
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _current_trace.reset(token)
+
+        metrics.counter("http_requests_total", "Requests handled", labels={"route": route, "status": status}).inc()
+        metrics.histogram(
+            "http_request_duration_seconds", "Request latency", buckets=STAGE_BUCKETS, labels={"route": route}
+        ).observe(elapsed)
+
+        logging.info("[trace] " + json.dumps({
+            "route": route,
+            "status": status,
+            "total_ms": round(elapsed * 1000, 3),
+            "spans": [{"stage": stage, "ms": round(seconds * 1000, 3)} for stage, seconds in spans],
+        }))
+
+
+@dataclass
+class ProfilingConfig:
+    # Opt-in: PROFILE_REQUESTS=1 samples the stack of every request
+    enabled: bool = field(default_factory=lambda: os.environ.get("PROFILE_REQUESTS", "0") == "1")
+    interval_ms: float = field(default_factory=lambda: float(os.environ.get("PROFILE_INTERVAL_MS", "2")))
+    # Only requests slower than this are dumped
+    min_duration_ms: float = field(default_factory=lambda: float(os.environ.get("PROFILE_MIN_DURATION_MS", "0")))
+    output_dir: str = field(default_factory=lambda: os.environ.get("PROFILE_DIR", os.path.join("artifacts", "profiles")))
+
+
+class SamplingProfiler:
+    '''
+    Samples the Python stack of one thread from a background thread every
+    interval seconds. The dump is in the collapsed-stack format
+    ("outer;inner count" lines) read by flamegraph.pl and speedscope.
+    '''
+    def __init__(self, thread_id=None, interval=0.002):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = StackCounter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        if stack:
+            self.samples[";".join(reversed(stack))] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def dump(self, file_path):
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        with open(file_path, "w") as file_obj:
+            for stack, count in self.samples.most_common():
+                file_obj.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profile_request(route, config=None):
+    '''
+    When profiling is enabled, samples the current thread during the request
+    and writes one collapsed-stack file per (slow enough) request.
+    '''
+    config = config or ProfilingConfig()
+    if not config.enabled:
+        yield
+        return
+
+    profiler = SamplingProfiler(interval=config.interval_ms / 1000).start()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms >= config.min_duration_ms:
+            file_name = f"{time.strftime('%Y%m%d_%H%M%S')}_{route}_{elapsed_ms:.0f}ms_{threading.get_ident()}.folded"
+            file_path = os.path.join(config.output_dir, file_name)
+            profiler.dump(file_path)
+            logging.info(f"[profile] {route}: {sum(profiler.samples.values())} samples written to {file_path}")
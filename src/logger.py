@@ -1,16 +1,165 @@
-import logging
 import os
-from datetime import datetime
+import sys
+import json
+import queue
+import atexit
+import threading
+import logging as _logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
 
-LOG_FILE=f'{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log'
-logs_path=os.path.join(os.getcwd(), 'logs', LOG_FILE)
-os.makedirs(logs_path,exist_ok=True)
+# Pid of the process that writes (and rotates) the log file, inherited by its children
+LOG_OWNER_ENV = "SRC_LOG_OWNER_PID"
 
-LOG_FILE_PATH=os.path.join(logs_path,LOG_FILE)
 
-logging.basicConfig(
-    filename=LOG_FILE_PATH,
-    format="[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO
-)
+@dataclass
+class LoggingConfig:
+    # One location for every process (workers, training runs), rotated instead of one directory per run
+    log_dir: str = field(default_factory=lambda: os.environ.get("LOG_DIR", os.path.join(os.getcwd(), "logs")))
+    file_name: str = "app.log"
+    level: str = field(default_factory=lambda: os.environ.get("LOG_LEVEL", "INFO").upper())
+    # "size": rotate at max_bytes, "time": rotate at midnight
+    rotation: str = field(default_factory=lambda: os.environ.get("LOG_ROTATION", "size"))
+    max_bytes: int = 10 * 1024 * 1024
+    backup_count: int = 5
+    # Records waiting for the writer thread; beyond that they are dropped instead of blocking the caller
+    queue_size: int = 10000
 
+
+class JsonFormatter(_logging.Formatter):
+    '''
+    One JSON object per line.
+    '''
+    def format(self, record):
+        payload = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "line": record.lineno,
+            "process": record.process,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    '''
+    QueueHandler that never blocks the request path: records are dropped
+    (and counted) when the writer thread falls behind.
+    '''
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+_logger = _logging.getLogger("src")
+_listener = None
+_setup_lock = threading.Lock()
+_forked = False
+
+
+def _is_child_process():
+    '''
+    True in a forked child (gunicorn worker) or a process started by the file's owner
+    (e.g. a spawned pool worker): rotation renames the file, so only one process may write it.
+    '''
+    owner = os.environ.get(LOG_OWNER_ENV)
+    return _forked or (owner is not None and owner != str(os.getpid()))
+
+
+def setup_logging(config=None):
+    '''
+    Configures the "src" logger on first use: records are formatted and written
+    by a background listener thread, callers only enqueue them. The first process
+    writes the rotating file, its children (gunicorn workers, process pools) write
+    the same JSON lines to stderr.
+    '''
+    global _listener
+    if _listener is not None:
+        return _logger
+
+    with _setup_lock:
+        if _listener is not None:
+            return _logger
+
+        config = config or LoggingConfig()
+        if _is_child_process():
+            handler = _logging.StreamHandler(sys.stderr)
+        else:
+            os.environ[LOG_OWNER_ENV] = str(os.getpid())
+            os.makedirs(config.log_dir, exist_ok=True)
+            file_path = os.path.join(config.log_dir, config.file_name)
+            if config.rotation == "time":
+                handler = TimedRotatingFileHandler(file_path, when="midnight", backupCount=config.backup_count)
+            else:
+                handler = RotatingFileHandler(file_path, maxBytes=config.max_bytes, backupCount=config.backup_count)
+        handler.setFormatter(JsonFormatter())
+
+        log_queue = queue.Queue(config.queue_size)
+        _logger.setLevel(config.level)
+        _logger.addHandler(DroppingQueueHandler(log_queue))
+        _logger.propagate = False
+
+        _listener = QueueListener(log_queue, handler)
+        _listener.start()
+        return _logger
+
+
+def shutdown_logging():
+    '''
+    Flushes the queued records and stops the writer thread.
+    '''
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        for handler in list(_logger.handlers):
+            _logger.removeHandler(handler)
+
+
+def _reset_after_fork():
+    # The writer thread does not survive fork (e.g. gunicorn --preload): the child sets up its own on first use
+    global _listener, _setup_lock, _forked
+    _listener = None
+    _setup_lock = threading.Lock()
+    _forked = True
+    for handler in list(_logger.handlers):
+        _logger.removeHandler(handler)
+    for name in ("debug", "info", "warning", "error", "exception", "critical", "log"):
+        logging.__dict__.pop(name, None)
+
+
+class _LazyLogger:
+    '''
+    Stands in for the logging module in `from src.logger import logging`:
+    logging.info(...) sets up the subsystem on the first call only, so importing
+    src has no filesystem side effect.
+    '''
+    DEBUG = _logging.DEBUG
+    INFO = _logging.INFO
+    WARNING = _logging.WARNING
+    ERROR = _logging.ERROR
+    CRITICAL = _logging.CRITICAL
+
+    def __getattr__(self, name):
+        value = getattr(setup_logging(), name)
+        # Bound methods are cached: later calls skip __getattr__
+        setattr(self, name, value)
+        return value
+
+
+logging = _LazyLogger()
+
+atexit.register(shutdown_logging)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,194 @@
+import threading
+from bisect import bisect_left
+
+# Default latency buckets (seconds) shared by every histogram that doesn't define its own
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(labels):
+    '''
+    Prometheus label set: {stage="transform"} (empty string without labels).
+    '''
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in sorted(labels.items())) + "}"
+
+
+class Counter:
+    '''
+    Monotonic counter (number of requests, cache hits, swaps, ...).
+    '''
+    prometheus_type = "counter"
+
+    def __init__(self, name, description="", labels=None):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def snapshot(self):
+        return {"type": "counter", "value": self._value}
+
+    def prometheus_samples(self):
+        return [(self.name, self.labels, self._value)]
+
+
+class Gauge:
+    '''
+    Value that can go up and down (queue depth, startup time, ...).
+    '''
+    prometheus_type = "gauge"
+
+    def __init__(self, name, description="", labels=None):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        with self._lock:
+            self._value = float(value)
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1.0):
+        with self._lock:
+            self._value -= amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def snapshot(self):
+        return {"type": "gauge", "value": self._value}
+
+    def prometheus_samples(self):
+        return [(self.name, self.labels, self._value)]
+
+
+class Histogram:
+    '''
+    Bucketed distribution of observations (latencies, batch sizes, ...).
+    '''
+    prometheus_type = "histogram"
+
+    def __init__(self, name, description="", buckets=DEFAULT_BUCKETS, labels=None):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self.buckets = tuple(sorted(buckets))
+        # One extra slot for observations above the last bucket (+Inf)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def sum(self):
+        return self._sum
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+
+        # Cumulative counts, like Prometheus "le" buckets
+        cumulative = {}
+        running = 0
+        for bound, bucket_count in zip(list(self.buckets) + ["+Inf"], counts):
+            running += bucket_count
+            cumulative[str(bound)] = running
+
+        return {"type": "histogram", "count": count, "sum": total, "buckets": cumulative}
+
+    def prometheus_samples(self):
+        snapshot = self.snapshot()
+        samples = [
+            (f"{self.name}_bucket", dict(self.labels, le=bound), count)
+            for bound, count in snapshot["buckets"].items()
+        ]
+        samples.append((f"{self.name}_sum", self.labels, snapshot["sum"]))
+        samples.append((f"{self.name}_count", self.labels, snapshot["count"]))
+        return samples
+
+
+class MetricsRegistry:
+    '''
+    Process-wide collection of named metrics.
+    Metrics are created on first use, so modules can declare them at import time.
+    '''
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, description, labels=None, **kwargs):
+        # One metric per (name, label set), e.g. stage_duration_seconds{stage="transform"}
+        key = name + format_labels(labels)
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = cls(name, description, labels=labels, **kwargs)
+                self._metrics[key] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {key} already registered as {type(metric).__name__}")
+            return metric
+
+    def counter(self, name, description="", labels=None):
+        return self._get_or_create(Counter, name, description, labels)
+
+    def gauge(self, name, description="", labels=None):
+        return self._get_or_create(Gauge, name, description, labels)
+
+    def histogram(self, name, description="", buckets=DEFAULT_BUCKETS, labels=None):
+        return self._get_or_create(Histogram, name, description, labels, buckets=buckets)
+
+    def snapshot(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+        return {key: metric.snapshot() for key, metric in sorted(metrics.items())}
+
+    def render_prometheus(self):
+        '''
+        All metrics in the Prometheus text exposition format (version 0.0.4).
+        '''
+        with self._lock:
+            # Grouped by name: the samples of a metric family must be contiguous
+            metrics = [metric for _, metric in sorted(self._metrics.items(), key=lambda item: (item[1].name, item[0]))]
+
+        lines = []
+        described = set()
+        for metric in metrics:
+            # HELP/TYPE once per metric name, whatever the number of label sets
+            if metric.name not in described:
+                described.add(metric.name)
+                lines.append(f"# HELP {metric.name} {metric.description}")
+                lines.append(f"# TYPE {metric.name} {metric.prometheus_type}")
+            for sample_name, labels, value in metric.prometheus_samples():
+                lines.append(f"{sample_name}{format_labels(labels)} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
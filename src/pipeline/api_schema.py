@@ -0,0 +1,255 @@
+import math
+
+# Fields of CustomData. Missing lab values are allowed (null): the preprocessor imputes them
+CLINICAL_SCHEMA = {
+    "BM_BLAST": {"type": "number", "nullable": True, "minimum": 0, "maximum": 100},
+    "WBC": {"type": "number", "nullable": True, "minimum": 0},
+    "ANC": {"type": "number", "nullable": True, "minimum": 0},
+    "MONOCYTES": {"type": "number", "nullable": True, "minimum": 0},
+    "HB": {"type": "number", "nullable": True, "minimum": 0},
+    "PLT": {"type": "number", "nullable": True, "minimum": 0},
+    # Derived from the mutation list; when sent, it must match it
+    "Nmut": {"type": "number", "required": False, "nullable": True, "minimum": 0},
+    "CENTER": {"type": "string", "max_length": 64},
+    "CYTOGENETICS": {"type": "string", "required": False, "nullable": True, "max_length": 1024},
+}
+
+# One row of the mutation table (same columns as molecular_train.csv)
+MUTATION_SCHEMA = {
+    "GENE": {"type": "string", "max_length": 32},
+    "EFFECT": {"type": "string", "required": False, "nullable": True, "max_length": 64},
+    "VAF": {"type": "number", "required": False, "nullable": True, "minimum": 0, "maximum": 1},
+}
+
+# The model uses per-gene / per-effect / VAF features: the mutations are required
+# ([] for a patient without any detected mutation), otherwise they would silently count as none
+PATIENT_SCHEMA = dict(CLINICAL_SCHEMA, mutations={"type": "object_array", "items": MUTATION_SCHEMA, "max_items": 200})
+# Patients of a /predictbatch body may carry their ID, returned with their scores
+COHORT_PATIENT_SCHEMA = dict(PATIENT_SCHEMA, ID={"type": "string", "required": False, "nullable": True, "max_length": 64})
+
+PATIENT_FIELDS = list(CLINICAL_SCHEMA)
+NUMERIC_FIELDS = [name for name, rule in CLINICAL_SCHEMA.items() if rule["type"] == "number"]
+STRING_FIELDS = [name for name, rule in CLINICAL_SCHEMA.items() if rule["type"] == "string"]
+
+# Horizons (years) a request may ask for, on top of the patient fields
+HORIZONS_RULE = {"type": "number_array", "required": False, "exclusive_minimum": 0, "max_items": 20}
+# Number of feature contributions returned by /api/v1/explain
+TOP_RULE = {"type": "number", "required": False, "minimum": 1, "maximum": 500}
+
+
+class SchemaError(ValueError):
+    '''
+    Invalid request body; errors is the list of {"field", "message"} found.
+    '''
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(f"{error['field']}: {error['message']}" for error in errors))
+
+
+def _number_check(rule, coerce):
+    minimum, maximum = rule.get("minimum"), rule.get("maximum")
+    exclusive_minimum = rule.get("exclusive_minimum")
+
+    def check(value):
+        if coerce and isinstance(value, str):
+            try:
+                value = float(value)
+            except ValueError:
+                return None, "must be a number"
+        # bool is an int subclass: true/false are not numbers here
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return None, "must be a number"
+        try:
+            # JSON integers are unbounded: one with 400 digits does not fit in a float
+            value = float(value)
+        except OverflowError:
+            return None, "must be finite"
+        if not math.isfinite(value):
+            return None, "must be finite"
+        if minimum is not None and value < minimum:
+            return None, f"must be >= {minimum}"
+        if exclusive_minimum is not None and value <= exclusive_minimum:
+            return None, f"must be > {exclusive_minimum}"
+        if maximum is not None and value > maximum:
+            return None, f"must be <= {maximum}"
+        return value, None
+    return check
+
+
+def _string_check(rule):
+    max_length = rule.get("max_length")
+
+    def check(value):
+        if not isinstance(value, str):
+            return None, "must be a string"
+        if max_length is not None and len(value) > max_length:
+            return None, f"must be at most {max_length} characters"
+        return value, None
+    return check
+
+
+def _number_array_check(rule, coerce):
+    number = _number_check(rule, coerce)
+    max_items = rule.get("max_items")
+
+    def check(value):
+        if not isinstance(value, list) or not value:
+            return None, "must be a non-empty array of numbers"
+        if max_items is not None and len(value) > max_items:
+            return None, f"must have at most {max_items} items"
+        items = []
+        for item in value:
+            item, message = number(item)
+            if message is not None:
+                return None, f"items {message}"
+            items.append(item)
+        return items, None
+    return check
+
+
+def _object_array_check(rule, coerce):
+    validate_item = compile_schema(rule["items"], coerce)
+    max_items = rule.get("max_items")
+
+    def check(value):
+        if coerce and isinstance(value, str):
+            # Form text: one item per line, values separated by commas in the order of the item schema
+            value = [
+                dict(zip(rule["items"], (part.strip() for part in line.split(","))))
+                for line in value.splitlines() if line.strip()
+            ]
+        if not isinstance(value, list):
+            return None, "must be an array of objects"
+        if max_items is not None and len(value) > max_items:
+            return None, f"must have at most {max_items} items"
+        items, errors = [], []
+        for index, item in enumerate(value):
+            try:
+                items.append(validate_item(item, path=f"[{index}]."))
+            except SchemaError as e:
+                errors.extend(e.errors)
+        # Errors of the items are returned as a list, with paths relative to the field
+        return (None, errors) if errors else (items, None)
+    return check
+
+
+def compile_schema(schema, coerce=False):
+    '''
+    Turns a schema (field -> rule) into a validator, once: the per-request work is a
+    dict lookup and one closure call per field. The validator returns the cleaned
+    record (every field present, numbers as float) or raises SchemaError.
+    coerce=True also accepts numbers sent as strings (HTML forms), "" meaning null.
+    '''
+    builders = {
+        "number": lambda rule: _number_check(rule, coerce),
+        "string": _string_check,
+        "number_array": lambda rule: _number_array_check(rule, coerce),
+        "object_array": lambda rule: _object_array_check(rule, coerce),
+    }
+    checks = [
+        (
+            name, builders[rule["type"]](rule), rule.get("required", True), rule.get("nullable", False),
+            # Empty form field: an empty list for arrays of objects, null otherwise
+            "" if rule["type"] == "object_array" else None,
+        )
+        for name, rule in schema.items()
+    ]
+    allowed = frozenset(schema)
+
+    def validate(payload, path=""):
+        if not isinstance(payload, dict):
+            raise SchemaError([{"field": path.rstrip(".") or "body", "message": "must be a JSON object"}])
+
+        errors = [
+            {"field": path + name, "message": "unknown field"} for name in payload if name not in allowed
+        ]
+        record = {}
+        for name, check, required, nullable, empty in checks:
+            value = payload.get(name)
+            if coerce and value == "":
+                value = empty
+            if value is None:
+                if name not in payload and required:
+                    errors.append({"field": path + name, "message": "is required"})
+                elif name in payload and not nullable:
+                    errors.append({"field": path + name, "message": "must not be null"})
+                record[name] = None
+                continue
+            record[name], message = check(value)
+            if isinstance(message, list):
+                errors.extend({"field": path + name + error["field"], "message": error["message"]} for error in message)
+            elif message is not None:
+                errors.append({"field": path + name, "message": message})
+
+        if errors:
+            raise SchemaError(errors)
+        return record
+
+    return validate
+
+
+def _patient_validator(schema, coerce=False):
+    '''
+    Validator of a patient record: the schema, then Nmut set to the number of mutations.
+    '''
+    validate = compile_schema(schema, coerce)
+
+    def validate_patient(payload, path=""):
+        record = validate(payload, path)
+        n_mutations = len(record["mutations"])
+        if record["Nmut"] is not None and record["Nmut"] != n_mutations:
+            raise SchemaError([{
+                "field": path + "Nmut", "message": f"must match the {n_mutations} mutations given (or be omitted)"
+            }])
+        record["Nmut"] = float(n_mutations)
+        return record
+
+    return validate_patient
+
+
+validate_patient = _patient_validator(PATIENT_SCHEMA)
+validate_form = _patient_validator(PATIENT_SCHEMA, coerce=True)
+validate_single_request = _patient_validator(dict(PATIENT_SCHEMA, time_horizons=HORIZONS_RULE))
+validate_explain_request = _patient_validator(dict(PATIENT_SCHEMA, time_horizons=HORIZONS_RULE, top=TOP_RULE))
+validate_cohort_patient = _patient_validator(COHORT_PATIENT_SCHEMA)
+_check_horizons = _number_array_check(HORIZONS_RULE, coerce=False)
+
+
+def validate_batch_request(payload, max_patients, validate=validate_patient):
+    '''
+    {"patients": [...], "time_horizons": [...]} or a bare array of patients.
+    Returns (patients, time_horizons or None); errors are reported per patient index.
+    validate: validator of one patient (validate_cohort_patient also accepts an ID).
+    '''
+    if isinstance(payload, list):
+        payload = {"patients": payload}
+    if not isinstance(payload, dict):
+        raise SchemaError([{"field": "body", "message": "must be a JSON object or array"}])
+
+    errors = [
+        {"field": name, "message": "unknown field"} for name in payload if name not in ("patients", "time_horizons")
+    ]
+    patients = payload.get("patients")
+    if not isinstance(patients, list) or not patients:
+        errors.append({"field": "patients", "message": "must be a non-empty array of patients"})
+        patients = []
+    elif len(patients) > max_patients:
+        errors.append({"field": "patients", "message": f"must have at most {max_patients} items"})
+        patients = []
+
+    records = []
+    for index, patient in enumerate(patients):
+        try:
+            records.append(validate(patient, path=f"patients[{index}]."))
+        except SchemaError as e:
+            errors.extend(e.errors)
+
+    time_horizons = None
+    if payload.get("time_horizons") is not None:
+        time_horizons, message = _check_horizons(payload["time_horizons"])
+        if message is not None:
+            errors.append({"field": "time_horizons", "message": message})
+
+    if errors:
+        raise SchemaError(errors)
+    return records, time_horizons
@@ -0,0 +1,344 @@
+import os
+import sys
+import json
+import time
+import argparse
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from src.exception import CustomException
+from src.logger import logging
+from src.components.data_transformation import transform_features, uses_molecular_features
+from src.components.molecular_features import MOLECULAR_COLUMNS
+from src.instrumentation import span
+from src.pipeline.api_schema import CLINICAL_SCHEMA, MUTATION_SCHEMA, SchemaError
+from src.pipeline.predict_pipeline import patient_frames
+from src.pipeline.model_registry import ModelRegistry, ModelRegistryConfig, get_registry
+from src.utils import survival_at_horizons
+
+FEATURE_COLUMNS = ["BM_BLAST", "WBC", "ANC", "MONOCYTES", "HB", "PLT", "Nmut", "CENTER", "CYTOGENETICS"]
+# Rows of a mutation file: the mutation fields of the JSON schema and the patient they belong to
+MUTATION_TABLE_SCHEMA = dict(MUTATION_SCHEMA, ID={"type": "string"})
+
+
+@dataclass
+class BatchPredictConfig:
+    # Number of patients sent through the forest at once
+    chunk_size: int = 5000
+    # Horizons (in years) at which the survival probability is reported
+    time_horizons: list = field(default_factory=lambda: [1, 2, 3, 5])
+
+
+READERS = {
+    "csv": pd.read_csv,
+    "json": lambda source: pd.read_json(source, orient="records"),
+    "parquet": pd.read_parquet,
+}
+
+
+def read_table(source, file_format=None, field="file"):
+    '''
+    Reads a CSV, JSON (array of records) or Parquet file.
+    The format is taken from file_format, or from the file extension.
+    An unreadable file raises SchemaError (a bad upload, not a server error).
+    '''
+    if file_format is None:
+        name = source if isinstance(source, str) else getattr(source, "filename", "") or ""
+        file_format = os.path.splitext(name)[1].lstrip(".").lower() or "csv"
+    if file_format not in READERS:
+        raise SchemaError([{
+            "field": field, "message": f"unsupported format {file_format} (expected csv, json or parquet)"
+        }])
+    try:
+        return READERS[file_format](source)
+    except Exception as e:
+        raise SchemaError([{"field": field, "message": f"could not be read as {file_format}: {e}"}])
+
+
+def check_table(df, schema, field="file"):
+    '''
+    Column checks of a file against the rules of an api_schema schema, vectorized:
+    required columns present, numbers numeric, finite and within range, strings
+    within their maximum length. Missing values are left to the preprocessor's imputers.
+    Returns a copy with numeric columns as float and strings as str; raises SchemaError.
+    '''
+    if df.empty:
+        raise SchemaError([{"field": field, "message": "has no rows"}])
+    df = df.copy()
+    errors = []
+
+    def rows(mask):
+        return f"{int(mask.sum())} rows, first at row {int(np.flatnonzero(mask.to_numpy())[0])}"
+
+    for name, rule in schema.items():
+        if name not in df.columns:
+            if rule.get("required", True):
+                errors.append({"field": f"{field}.{name}", "message": "column is missing"})
+            continue
+        column, present = df[name], df[name].notna()
+
+        if rule["type"] == "number":
+            values = pd.to_numeric(column, errors="coerce").astype(np.float64)
+            checks = [(present & values.isna(), "must be a number"), (values.abs() == np.inf, "must be finite")]
+            if rule.get("minimum") is not None:
+                checks.append((values < rule["minimum"], f"must be >= {rule['minimum']}"))
+            if rule.get("maximum") is not None:
+                checks.append((values > rule["maximum"], f"must be <= {rule['maximum']}"))
+            df[name] = values
+        else:
+            values = column.astype(object).where(~present, column.astype(str))
+            checks = []
+            if rule.get("max_length") is not None:
+                # map, not .str: an all-missing column has no string dtype
+                lengths = values.map(len, na_action="ignore")
+                checks.append((lengths > rule["max_length"], f"must be at most {rule['max_length']} characters"))
+            df[name] = values
+
+        errors.extend(
+            {"field": f"{field}.{name}", "message": f"{message} ({rows(mask)})"} for mask, message in checks if mask.any()
+        )
+
+    if errors:
+        raise SchemaError(errors)
+    return df
+
+
+def read_patients(source, file_format=None):
+    '''
+    Reads and checks a cohort file (columns of CustomData, plus an optional ID).
+    '''
+    return check_table(read_table(source, file_format), CLINICAL_SCHEMA)
+
+
+def read_mutations(source, file_format=None):
+    '''
+    Reads and checks a mutation table (ID, GENE, EFFECT, VAF: one row per mutation)
+    from a CSV, JSON or Parquet file. An empty table is valid: no patient has a mutation.
+    '''
+    molecular_df = read_table(source, file_format, field="mutations")
+    if molecular_df.empty:
+        return mutation_table(molecular_df)
+    return mutation_table(check_table(molecular_df, MUTATION_TABLE_SCHEMA, field="mutations"))
+
+
+def cohort_frames(records):
+    '''
+    Patients validated by api_schema -> (cohort with an ID column, mutation table).
+    Patients sent without an ID are numbered by position ("P0", "P1", ...).
+    '''
+    ids = [record.get("ID") or f"P{i}" for i, record in enumerate(records)]
+    features, molecular = patient_frames(records, ids)
+    return features.rename_axis("ID").reset_index(), molecular
+
+
+def mutation_table(molecular_df):
+    '''
+    Mutation rows in the columns of molecular_train.csv, IDs as strings.
+    '''
+    molecular_df = pd.DataFrame(molecular_df).reindex(columns=MOLECULAR_COLUMNS)
+    return molecular_df.astype({"ID": str})
+
+
+def attach_mutations(df, molecular_df, required):
+    '''
+    Checks a cohort against its mutation table and sets Nmut from it
+    (rows of patients outside the cohort are ignored, e.g. a subset of a cohort file).
+    Raises SchemaError when the model uses mutations and none were sent, or when
+    a Nmut given in the cohort disagrees with the patient's mutation rows: the
+    patients would otherwise be scored as if they had no mutation.
+    '''
+    if molecular_df is None:
+        if required:
+            raise SchemaError([{
+                "field": "mutations",
+                "message": "is required: the model uses per-gene features "
+                           "(send an empty table when no patient has a mutation)",
+            }])
+        return df
+
+    if "ID" not in df.columns:
+        raise SchemaError([{"field": "ID", "message": "is required to match the patients with their mutations"}])
+    df = df.assign(ID=df["ID"].astype(str))
+
+    errors = []
+    duplicated = df["ID"][df["ID"].duplicated()].unique()
+    if len(duplicated):
+        errors.append({"field": "ID", "message": f"must be unique (duplicated: {', '.join(duplicated[:5])})"})
+    if "Nmut" in df.columns:
+        given = pd.to_numeric(df["Nmut"], errors="coerce")
+        counted = df["ID"].map(molecular_df.groupby("ID").size()).fillna(0)
+        mismatch = df["ID"][given.notna() & (given != counted)]
+        if len(mismatch):
+            errors.append({
+                "field": "Nmut",
+                "message": f"does not match the mutation rows of {len(mismatch)} patients "
+                           f"(e.g. {', '.join(mismatch.iloc[:5])})",
+            })
+    if errors:
+        raise SchemaError(errors)
+
+    return add_mutation_counts(df, molecular_df)
+
+
+def add_mutation_counts(df, molecular_df):
+    '''
+    Adds the Nmut column (mutations per patient), computed as in DataIngestion.
+    '''
+    molecular_counts = molecular_df.groupby('ID').size().rename('Nmut')
+    df = df.drop(columns=['Nmut'], errors='ignore').join(molecular_counts, on='ID')
+    df['Nmut'] = df['Nmut'].fillna(0)
+    return df
+
+
+class BatchPredictPipeline:
+    def __init__(self, registry=None, config=None):
+        self.registry = registry or get_registry()
+        self.batch_config = config or BatchPredictConfig()
+
+    def _prepare_features(self, df, ids):
+        features = df.reindex(columns=FEATURE_COLUMNS)
+        # Patient IDs as index: the molecular features are matched on it
+        features.index = ids.to_numpy()
+        # Missing Nmut (no molecular file) is left to the median imputer of the preprocessor
+        return features
+
+    def check_cohort(self, df, molecular=None):
+        '''
+        Validates the cohort and its mutations before any scoring (see attach_mutations).
+        '''
+        return attach_mutations(df, molecular, uses_molecular_features(self.registry.get().preprocessor))
+
+    def predict_chunks(self, df, molecular=None, time_horizons=None):
+        '''
+        Scores the cohort chunk by chunk.
+        Yields one DataFrame per chunk with the risk score and the survival
+        probability at each horizon (the configured ones by default).
+        molecular: optional mutation table (ID, GENE, EFFECT, VAF) of the cohort.
+        '''
+        try:
+            time_horizons = time_horizons or self.batch_config.time_horizons
+            # Same bundle for the whole batch, even if the model is hot-reloaded meanwhile
+            bundle = self.registry.get()
+            model, preprocessor = bundle.predictor, bundle.preprocessor
+
+            ids = df["ID"] if "ID" in df.columns else pd.Series(df.index, index=df.index, name="ID")
+            chunk_size = self.batch_config.chunk_size
+
+            # Row positions of each patient's mutations, so a chunk only sees its own rows
+            mutation_rows = molecular.groupby("ID").indices if molecular is not None else None
+
+            for start in range(0, len(df), chunk_size):
+                chunk = df.iloc[start:start + chunk_size]
+                chunk_ids = ids.iloc[start:start + chunk_size]
+
+                chunk_molecular = None
+                if molecular is not None:
+                    positions = [mutation_rows[i] for i in chunk_ids if i in mutation_rows]
+                    chunk_molecular = molecular.iloc[np.concatenate(positions) if positions else []]
+
+                with span("transform"):
+                    data_scaled = transform_features(
+                        preprocessor, self._prepare_features(chunk, chunk_ids), chunk_molecular
+                    )
+
+                risk_scores, survival = survival_at_horizons(
+                    model, data_scaled, time_horizons
+                )
+
+                result = pd.DataFrame({"ID": chunk_ids.to_numpy()})
+                result["RISK_SCORE"] = risk_scores
+                for j, horizon in enumerate(time_horizons):
+                    result[f"SURVIVAL_{horizon:g}Y"] = survival[:, j]
+
+                yield result
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def predict(self, df, molecular=None):
+        chunks = list(self.predict_chunks(df, molecular))
+        if not chunks:
+            columns = ["ID", "RISK_SCORE"] + [f"SURVIVAL_{h:g}Y" for h in self.batch_config.time_horizons]
+            return pd.DataFrame(columns=columns)
+        return pd.concat(chunks, ignore_index=True)
+
+
+def stream_predictions(pipeline, df, output_format="csv", molecular=None, time_horizons=None):
+    '''
+    Serializes chunk results as they are produced (CSV with a single header, or NDJSON).
+    '''
+    first_chunk = True
+    for result in pipeline.predict_chunks(df, molecular, time_horizons):
+        if output_format == "ndjson":
+            yield "".join(json.dumps(record) + "\n" for record in result.to_dict(orient="records"))
+        else:
+            yield result.to_csv(index=False, header=first_chunk)
+        first_chunk = False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a cohort file with the trained survival model.")
+    parser.add_argument("input", help="Patients file (.csv, .json or .parquet)")
+    parser.add_argument("-o", "--output", required=True, help="Output file (.csv or .parquet)")
+    parser.add_argument("--molecular",
+                        help="Mutation file (ID, GENE, EFFECT, VAF) used to compute Nmut and the gene features "
+                             "per patient; required when the model uses molecular features")
+    parser.add_argument("--format", dest="file_format", help="Force the input format")
+    parser.add_argument("--chunk-size", type=int, default=BatchPredictConfig.chunk_size)
+    parser.add_argument("--horizons", type=float, nargs="+", default=[1, 2, 3, 5],
+                        help="Horizons in years for the survival probabilities")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Cores used by the forest without --engine (-1 = all)")
+    parser.add_argument("--model", default=ModelRegistryConfig.model_file_path)
+    parser.add_argument("--preprocessor", default=ModelRegistryConfig.preprocessor_file_path)
+    parser.add_argument("--engine", default=ModelRegistryConfig.engine_file_path,
+                        help="Compiled forest (built from the model if missing)")
+    parser.add_argument("--no-engine", action="store_true", help="Predict with the scikit-survival forest")
+    args = parser.parse_args(argv)
+
+    try:
+        registry = ModelRegistry(ModelRegistryConfig(
+            model_file_path=args.model, preprocessor_file_path=args.preprocessor,
+            engine_file_path=args.engine, use_engine=not args.no_engine,
+        ))
+        registry.load().model.set_params(n_jobs=args.n_jobs)
+
+        molecular = None
+        try:
+            df = read_patients(args.input, args.file_format)
+            if args.molecular:
+                molecular = read_mutations(args.molecular)
+        except SchemaError as e:
+            parser.error(str(e))
+
+        horizons = [int(h) if float(h).is_integer() else h for h in args.horizons]
+        pipeline = BatchPredictPipeline(
+            registry=registry,
+            config=BatchPredictConfig(chunk_size=args.chunk_size, time_horizons=horizons),
+        )
+        try:
+            # A model with molecular features needs --molecular: without it every patient scores as mutation-free
+            df = pipeline.check_cohort(df, molecular)
+        except SchemaError as e:
+            parser.error(f"{e} (--molecular)")
+
+        start = time.perf_counter()
+        results = pipeline.predict(df, molecular)
+        elapsed = time.perf_counter() - start
+
+        if args.output.endswith(".parquet"):
+            results.to_parquet(args.output, index=False)
+        else:
+            results.to_csv(args.output, index=False)
+
+        message = f"Scored {len(results)} patients in {elapsed:.2f}s ({len(results) / elapsed:.0f} patients/s)"
+        logging.info(message)
+        print(message)
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+if __name__ == "__main__":
+    main()
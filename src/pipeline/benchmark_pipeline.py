@@ -0,0 +1,333 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import itertools
+import resource
+import tracemalloc
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from sksurv.ensemble import RandomSurvivalForest
+
+from src.exception import CustomException
+from src.logger import logging
+from src.utils import save_object, save_json, evaluate_models
+from src.components.data_ingestion import DataIngestion
+from src.components.data_transformation import DataTransformation
+from src.components.hyperparameter_search import WarmStartSearchConfig
+from src.pipeline.model_registry import ModelRegistry, ModelRegistryConfig
+from src.pipeline.predict_pipeline import PredictPipeline
+
+NUMERICAL_COLUMNS = ["BM_BLAST", "WBC", "ANC", "MONOCYTES", "HB", "PLT"]
+
+
+@dataclass
+class BenchmarkConfig:
+    # Synthetic cohorts: the shipped CSVs replicated scale times (new IDs, jittered values)
+    scales: list = field(default_factory=lambda: [1, 10, 100])
+    # Training is the slowest stage (about 3 minutes at 10x): it is skipped above this scale,
+    # and inference uses the model trained at the largest scale below
+    max_train_scale: int = 1
+    repeats: int = 3
+    single_row_requests: int = 200
+    batch_sizes: list = field(default_factory=lambda: [100, 1000, 10000])
+    # A stage regresses when its p50 latency or peak memory grows by more than this fraction
+    tolerance: float = 0.25
+    work_dir: str = os.path.join("artifacts", "benchmark")
+    results_file_path: str = os.path.join("artifacts", "benchmark", "results.json")
+    baseline_file_path: str = os.path.join("benchmarks", "baseline.json")
+    clinical_data_path: str = os.path.join('notebook', 'data', 'X_train', "clinical_train.csv")
+    molecular_data_path: str = os.path.join('notebook', 'data', 'X_train', "molecular_train.csv")
+    target_data_path: str = os.path.join('notebook', 'data', "target_train.csv")
+    random_state: int = 42
+
+
+def make_synthetic_cohort(config, scale, output_dir):
+    '''
+    Writes clinical/molecular/target CSVs with scale copies of every patient.
+    Copies get a new ID and multiplicative noise on the numeric values.
+    Survival times are not jittered: the forest stores a curve over every distinct
+    event time, and real follow-up times repeat.
+    Returns {"clinical": path, "molecular": path, "target": path}.
+    '''
+    rng = np.random.default_rng(config.random_state)
+    clinical = pd.read_csv(config.clinical_data_path)
+    molecular = pd.read_csv(config.molecular_data_path)
+    target = pd.read_csv(config.target_data_path)
+
+    def replicate(df, jitter_columns):
+        copies = []
+        for copy in range(scale):
+            part = df.copy()
+            if copy > 0:
+                part["ID"] = part["ID"] + f"_{copy}"
+                for column in jitter_columns:
+                    part[column] = part[column] * rng.lognormal(0.0, 0.1, len(part))
+            copies.append(part)
+        return pd.concat(copies, ignore_index=True)
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {name: os.path.join(output_dir, f"{name}.csv") for name in ("clinical", "molecular", "target")}
+    replicate(clinical, NUMERICAL_COLUMNS).to_csv(paths["clinical"], index=False)
+    replicate(molecular, ["VAF"]).to_csv(paths["molecular"], index=False)
+    replicate(target, []).to_csv(paths["target"], index=False)
+    return paths
+
+
+def latency_summary(seconds, n_rows=1):
+    '''
+    Latency percentiles (ms) and throughput (rows/s) of repeated timings.
+    '''
+    milliseconds = np.asarray(seconds) * 1000
+    return {
+        "n": len(milliseconds),
+        "p50_ms": float(np.percentile(milliseconds, 50)),
+        "p95_ms": float(np.percentile(milliseconds, 95)),
+        "p99_ms": float(np.percentile(milliseconds, 99)),
+        "mean_ms": float(milliseconds.mean()),
+        "throughput_rows_per_s": float(n_rows / np.mean(seconds)),
+    }
+
+
+def measure(run, repeats, n_rows):
+    '''
+    Runs run() once under tracemalloc for its peak memory (this also warms up
+    lazy loads and caches), then times it repeats times.
+    Returns (summary, result of the last run).
+    '''
+    tracemalloc.start()
+    result = run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = run()
+        seconds.append(time.perf_counter() - start)
+
+    summary = latency_summary(seconds, n_rows)
+    summary["peak_memory_mb"] = peak / 1024 ** 2
+    return summary, result
+
+
+def cpu_model():
+    '''
+    CPU model name (Linux /proc/cpuinfo), or platform.processor() elsewhere.
+    '''
+    try:
+        with open("/proc/cpuinfo") as file_obj:
+            for line in file_obj:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def host_info():
+    '''
+    Hardware and runtime the timings depend on. Two runs are only comparable
+    when every field matches (the host name itself is not compared: identical
+    CI runners get a new one each time).
+    '''
+    return {
+        "machine": platform.machine(),
+        "cpu_model": cpu_model(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def host_mismatch(current, reference):
+    '''
+    Fields of host_info that differ between two runs, as messages (empty: comparable).
+    A baseline without host information is never comparable.
+    '''
+    if not reference:
+        return ["baseline has no host information"]
+    return [
+        f"{name}: {current.get(name)!r} vs baseline {reference.get(name)!r}"
+        for name in current if current.get(name) != reference.get(name)
+    ]
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    '''
+    Returns the regressions as messages: p50 latency or peak memory
+    more than tolerance above the baseline for the same scale and stage.
+    '''
+    regressions = []
+    for scale, stages in results.items():
+        for stage, current in stages.items():
+            reference = baseline.get(scale, {}).get(stage)
+            if reference is None:
+                continue
+            for metric in ("p50_ms", "peak_memory_mb"):
+                if metric in reference and current[metric] > reference[metric] * (1 + tolerance):
+                    regressions.append(
+                        f"{scale}/{stage}: {metric} {current[metric]:.1f} vs baseline {reference[metric]:.1f} "
+                        f"(+{100 * (current[metric] / reference[metric] - 1):.0f}%)"
+                    )
+    return regressions
+
+
+class BenchmarkPipeline:
+    def __init__(self, config=None):
+        self.benchmark_config = config or BenchmarkConfig()
+
+    def run_scale(self, scale, model_paths):
+        '''
+        Benchmarks every stage on the cohort of one scale.
+        model_paths: (model, preprocessor) trained at a previous scale, used when training is skipped.
+        '''
+        config = self.benchmark_config
+        scale_dir = os.path.join(config.work_dir, f"x{scale}")
+        sources = make_synthetic_cohort(config, scale, os.path.join(scale_dir, "data"))
+        results = {}
+
+        # 1. Ingestion
+        ingestion = DataIngestion()
+        ingestion.ingestion_config.persist_data = False
+        ingestion.ingestion_config.clinical_data_path = sources["clinical"]
+        ingestion.ingestion_config.molecular_data_path = sources["molecular"]
+        ingestion.ingestion_config.target_data_path = sources["target"]
+        n_patients = len(pd.read_csv(sources["target"], usecols=["ID"]))
+        results["ingestion"], (train_set, test_set) = measure(
+            ingestion.initiate_data_ingestion, config.repeats, n_patients
+        )
+
+        # 2. Transformation
+        transformation = DataTransformation()
+        transformation.data_transformation_config.molecular_data_path = sources["molecular"]
+        transformation.data_transformation_config.preprocessor_obj_file_path = os.path.join(scale_dir, "preprocessor.pkl")
+        results["transformation"], transformed = measure(
+            lambda: transformation.initiate_data_transformation(train_set, test_set), config.repeats, n_patients
+        )
+
+        # 3. Training: one configuration, forest grown to 25 trees, 2 folds (fit cost, not the search grid)
+        if scale <= config.max_train_scale:
+            def train():
+                models = {"Random Survival Forest": RandomSurvivalForest(random_state=42, n_jobs=-1)}
+                params = {"Random Survival Forest": {"min_samples_leaf": [20], "max_features": ["sqrt"]}}
+                search_config = WarmStartSearchConfig(n_estimators_checkpoints=[10, 25], cv=2)
+                evaluate_models(
+                    transformed.train.X, transformed.train.y, transformed.test.X, transformed.test.y,
+                    models, params, search_config,
+                )
+                return models["Random Survival Forest"]
+
+            results["training"], model = measure(train, 1, transformed.train.n_samples)
+            model_paths = (os.path.join(scale_dir, "model.pkl"), transformed.preprocessor_path)
+            save_object(model_paths[0], model, artifact_format="mmap")
+
+        # 4. Inference: single rows and batches through PredictPipeline
+        if model_paths is not None:
+            registry = ModelRegistry(ModelRegistryConfig(
+                model_file_path=model_paths[0], preprocessor_file_path=model_paths[1],
+                # No exported engine here: the forest is compiled at load
+                engine_file_path=None, explainer_file_path=None,
+            ))
+            registry.load()
+            predict_pipeline = PredictPipeline(registry=registry)
+            features = test_set.reset_index(drop=True)
+
+            # One timing per request: percentiles over individual single-row calls
+            rows = itertools.cycle(features.iloc[[i]] for i in range(min(config.single_row_requests, len(features))))
+            results["predict_single_row"], _ = measure(
+                lambda: predict_pipeline.predict(next(rows)), config.single_row_requests, 1
+            )
+
+            for batch_size in config.batch_sizes:
+                if batch_size > len(features):
+                    continue
+                batch = features.iloc[:batch_size]
+                results[f"predict_batch_{batch_size}"], _ = measure(
+                    lambda: predict_pipeline.predict(batch), config.repeats, batch_size
+                )
+
+        for stage, summary in results.items():
+            logging.info(
+                f"[benchmark] x{scale} {stage}: p50={summary['p50_ms']:.1f}ms p95={summary['p95_ms']:.1f}ms "
+                f"throughput={summary['throughput_rows_per_s']:,.0f} rows/s peak={summary['peak_memory_mb']:.1f}MB"
+            )
+        return results, model_paths
+
+    def run(self):
+        try:
+            config = self.benchmark_config
+            results = {}
+            model_paths = None
+            for scale in sorted(config.scales):
+                results[f"x{scale}"], model_paths = self.run_scale(scale, model_paths)
+
+            report = {
+                "host": host_info(),
+                "environment": {
+                    "hostname": platform.node(),
+                    "platform": platform.platform(),
+                    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                },
+                "results": results,
+            }
+            save_json(config.results_file_path, report)
+            return report
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, transformation, training and inference.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100],
+                        help="Cohort sizes, as multiples of the shipped data")
+    parser.add_argument("--max-train-scale", type=int, default=BenchmarkConfig.max_train_scale)
+    parser.add_argument("--repeats", type=int, default=BenchmarkConfig.repeats)
+    parser.add_argument("--tolerance", type=float, default=BenchmarkConfig.tolerance)
+    parser.add_argument("--baseline", default=BenchmarkConfig.baseline_file_path)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    args = parser.parse_args(argv)
+
+    config = BenchmarkConfig(
+        scales=args.scales, max_train_scale=args.max_train_scale, repeats=args.repeats,
+        tolerance=args.tolerance, baseline_file_path=args.baseline,
+    )
+    report = BenchmarkPipeline(config).run()
+    print(json.dumps(report["results"], indent=2))
+
+    if args.save_baseline:
+        save_json(config.baseline_file_path, report)
+        print(f"Baseline saved to {config.baseline_file_path}")
+        return 0
+
+    if not os.path.exists(config.baseline_file_path):
+        print(f"No baseline at {config.baseline_file_path} (run with --save-baseline)")
+        return 0
+
+    with open(config.baseline_file_path) as file_obj:
+        baseline = json.load(file_obj)
+    # Timings from another machine say nothing about a regression
+    mismatch = host_mismatch(report["host"], baseline.get("host"))
+    if mismatch:
+        print(
+            f"Baseline {config.baseline_file_path} was recorded on another host, not comparing:\n  "
+            + "\n  ".join(mismatch)
+            + "\nRecord a baseline on this host with --save-baseline"
+        )
+        return 2
+    regressions = compare_with_baseline(report["results"], baseline["results"], config.tolerance)
+    if regressions:
+        print("PERFORMANCE REGRESSIONS:\n  " + "\n  ".join(regressions))
+        return 1
+    print("No regression against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import sys
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.exception import CustomException
+from src.components.data_transformation import transform_features
+from src.instrumentation import span
+from src.metrics import metrics
+from src.pipeline.model_registry import get_registry
+from src.pipeline.predict_pipeline import TIME_HORIZON
+
+
+@dataclass
+class ExplainConfig:
+    # Explanations kept in memory (LRU), keyed by model version, feature vector and horizons
+    cache_size: int = 4096
+    # Contributions returned by default (largest absolute effect on the risk score first)
+    top: int = 10
+
+
+hits_total = metrics.counter("explanation_cache_hits_total", "Explanations served from the cache")
+misses_total = metrics.counter("explanation_cache_misses_total", "Explanations computed by the model")
+batch_rows = metrics.histogram(
+    "explanation_batch_rows", "Perturbed rows predicted for one explanation",
+    buckets=(1, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096),
+)
+
+
+class ExplainerUnavailable(RuntimeError):
+    '''
+    The current model has no explainer (not built at training time, or built for another model).
+    '''
+
+
+class ExplainPipeline:
+    '''
+    Per-patient feature contributions from the FeatureExplainer of the current model.
+    Identical requests (same transformed features, same model) are answered from memory.
+    '''
+    def __init__(self, registry=None, config=None):
+        self.registry = registry or get_registry()
+        self.explain_config = config or ExplainConfig()
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, key):
+        with self._lock:
+            value = self._cache.get(key)
+            if value is not None:
+                self._cache.move_to_end(key)
+            return value
+
+    def _store(self, key, value):
+        with self._lock:
+            self._cache[key] = value
+            while len(self._cache) > self.explain_config.cache_size:
+                self._cache.popitem(last=False)
+
+    def explain(self, features, time_horizons=(TIME_HORIZON,), top=None, molecular=None):
+        '''
+        features: one patient (DataFrame with the CustomData columns), molecular: their
+        mutations (ID, GENE, EFFECT, VAF, matched by ID).
+        Returns the risk score, survival at time_horizons and the top contributions.
+        '''
+        bundle = self.registry.get()
+        if bundle.explainer is None:
+            raise ExplainerUnavailable(f"No explainer for model {bundle.version}")
+
+        try:
+            explainer = bundle.explainer
+            with span("transform"):
+                X = transform_features(bundle.preprocessor, features, molecular)
+
+            # The key is the feature vector the model sees, so raw inputs that transform
+            # the same way (e.g. equivalent karyotype strings) share an entry
+            row = np.asarray(X[:1].toarray(), dtype=np.float32)
+            key = hashlib.sha1(
+                bundle.version.encode() + row.tobytes() + np.asarray(time_horizons, dtype=np.float64).tobytes()
+            ).hexdigest()
+
+            explanation = self._cached(key)
+            if explanation is None:
+                misses_total.inc()
+                with span("explain"):
+                    explanation = explainer.explain(bundle.predictor, row, time_horizons)
+                batch_rows.observe(explanation["batch_rows"])
+                self._store(key, explanation)
+            else:
+                hits_total.inc()
+
+            result = self.format_explanation(
+                explanation, explainer, features.iloc[0], time_horizons, top or self.explain_config.top
+            )
+            result["model_version"] = bundle.version
+            return result
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    @staticmethod
+    def format_explanation(explanation, explainer, patient, time_horizons, top):
+        horizons = [f"{horizon:g}" for horizon in time_horizons]
+        order = np.argsort(-np.abs(explanation["risk_contribution"]), kind="stable")[:top]
+        contributions = []
+        for index in order:
+            name = explainer.group_names[index]
+            contribution = {
+                "feature": name,
+                "risk_contribution": float(explanation["risk_contribution"][index]),
+                "survival_contribution": dict(zip(horizons, explanation["survival_contribution"][index].tolist())),
+            }
+            # Clinical inputs are echoed back (molecular groups have no raw value in the request)
+            if name in patient.index:
+                value = patient[name]
+                contribution["value"] = None if value is None or value != value else value
+            contributions.append(contribution)
+
+        return {
+            "risk_score": explanation["risk_score"],
+            "expected_risk_score": explainer.expected_risk,
+            "survival": dict(zip(horizons, explanation["survival"].tolist())),
+            "contributions": contributions,
+        }
@@ -0,0 +1,133 @@
+import os
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+
+from src.logger import logging
+from src.metrics import metrics
+
+
+@dataclass
+class InferencePoolConfig:
+    # Threads running predictions (NumPy / the compiled forest release the GIL for most of the work)
+    max_workers: int = field(default_factory=lambda: int(os.environ.get("INFERENCE_WORKERS", os.cpu_count() or 1)))
+    # Requests allowed to wait for a thread; beyond workers + queue, requests are rejected (HTTP 429)
+    max_queue: int = field(default_factory=lambda: int(os.environ.get("INFERENCE_QUEUE", "16")))
+    # Time a request waits for its result (queue + inference) before giving up (HTTP 504)
+    timeout_s: float = field(default_factory=lambda: float(os.environ.get("INFERENCE_TIMEOUT_S", "2.0")))
+
+
+in_flight = metrics.gauge(
+    "inference_pool_in_flight", "Requests running or waiting in the inference pool"
+)
+rejected_total = metrics.counter(
+    "inference_pool_rejected_total", "Requests rejected because the inference pool was full"
+)
+timeouts_total = metrics.counter(
+    "inference_pool_timeouts_total", "Requests that did not get their result within the timeout"
+)
+queue_wait_seconds = metrics.histogram(
+    "inference_pool_queue_wait_seconds", "Time spent by a request waiting for an inference thread"
+)
+
+
+class PoolOverloaded(RuntimeError):
+    '''
+    The pool already holds max_workers + max_queue requests.
+    '''
+
+
+class InferenceTimeout(TimeoutError):
+    '''
+    The result was not ready within the request timeout.
+    '''
+
+
+class InferencePool:
+    '''
+    Bounded thread pool in front of the model. Admission is non-blocking: a request
+    that would exceed the bound is rejected at once instead of queuing without limit,
+    so latency stays bounded under overload and the client can retry elsewhere.
+    '''
+    def __init__(self, config=None):
+        self.pool_config = config or InferencePoolConfig()
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        '''
+        Creates the threads (again after a fork, threads are not inherited).
+        '''
+        with self._start_lock:
+            if self._executor is not None and self._pid == os.getpid():
+                return
+            config = self.pool_config
+            self._slots = threading.BoundedSemaphore(config.max_workers + config.max_queue)
+            self._executor = ThreadPoolExecutor(max_workers=config.max_workers, thread_name_prefix="inference")
+            self._pid = os.getpid()
+            logging.info(
+                f"Inference pool started (workers={config.max_workers}, queue={config.max_queue}, "
+                f"timeout={config.timeout_s}s)"
+            )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def run(self, function, *args, timeout=None):
+        '''
+        Runs function(*args) in the pool and returns its result.
+        Raises PoolOverloaded when the pool is full and InferenceTimeout after timeout seconds.
+        The call sees the caller's context (request trace spans are recorded in the caller's trace).
+        '''
+        if self._executor is None or self._pid != os.getpid():
+            self.start()
+
+        context = contextvars.copy_context()
+        submitted_at = time.perf_counter()
+
+        def task():
+            queue_wait_seconds.observe(time.perf_counter() - submitted_at)
+            return context.run(function, *args)
+
+        return self.run_future(lambda: self._executor.submit(task), timeout=timeout)
+
+    def run_future(self, submit, timeout=None):
+        '''
+        Same admission and timeout for work queued elsewhere: submit() returns a Future
+        (e.g. MicroBatcher.submit), and no pool thread is parked while it is computed.
+        The slot is held until the future is done; on timeout the future is cancelled.
+        '''
+        if self._executor is None or self._pid != os.getpid():
+            self.start()
+
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            rejected_total.inc()
+            raise PoolOverloaded("Inference pool is full")
+        in_flight.inc()
+
+        def release(_):
+            # A timed-out request keeps its slot until its computation actually ends
+            in_flight.dec()
+            slots.release()
+
+        try:
+            future = submit()
+        except Exception:
+            release(None)
+            raise
+        future.add_done_callback(release)
+
+        try:
+            return future.result(timeout=self.pool_config.timeout_s if timeout is None else timeout)
+        except FutureTimeoutError:
+            # Still queued: it is dropped; already running: it finishes, its result is discarded
+            future.cancel()
+            timeouts_total.inc()
+            raise InferenceTimeout(f"No result within {self.pool_config.timeout_s if timeout is None else timeout}s")
@@ -0,0 +1,220 @@
+import os
+import sys
+import csv
+import json
+import time
+import random
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+
+NUMERIC_FIELDS = ["BM_BLAST", "WBC", "ANC", "MONOCYTES", "HB", "PLT"]
+
+
+@dataclass
+class LoadTestConfig:
+    url: str = "http://127.0.0.1:5001"
+    # Single-patient JSON API; with batch_size > 1 the batch endpoint is used
+    batch_size: int = 1
+    # Offered load steps (requests/s), run in order until one is not sustained
+    rates: list = field(default_factory=lambda: [5, 10, 20, 50, 100, 200, 500])
+    step_seconds: float = 10.0
+    # Client threads: requests due while all of them are busy wait (and that wait is counted in their latency)
+    concurrency: int = 64
+    request_timeout_s: float = 10.0
+    # A step is sustained when p99 stays under the SLO, failures (429, 5xx, timeouts) under
+    # max_error_rate and the served rate within 95% of the offered rate
+    slo_p99_ms: float = 250.0
+    max_error_rate: float = 0.01
+    clinical_data_path: str = os.path.join("notebook", "data", "X_test", "clinical_test.csv")
+    molecular_data_path: str = os.path.join("notebook", "data", "X_test", "molecular_test.csv")
+    report_file_path: str = os.path.join("artifacts", "load_test.json")
+    random_state: int = 42
+
+
+def load_patients(config):
+    '''
+    Request bodies built from the test cohort, with the mutations of each patient.
+    '''
+    mutations = defaultdict(list)
+    if os.path.exists(config.molecular_data_path):
+        with open(config.molecular_data_path, newline="") as file_obj:
+            for row in csv.DictReader(file_obj):
+                mutations[row["ID"]].append({
+                    "GENE": row["GENE"], "EFFECT": row["EFFECT"] or None,
+                    "VAF": float(row["VAF"]) if row["VAF"] else None,
+                })
+
+    patients = []
+    with open(config.clinical_data_path, newline="") as file_obj:
+        for row in csv.DictReader(file_obj):
+            patient = {name: float(row[name]) if row[name] else None for name in NUMERIC_FIELDS}
+            patient["CENTER"] = row["CENTER"]
+            patient["CYTOGENETICS"] = row["CYTOGENETICS"] or None
+            patient["mutations"] = mutations[row["ID"]]
+            patients.append(patient)
+    return patients
+
+
+def send(url, body, timeout):
+    '''
+    One POST; returns the HTTP status (0 for connection errors and client timeouts).
+    '''
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, OSError):
+        return 0
+
+
+def step_summary(rate, duration, statuses, latencies):
+    '''
+    Latency percentiles of the successful requests, served rate and failures of one step.
+    '''
+    statuses = np.asarray(statuses)
+    latencies_ms = np.asarray(latencies) * 1000
+    ok = statuses == 200
+    summary = {
+        "offered_rps": rate,
+        "sent": len(statuses),
+        "ok": int(ok.sum()),
+        "rejected_429": int((statuses == 429).sum()),
+        "timeouts_504": int((statuses == 504).sum()),
+        "other_errors": int((~ok & (statuses != 429) & (statuses != 504)).sum()),
+        "error_rate": float(1 - ok.mean()) if len(statuses) else 0.0,
+        "served_rps": float(ok.sum() / duration),
+    }
+    for percentile in (50, 95, 99):
+        summary[f"p{percentile}_ms"] = float(np.percentile(latencies_ms[ok], percentile)) if ok.any() else None
+    summary["max_ms"] = float(latencies_ms[ok].max()) if ok.any() else None
+    return summary
+
+
+def run_step(config, endpoint, bodies, rate):
+    '''
+    Open-loop load at a fixed rate: request i is due at start + i / rate whatever the
+    previous responses, and its latency is counted from that due time. A slow server
+    therefore shows up as latency instead of silently lowering the offered load.
+    '''
+    n_requests = max(1, int(rate * config.step_seconds))
+    statuses = [None] * n_requests
+    latencies = [None] * n_requests
+    lock = threading.Lock()
+
+    def fire(index, due):
+        status = send(endpoint, bodies[index % len(bodies)], config.request_timeout_s)
+        with lock:
+            statuses[index] = status
+            latencies[index] = time.perf_counter() - due
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=config.concurrency) as executor:
+        for index in range(n_requests):
+            due = start + index / rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(fire, index, due)
+    duration = max(time.perf_counter() - start, config.step_seconds)
+    return step_summary(rate, duration, statuses, latencies)
+
+
+def is_sustained(summary, config):
+    return (
+        summary["p99_ms"] is not None
+        and summary["p99_ms"] <= config.slo_p99_ms
+        and summary["error_rate"] <= config.max_error_rate
+        and summary["served_rps"] >= 0.95 * summary["offered_rps"]
+    )
+
+
+def run_load_test(config):
+    '''
+    Runs the rate steps against a running server; stops at the first step that is not sustained.
+    Returns the report (every step and the max sustained rate).
+    '''
+    rng = random.Random(config.random_state)
+    patients = load_patients(config)
+    rng.shuffle(patients)
+
+    if config.batch_size > 1:
+        endpoint = config.url.rstrip("/") + "/api/v1/predict/batch"
+        bodies = [
+            json.dumps({"patients": patients[offset:offset + config.batch_size]}).encode()
+            for offset in range(0, len(patients) - config.batch_size + 1, config.batch_size)
+        ]
+    else:
+        endpoint = config.url.rstrip("/") + "/api/v1/predict"
+        bodies = [json.dumps(patient).encode() for patient in patients]
+
+    # Warm-up (lazy startup, connection setup) outside the measured steps
+    for body in bodies[:5]:
+        send(endpoint, body, config.request_timeout_s)
+
+    steps = []
+    max_sustained_rps = None
+    for rate in config.rates:
+        summary = run_step(config, endpoint, bodies, rate)
+        summary["sustained"] = is_sustained(summary, config)
+        steps.append(summary)
+        p99 = f"{summary['p99_ms']:.1f}" if summary["p99_ms"] is not None else "-"
+        print(
+            f"{rate:>6g} req/s  served {summary['served_rps']:7.1f}/s  p50 {summary['p50_ms'] or 0:7.1f} ms  "
+            f"p95 {summary['p95_ms'] or 0:7.1f} ms  p99 {p99:>7} ms  "
+            f"errors {summary['error_rate']:6.1%}  {'ok' if summary['sustained'] else 'NOT SUSTAINED'}"
+        )
+        if not summary["sustained"]:
+            break
+        max_sustained_rps = rate
+
+    report = {
+        "endpoint": endpoint,
+        "batch_size": config.batch_size,
+        "step_seconds": config.step_seconds,
+        "concurrency": config.concurrency,
+        "slo_p99_ms": config.slo_p99_ms,
+        "max_error_rate": config.max_error_rate,
+        "max_sustained_rps": max_sustained_rps,
+        "steps": steps,
+    }
+    os.makedirs(os.path.dirname(config.report_file_path) or ".", exist_ok=True)
+    with open(config.report_file_path, "w") as file_obj:
+        json.dump(report, file_obj, indent=2)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Step load test of the JSON prediction API (run the server first).")
+    parser.add_argument("--url", default=LoadTestConfig.url)
+    parser.add_argument("--rates", type=float, nargs="+", default=LoadTestConfig().rates, help="Offered requests/s per step")
+    parser.add_argument("--duration", type=float, default=LoadTestConfig.step_seconds, help="Seconds per step")
+    parser.add_argument("--batch-size", type=int, default=LoadTestConfig.batch_size, help="Patients per request")
+    parser.add_argument("--concurrency", type=int, default=LoadTestConfig.concurrency)
+    parser.add_argument("--slo-p99-ms", type=float, default=LoadTestConfig.slo_p99_ms)
+    parser.add_argument("--max-error-rate", type=float, default=LoadTestConfig.max_error_rate)
+    parser.add_argument("-o", "--output", default=LoadTestConfig.report_file_path)
+    args = parser.parse_args(argv)
+
+    config = LoadTestConfig(
+        url=args.url, rates=args.rates, step_seconds=args.duration, batch_size=args.batch_size,
+        concurrency=args.concurrency, slo_p99_ms=args.slo_p99_ms, max_error_rate=args.max_error_rate,
+        report_file_path=args.output,
+    )
+    report = run_load_test(config)
+    print(f"Max sustained rate: {report['max_sustained_rps'] or 'none'} req/s "
+          f"(p99 <= {config.slo_p99_ms:g} ms, errors <= {config.max_error_rate:.0%}) -> {config.report_file_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
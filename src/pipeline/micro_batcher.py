@@ -0,0 +1,189 @@
+import os
+import sys
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from src.exception import CustomException
+from src.components.data_transformation import patient_ids
+from src.logger import logging
+from src.metrics import metrics
+
+
+@dataclass
+class MicroBatcherConfig:
+    # Maximum time a request waits for other requests before its batch is run
+    max_wait_ms: float = 5.0
+    # Maximum number of requests coalesced into one forest call
+    max_batch_size: int = 64
+    # Horizons (in years) evaluated for every request of the batch
+    time_horizons: list = field(default_factory=lambda: [3])
+
+
+queue_depth = metrics.gauge(
+    "micro_batcher_queue_depth", "Requests waiting in the micro-batching queue"
+)
+batch_size = metrics.histogram(
+    "micro_batcher_batch_size", "Number of requests per coalesced batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+queue_wait_seconds = metrics.histogram(
+    "micro_batcher_queue_wait_seconds", "Time spent by a request in the queue before its batch runs"
+)
+batch_seconds = metrics.histogram(
+    "micro_batcher_batch_seconds", "Time to run one coalesced batch (transform + predict)"
+)
+
+_STOP = object()
+
+
+class MicroBatcher:
+    '''
+    Coalesces concurrent single-patient requests into one batched
+    preprocessor.transform + model.predict, then fans the results back.
+    '''
+    def __init__(self, predict_pipeline, config=None):
+        self.predict_pipeline = predict_pipeline
+        self.batcher_config = config or MicroBatcherConfig()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        '''
+        Starts the batching thread (again after a fork, threads are not inherited, or after stop()).
+        '''
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                # Requests queued in the parent are not ours; after stop() the queued ones are kept
+                self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def submit(self, features, molecular=None):
+        '''
+        Queues a DataFrame of patients (and their mutations, matched by ID) and
+        returns a Future of (risk_scores, survival) for those rows.
+        '''
+        if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+            self.start()
+
+        future = Future()
+        self._queue.put((features, molecular, future, time.perf_counter()))
+        queue_depth.set(self._queue.qsize())
+        return future
+
+    def predict_survival(self, features, molecular=None, timeout=None):
+        return self.submit(features, molecular).result(timeout=timeout)
+
+    @staticmethod
+    def _merge(batch):
+        '''
+        One frame of patients and one mutation table for the batch. Patient IDs are
+        prefixed with the request position: two requests may use the same IDs.
+        '''
+        frames, mutation_frames = [], []
+        for position, (features, molecular, _, _) in enumerate(batch):
+            ids = [f"{position}/{patient_id}" for patient_id in patient_ids(features)]
+            frames.append(features.drop(columns="ID", errors="ignore").set_axis(ids))
+            if molecular is not None:
+                mutation_frames.append(molecular.assign(ID=[f"{position}/{patient_id}" for patient_id in molecular["ID"]]))
+        return pd.concat(frames), pd.concat(mutation_frames, ignore_index=True) if mutation_frames else None
+
+    def _collect_batch(self, first_item):
+        batch = [first_item]
+        deadline = time.monotonic() + self.batcher_config.max_wait_ms / 1000
+        stop = False
+
+        while len(batch) < self.batcher_config.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stop = True
+                break
+            batch.append(item)
+
+        return batch, stop
+
+    def _predict(self, batch):
+        features, molecular = self._merge(batch)
+        return self.predict_pipeline.predict_survival(features, self.batcher_config.time_horizons, molecular)
+
+    def _run_single(self, item):
+        _, _, future, _ = item
+        try:
+            future.set_result(self._predict([item]))
+        except Exception as e:
+            future.set_exception(e)
+
+    def _run_batch(self, batch):
+        # Requests cancelled while queued (timed out by the inference pool) are dropped
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        start = time.perf_counter()
+        for _, _, _, submitted_at in batch:
+            queue_wait_seconds.observe(start - submitted_at)
+        batch_size.observe(len(batch))
+
+        try:
+            try:
+                risk_scores, survival = self._predict(batch)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][2].set_exception(e)
+                    return
+                # One invalid request must not fail the others: each one is predicted on its own
+                logging.warning(f"Batch of {len(batch)} requests failed ({e}), predicting them one by one")
+                for item in batch:
+                    self._run_single(item)
+                return
+
+            # Fan out: each request gets back the rows it submitted
+            offset = 0
+            for features, _, future, _ in batch:
+                n_rows = len(features)
+                future.set_result((risk_scores[offset:offset + n_rows], survival[offset:offset + n_rows]))
+                offset += n_rows
+
+        finally:
+            batch_seconds.observe(time.perf_counter() - start)
+
+    def _run(self):
+        logging.info(
+            f"Micro-batcher started (max_wait_ms={self.batcher_config.max_wait_ms}, "
+            f"max_batch_size={self.batcher_config.max_batch_size})"
+        )
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            batch, stop = self._collect_batch(item)
+            queue_depth.set(self._queue.qsize())
+
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                logging.error(CustomException(e, sys))
+
+            if stop:
+                break
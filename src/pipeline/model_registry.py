@@ -0,0 +1,252 @@
+import os
+import sys
+import time
+import hashlib
+import threading
+from dataclasses import dataclass, field
+
+from src.exception import CustomException
+from src.logger import logging
+from src.metrics import metrics
+from src.utils import content_digest, load_object
+from src.instrumentation import span
+from src.components.forest_engine import CompiledForest, is_survival_forest
+
+
+@dataclass
+class ModelRegistryConfig:
+    model_file_path: str = os.path.join("artifacts", "model.pkl")
+    preprocessor_file_path: str = os.path.join("artifacts", "preprocessor.pkl")
+    # Flat-array export of the forest used for inference (compiled at load if missing or stale)
+    engine_file_path: str = os.path.join("artifacts", "forest_engine.pkl")
+    use_engine: bool = True
+    # Per-patient explainer built at training time (FeatureExplainer), None to skip it
+    explainer_file_path: str = os.path.join("artifacts", "explainer.pkl")
+    # Minimum delay between two checks of the files on disk (run in a background thread)
+    check_interval_seconds: float = 5.0
+    # Check the sha256 of every artifact before unpickling it (reads each file in full, once per file version)
+    verify_checksums: bool = field(default_factory=lambda: os.environ.get("MODEL_VERIFY_CHECKSUMS", "0") == "1")
+
+
+@dataclass(frozen=True)
+class ModelBundle:
+    '''
+    Model and preprocessor loaded together.
+    A bundle is never modified: a reload builds a new bundle and swaps the reference.
+    '''
+    model: object
+    preprocessor: object
+    version: str
+    loaded_at: float
+    # CompiledForest of the model (None for models that are not survival forests)
+    engine: object = None
+    # FeatureExplainer built for this model (None when missing or exported from another model)
+    explainer: object = None
+
+    @property
+    def predictor(self):
+        '''
+        Object to predict with: the compiled forest when available, the model otherwise.
+        '''
+        return self.engine if self.engine is not None else self.model
+
+
+startup_seconds = metrics.gauge(
+    "model_registry_startup_seconds", "Time to load model and preprocessor at startup"
+)
+swap_seconds = metrics.histogram(
+    "model_registry_swap_seconds", "Time to load and swap in a new model version"
+)
+swaps_total = metrics.counter(
+    "model_registry_swaps_total", "Number of hot-reloads of the model"
+)
+reload_errors_total = metrics.counter(
+    "model_registry_reload_errors_total", "Number of failed hot-reloads (old model kept)"
+)
+
+
+def _file_fingerprint(file_path):
+    stat = os.stat(file_path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class ModelRegistry:
+    '''
+    Keeps the model and the preprocessor in memory for the whole process
+    and hot-reloads them when the artifacts change on disk.
+
+    The model file is written last by the training pipeline, so its
+    mtime/size is used as the trigger; the version is the hash of both files.
+    Requests never check or reload themselves: get() hands the check to a
+    background thread and keeps returning the current bundle until the new
+    one is fully loaded (both are in memory during the swap).
+    '''
+    def __init__(self, config=None):
+        self.registry_config = config or ModelRegistryConfig()
+        self._bundle = None
+        self._fingerprint = None
+        self._last_check = 0.0
+        # Only one thread reloads at a time, the others keep using the current bundle
+        self._reload_lock = threading.Lock()
+        self._checker = None
+        self._checker_lock = threading.Lock()
+
+    def _artifacts_version(self):
+        '''
+        Returns (version, digest of the model). Artifact files carry their sha256 in their
+        header, so no file is read in full here.
+        '''
+        model_digest = content_digest(self.registry_config.model_file_path)
+        digests = model_digest + content_digest(self.registry_config.preprocessor_file_path)
+        return hashlib.sha256(digests.encode()).hexdigest()[:16], model_digest
+
+    def _load_engine(self, model, model_digest):
+        engine_file_path = self.registry_config.engine_file_path
+        if engine_file_path and os.path.exists(engine_file_path):
+            engine = load_object(file_path=engine_file_path, verify=self.registry_config.verify_checksums)
+            if getattr(engine, "source_digest", None) == model_digest:
+                return engine
+            logging.info(f"{engine_file_path} was exported from another model, compiling the forest")
+
+        if not is_survival_forest(model):
+            return None
+        return CompiledForest.from_forest(model, source_digest=model_digest)
+
+    def _load_explainer(self, model_digest):
+        explainer_file_path = self.registry_config.explainer_file_path
+        if not explainer_file_path or not os.path.exists(explainer_file_path):
+            return None
+        explainer = load_object(file_path=explainer_file_path, verify=self.registry_config.verify_checksums)
+        if getattr(explainer, "source_digest", None) != model_digest:
+            logging.info(f"{explainer_file_path} was built for another model, explanations disabled")
+            return None
+        return explainer
+
+    def _load_bundle(self, version, model_digest):
+        with span("deserialize"):
+            verify = self.registry_config.verify_checksums
+            model = load_object(file_path=self.registry_config.model_file_path, verify=verify)
+            preprocessor = load_object(file_path=self.registry_config.preprocessor_file_path, verify=verify)
+            engine = self._load_engine(model, model_digest) if self.registry_config.use_engine else None
+            explainer = self._load_explainer(model_digest)
+
+        return ModelBundle(
+            model=model,
+            preprocessor=preprocessor,
+            version=version,
+            loaded_at=time.time(),
+            engine=engine,
+            explainer=explainer,
+        )
+
+    def load(self):
+        '''
+        Loads the artifacts (called once at startup).
+        '''
+        try:
+            with self._reload_lock:
+                start = time.perf_counter()
+                fingerprint = _file_fingerprint(self.registry_config.model_file_path)
+                self._bundle = self._load_bundle(*self._artifacts_version())
+                self._fingerprint = fingerprint
+                self._last_check = time.monotonic()
+                elapsed = time.perf_counter() - start
+
+            startup_seconds.set(elapsed)
+            logging.info(f"Model {self._bundle.version} loaded in {elapsed:.3f}s")
+            return self._bundle
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def reload_if_changed(self):
+        '''
+        Swaps in a new bundle if the model file changed on disk.
+        Returns True if a new version was loaded.
+        '''
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            self._last_check = time.monotonic()
+            try:
+                fingerprint = _file_fingerprint(self.registry_config.model_file_path)
+            except OSError:
+                # Artifact being replaced, try again at the next check
+                return False
+
+            if fingerprint == self._fingerprint:
+                return False
+
+            start = time.perf_counter()
+            try:
+                version, model_digest = self._artifacts_version()
+                if version == self._bundle.version:
+                    # Same content (e.g. file touched), nothing to reload
+                    self._fingerprint = fingerprint
+                    return False
+                bundle = self._load_bundle(version, model_digest)
+            except Exception as e:
+                # Keep serving the old model, the fingerprint is not updated so we retry later
+                reload_errors_total.inc()
+                logging.warning(f"Model reload failed, keeping version {self._bundle.version}: {e}")
+                return False
+
+            self._fingerprint = fingerprint
+
+            # Single reference assignment: readers see either the old or the new pair
+            self._bundle = bundle
+            elapsed = time.perf_counter() - start
+
+            swaps_total.inc()
+            swap_seconds.observe(elapsed)
+            logging.info(f"Model hot-reloaded to version {bundle.version} in {elapsed:.3f}s")
+            return True
+
+        finally:
+            self._reload_lock.release()
+
+    def _start_check(self):
+        '''
+        Runs reload_if_changed in a daemon thread, at most one at a time (a new one
+        after a fork: threads are not inherited).
+        '''
+        with self._checker_lock:
+            if self._checker is not None and self._checker.is_alive():
+                return
+            # Set now so the requests arriving meanwhile do not start another check
+            self._last_check = time.monotonic()
+            self._checker = threading.Thread(target=self.reload_if_changed, name="model-reload", daemon=True)
+            self._checker.start()
+
+    def get(self):
+        '''
+        Returns the current ModelBundle, loading it on first use. A due check of the
+        files runs in the background: a reload never delays the calling request.
+        '''
+        if self._bundle is None:
+            return self.load()
+
+        if time.monotonic() - self._last_check >= self.registry_config.check_interval_seconds:
+            self._start_check()
+
+        return self._bundle
+
+    @property
+    def version(self):
+        return self._bundle.version if self._bundle is not None else None
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    '''
+    Returns the process-wide ModelRegistry.
+    '''
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
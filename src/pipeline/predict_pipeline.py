@@ -1,58 +1,91 @@
 import sys
-import os
 import pandas as pd
 from src.exception import CustomException
-from src.utils import load_object
+from src.components.data_transformation import transform_features
+from src.components.molecular_features import MOLECULAR_COLUMNS
+from src.instrumentation import span
+from src.pipeline.api_schema import PATIENT_FIELDS
+from src.pipeline.model_registry import get_registry
+from src.utils import survival_at_horizons
+
+# Horizon (en années) affiché dans la page de prédiction
+TIME_HORIZON = 3
 
 class PredictPipeline:
-    def __init__(self):
-        pass
+    def __init__(self, registry=None, cache=None):
+        # Le modèle et le preprocessor sont chargés une seule fois par processus
+        self.registry = registry or get_registry()
+        # Cache optionnel (PredictionCache) devant l'inférence
+        self.cache = cache
 
-    def predict(self, features):
+    def predict_survival(self, features, time_horizons=(TIME_HORIZON,), molecular=None):
+        '''
+        Chemin rapide : renvoie les scores de risque (n_patients,) et la matrice
+        de survie (n_patients x n_horizons), sans objet StepFunction par patient.
+        molecular : liste brute de mutations (ID, GENE, EFFECT, VAF) des mêmes patients.
+        '''
         try:
-            # Chemins vers les fichiers (modèle et preprocessor)
-            model_path = os.path.join("artifacts", "model.pkl")
-            preprocessor_path = os.path.join('artifacts', 'preprocessor.pkl')
-            
-            print("Before Loading")
-            model = load_object(file_path=model_path)
-            preprocessor = load_object(file_path=preprocessor_path)
-            print("After Loading")
-            
-            # 1. Transformation des données
-            data_scaled = preprocessor.transform(features)
-            
-            # CORRECTION CRITIQUE : Gestion Matrice Sparse
-            if hasattr(data_scaled, "toarray"):
-                data_scaled = data_scaled.toarray()
-
-            # --- CALCUL DU SCORE DE RISQUE (Hazard) ---
-            risk_score = model.predict(data_scaled)[0]
-
-            # --- CALCUL DE LA PROBABILITE DE SURVIE ---
-            surv_funcs = model.predict_survival_function(data_scaled)
-            
-            # On fixe un horizon de temps (Ici : 3 ans)
-            # Tu peux changer ce chiffre (ex: 1, 2, 5) selon tes besoins
-            TIME_HORIZON = 3 
-            
-            # On évalue la fonction au temps t = 3
-            survival_prob = surv_funcs[0](TIME_HORIZON)
-            percentage = survival_prob * 100
+            # On récupère la paire (modèle, preprocessor) courante en une seule lecture
+            bundle = self.registry.get()
+
+            def compute(rows):
+                # 1. Transformation des données (matrice CSR float32, passée telle quelle au modèle)
+                with span("transform"):
+                    data_scaled = transform_features(bundle.preprocessor, rows, molecular)
+
+                # 2. Score de risque + probabilités de survie à tous les horizons en une passe
+                return survival_at_horizons(bundle.predictor, data_scaled, time_horizons)
+
+            if self.cache is None:
+                return compute(features)
+
+            # Seules les lignes absentes du cache passent par le modèle
+            # (la clé couvre aussi les mutations de chaque patient)
+            return self.cache.get_or_compute(features, bundle.version, time_horizons, compute, molecular)
+        
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    @staticmethod
+    def format_results(risk_scores, survival):
+        '''
+        Une phrase par patient contenant les deux infos pour l'affichage
+        (survival doit contenir la colonne de l'horizon TIME_HORIZON).
+        '''
+        percentages = survival[:, 0] * 100
+        return [
+            f"Score de Risque : {risk_score:.2f}  |  "
+            f"Probabilité de survie à {TIME_HORIZON} ans : {percentage:.2f} %"
+            for risk_score, percentage in zip(risk_scores, percentages)
+        ]
+
+    def predict(self, features, molecular=None):
+        try:
+            risk_scores, survival = self.predict_survival(features, [TIME_HORIZON], molecular)
 
             # --- RESULTAT COMBINÉ ---
-            # On renvoie une phrase contenant les deux infos pour l'affichage
-            final_result = (
-                f"Score de Risque : {risk_score:.2f}  |  "
-                f"Probabilité de survie à {TIME_HORIZON} ans : {percentage:.2f} %"
-            )
-            
-            # On renvoie une liste car app.py attend results[0]
-            return [final_result]
+            return self.format_results(risk_scores, survival)
         
         except Exception as e:
             raise CustomException(e, sys)
 
+def patient_frames(records, ids=None):
+    '''
+    Patients validés par api_schema -> (variables cliniques, table des mutations),
+    reliées par ids, ou par un identifiant propre à la requête ("P0", "P1", ...).
+    '''
+    try:
+        ids = ids or [f"P{i}" for i in range(len(records))]
+        features = pd.DataFrame.from_records(records, columns=PATIENT_FIELDS, index=ids)
+        molecular = pd.DataFrame(
+            [dict(mutation, ID=patient_id) for patient_id, record in zip(ids, records) for mutation in record["mutations"]],
+            columns=MOLECULAR_COLUMNS,
+        ).astype({"VAF": float})
+        return features, molecular
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
 class CustomData:
     def __init__(self,
         BM_BLAST: float,
@@ -62,7 +95,8 @@ class CustomData:
         HB: float,
         PLT: float,
         Nmut: float,
-        CENTER: str):
+        CENTER: str,
+        CYTOGENETICS: str = None):
 
         self.BM_BLAST = BM_BLAST
         self.WBC = WBC
@@ -72,6 +106,8 @@ class CustomData:
         self.PLT = PLT
         self.Nmut = Nmut
         self.CENTER = CENTER
+        # Caryotype ISCN (ex : "46,xy,del(20)(q12)[2]/46,xy[18]"), optionnel
+        self.CYTOGENETICS = CYTOGENETICS
 
     def get_data_as_data_frame(self):
         try:
@@ -83,7 +119,8 @@ class CustomData:
                 "HB": [self.HB],
                 "PLT": [self.PLT],
                 "Nmut": [self.Nmut],
-                "CENTER": [self.CENTER]
+                "CENTER": [self.CENTER],
+                "CYTOGENETICS": [self.CYTOGENETICS]
             }
 
             return pd.DataFrame(custom_data_input_dict)
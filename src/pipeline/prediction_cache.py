@@ -0,0 +1,259 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.exception import CustomException
+from src.components.data_transformation import patient_ids
+from src.components.molecular_features import MOLECULAR_COLUMNS
+from src.metrics import metrics
+# Keys cover exactly the fields the model is fed: the lists come from the request schema
+from src.pipeline.api_schema import NUMERIC_FIELDS, STRING_FIELDS
+
+
+@dataclass
+class PredictionCacheConfig:
+    max_entries: int = 10000
+    ttl_seconds: float = 3600.0
+    # "memory" (one cache per process) or "file" (SQLite file shared by the workers of a host)
+    backend: str = "memory"
+    file_path: str = os.path.join("artifacts", "prediction_cache.sqlite")
+    # File backend: the table is trimmed to max_entries every eviction_interval inserts of a worker
+    # (not at each insert), so it may briefly hold up to workers x eviction_interval extra entries
+    eviction_interval: int = 100
+
+
+hits_total = metrics.counter("prediction_cache_hits_total", "Predictions served from the cache")
+misses_total = metrics.counter("prediction_cache_misses_total", "Predictions computed by the model")
+evictions_total = metrics.counter(
+    "prediction_cache_evictions_total", "Entries evicted (LRU, TTL or model change)"
+)
+cache_entries = metrics.gauge("prediction_cache_entries", "Entries currently in the cache")
+
+
+class InMemoryCacheBackend:
+    '''
+    LRU + TTL cache in a dict, local to the process.
+    '''
+    # Only this process uses the entries: they are dropped when its model changes
+    shared = False
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                evictions_total.inc()
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evictions_total.inc()
+
+    def clear(self):
+        with self._lock:
+            evictions_total.inc(len(self._entries))
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FileCacheBackend:
+    '''
+    LRU + TTL cache stored in a local SQLite file,
+    so the workers of one host share their predictions.
+    '''
+    # Workers may serve different model versions for a while (hot-reload): none of them clears
+    # the file, entries of an old version are never hit again and age out by LRU / TTL
+    shared = True
+
+    def __init__(self, file_path, max_entries, ttl_seconds, eviction_interval=100):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.eviction_interval = eviction_interval
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(file_path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS predictions "
+            "(key TEXT PRIMARY KEY, value TEXT, stored_at REAL, accessed_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON predictions (accessed_at)")
+        self._lock = threading.Lock()
+        self._inserts = 0
+        # Approximate entry count (other workers write too): exact only after an eviction pass
+        self._entries = self._count()
+
+    def _count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at FROM predictions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, stored_at = row
+            if now - stored_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM predictions WHERE key = ?", (key,))
+                self._entries -= 1
+                evictions_total.inc()
+                return None
+            self._conn.execute("UPDATE predictions SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._entries += 1
+            self._inserts += 1
+            if self._inserts % self.eviction_interval == 0:
+                self._evict()
+
+    def _evict(self):
+        '''
+        Deletes the least recently used entries beyond max_entries, walking the accessed_at
+        index from the most recent one: no count of the table is needed to find them.
+        '''
+        deleted = self._conn.execute(
+            "DELETE FROM predictions WHERE rowid IN "
+            "(SELECT rowid FROM predictions ORDER BY accessed_at DESC, rowid DESC LIMIT -1 OFFSET ?)", (self.max_entries,)
+        ).rowcount
+        evictions_total.inc(max(deleted, 0))
+        self._entries = self._count()
+
+    def clear(self):
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM predictions").rowcount
+            evictions_total.inc(max(deleted, 0))
+            self._entries = 0
+
+    def __len__(self):
+        return max(self._entries, 0)
+
+
+class PredictionCache:
+    '''
+    Cache of (risk score, survival probabilities) per patient, in front of inference.
+    Keys are the exact feature vector + mutations + horizons + model version. A
+    process-local cache is emptied when the model version changes.
+    '''
+    def __init__(self, config=None):
+        self.cache_config = config or PredictionCacheConfig()
+        if self.cache_config.backend == "memory":
+            self.backend = InMemoryCacheBackend(self.cache_config.max_entries, self.cache_config.ttl_seconds)
+        elif self.cache_config.backend == "file":
+            self.backend = FileCacheBackend(
+                self.cache_config.file_path, self.cache_config.max_entries, self.cache_config.ttl_seconds,
+                self.cache_config.eviction_interval,
+            )
+        else:
+            raise ValueError(f"Unknown cache backend: {self.cache_config.backend}")
+        self._model_version = None
+        self._version_lock = threading.Lock()
+
+    @staticmethod
+    def _mutation_signatures(features, molecular):
+        '''
+        Sorted GENE:EFFECT:VAF of every patient ("*" when no mutation table was given at all,
+        which the preprocessor treats as no mutations but is kept apart from an explicit []).
+        '''
+        if molecular is None:
+            return ["*"] * len(features)
+        mutations = molecular.reindex(columns=MOLECULAR_COLUMNS)
+        by_patient = {}
+        for patient_id, gene, effect, vaf in zip(
+            mutations["ID"], mutations["GENE"], mutations["EFFECT"], pd.to_numeric(mutations["VAF"])
+        ):
+            by_patient.setdefault(patient_id, []).append(f"{gene}:{effect}:{float(vaf)!r}")
+        return [";".join(sorted(by_patient.get(patient_id, []))) for patient_id in patient_ids(features)]
+
+    def _canonical_keys(self, features, model_version, time_horizons, molecular=None):
+        # Exact values: the cached prediction is the one computed from these very features
+        numeric = features.reindex(columns=NUMERIC_FIELDS).astype(float)
+        categorical = features.reindex(columns=STRING_FIELDS).astype(str).apply(lambda col: col.str.strip())
+        prefix = f"{model_version}|{','.join(str(h) for h in time_horizons)}"
+
+        keys = []
+        for num_row, cat_row, mutations in zip(
+            numeric.itertuples(index=False), categorical.itertuples(index=False),
+            self._mutation_signatures(features, molecular),
+        ):
+            # repr() of a float round-trips exactly (and gives 'nan' for missing values)
+            raw = prefix + "|" + ",".join(map(repr, num_row)) + "|" + ",".join(cat_row) + "|" + mutations
+            keys.append(hashlib.sha1(raw.encode()).hexdigest())
+        return keys
+
+    def _check_model_version(self, model_version):
+        with self._version_lock:
+            if model_version != self._model_version:
+                if self._model_version is not None and not self.backend.shared:
+                    self.backend.clear()
+                self._model_version = model_version
+
+    def get_or_compute(self, features, model_version, time_horizons, compute, molecular=None):
+        '''
+        Returns (risk_scores, survival) for the rows of features (mutations of the same
+        patients in molecular, matched by ID). Only the rows missing from the cache are
+        passed (in one batch) to compute.
+        '''
+        try:
+            self._check_model_version(model_version)
+            keys = self._canonical_keys(features, model_version, time_horizons, molecular)
+
+            risk_scores = np.empty(len(keys), dtype=np.float64)
+            survival = np.empty((len(keys), len(time_horizons)), dtype=np.float64)
+
+            missing = []
+            for i, key in enumerate(keys):
+                value = self.backend.get(key)
+                if value is None:
+                    missing.append(i)
+                else:
+                    risk_scores[i], survival[i] = value[0], value[1]
+
+            hits_total.inc(len(keys) - len(missing))
+            misses_total.inc(len(missing))
+
+            if missing:
+                missing_risk, missing_survival = compute(features.iloc[missing])
+                risk_scores[missing] = missing_risk
+                survival[missing] = missing_survival
+                for i, risk, surv in zip(missing, missing_risk, missing_survival):
+                    self.backend.set(keys[i], [float(risk), [float(p) for p in surv]])
+
+            cache_entries.set(len(self.backend))
+            return risk_scores, survival
+
+        except Exception as e:
+            raise CustomException(e, sys)
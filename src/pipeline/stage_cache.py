@@ -0,0 +1,133 @@
+import os
+import sys
+import json
+import time
+import inspect
+import hashlib
+from dataclasses import dataclass
+
+from src.exception import CustomException
+from src.logger import logging
+from src.utils import save_json, file_digest
+
+
+@dataclass
+class StageCacheConfig:
+    # Stage outputs that have no fixed location (e.g. transformed arrays) are stored per key here
+    cache_dir: str = os.path.join("artifacts", "cache")
+    manifest_file_path: str = os.path.join("artifacts", "manifest.json")
+
+
+def code_digest(*objects):
+    '''
+    Hash of the source files defining the given modules/classes/functions.
+    '''
+    digest = hashlib.sha256()
+    for source_file in sorted({inspect.getsourcefile(obj) for obj in objects}):
+        with open(source_file, "rb") as file_obj:
+            digest.update(file_obj.read())
+    return digest.hexdigest()
+
+
+def config_values(config):
+    '''
+    Public attributes of a config dataclass (fields and class-level defaults), as strings.
+    '''
+    values = {}
+    for source in (vars(type(config)), vars(config)):
+        for name, value in source.items():
+            if not name.startswith("_") and not callable(value):
+                values[name] = repr(value)
+    return values
+
+
+class StageCache:
+    '''
+    Content-addressed cache of the training stages.
+    Each stage hashes its inputs (source digests, config values, code version);
+    the manifest maps every key to the stage outputs and their digests.
+    A stage is skipped when an entry exists for its key and its outputs are still on disk, unchanged.
+    '''
+    def __init__(self, config=None):
+        self.cache_config = config or StageCacheConfig()
+        self.manifest = self._read_manifest()
+
+    def _read_manifest(self):
+        if not os.path.exists(self.cache_config.manifest_file_path):
+            return {"stages": {}}
+        with open(self.cache_config.manifest_file_path) as file_obj:
+            return json.load(file_obj)
+
+    @staticmethod
+    def stage_key(stage, inputs):
+        payload = json.dumps({"stage": stage, "inputs": inputs}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def stage_dir(self, stage, key):
+        path = os.path.join(self.cache_config.cache_dir, stage, key[:16])
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _output_is_valid(self, output):
+        try:
+            stat = os.stat(output["path"])
+        except OSError:
+            return False
+        if stat.st_size != output["size"]:
+            return False
+        # Same size and mtime: trust the recorded digest, otherwise re-hash the file
+        if stat.st_mtime_ns == output["mtime_ns"]:
+            return True
+        return file_digest(output["path"]) == output["sha256"]
+
+    def lookup(self, stage, key):
+        entry = self.manifest["stages"].get(stage, {}).get(key)
+        if entry is None:
+            return None
+        if not all(self._output_is_valid(output) for output in entry["outputs"].values()):
+            return None
+        return entry
+
+    def record(self, stage, key, outputs, metadata=None):
+        entry = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "outputs": {},
+            "metadata": metadata or {},
+        }
+        for name, path in outputs.items():
+            stat = os.stat(path)
+            entry["outputs"][name] = {
+                "path": path,
+                "sha256": file_digest(path),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+            }
+
+        self.manifest["stages"].setdefault(stage, {})[key] = entry
+        save_json(self.cache_config.manifest_file_path, self.manifest)
+        return entry
+
+    def run_stage(self, stage, inputs, run, save, load):
+        '''
+        run(): executes the stage and returns its result.
+        save(result, stage_dir): returns (outputs {name: path}, metadata) for the manifest.
+        load(outputs {name: path}, metadata): rebuilds the result from a cached entry.
+        Returns (result, key).
+        '''
+        try:
+            key = self.stage_key(stage, inputs)
+            entry = self.lookup(stage, key)
+
+            if entry is not None:
+                logging.info(f"[cache] {stage}: inputs unchanged (key {key[:12]}), skipping")
+                outputs = {name: output["path"] for name, output in entry["outputs"].items()}
+                return load(outputs, entry["metadata"]), key
+
+            logging.info(f"[cache] {stage}: no cached result for key {key[:12]}, running")
+            result = run()
+            outputs, metadata = save(result, self.stage_dir(stage, key))
+            self.record(stage, key, outputs, metadata)
+            return result, key
+
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -1,12 +1,39 @@
+import os
 import sys
-from src.components.data_ingestion import DataIngestion
+import time
+import argparse
+
+from src import utils
+from src.components import (
+    cytogenetics_features, data_ingestion, data_transformation, datasets, forest_compression, forest_engine,
+    model_evaluation, model_explanation, model_leaderboard, model_trainer, hyperparameter_search, molecular_features
+)
+from src.components.datasets import SurvivalDataset, TransformedData, read_frame, write_frame
+from src.components.data_ingestion import DataIngestion, partition_paths
 from src.components.data_transformation import DataTransformation
 from src.components.model_trainer import ModelTrainer
 from src.exception import CustomException
+from src.instrumentation import span
+from src.logger import logging
+from src.pipeline.stage_cache import StageCache, code_digest, config_values, file_digest
 
 class TrainPipeline:
-    def __init__(self):
-        pass
+    def __init__(self, use_cache=True, streaming_ingestion=False, search_strategy=None):
+        # Stages whose inputs did not change are skipped (see StageCache)
+        self.stage_cache = StageCache() if use_cache else None
+        self.streaming_ingestion = streaming_ingestion
+        # None: ModelTrainerConfig.search_strategy
+        self.search_strategy = search_strategy
+
+    def _run_stage(self, stage, inputs, run, save, load):
+        start = time.perf_counter()
+        with span(stage):
+            if self.stage_cache is None:
+                result = run(), None
+            else:
+                result = self.stage_cache.run_stage(stage, inputs, run, save, load)
+        logging.info(f"[stage] {stage} done in {time.perf_counter() - start:.2f}s")
+        return result
 
     def run_pipeline(self):
         '''
@@ -15,24 +42,133 @@ class TrainPipeline:
         try:
             print(">> 1. Starting Data Ingestion")
             obj = DataIngestion()
-            train_data_path, test_data_path = obj.initiate_data_ingestion()
+            config = obj.ingestion_config
+            config.streaming = self.streaming_ingestion
+
+            def save_splits(result, stage_dir):
+                train_set, test_set = result
+                if config.streaming:
+                    # Partitioned output: one manifest entry per part file
+                    return {
+                        f"{split}/{os.path.basename(path)}": path
+                        for split in ("train", "test")
+                        for path in partition_paths(config.partitioned_data_dir, split)
+                    }, {}
+                if config.persist_data:
+                    return {"train": config.train_data_path, "test": config.test_data_path}, {}
+                outputs = {
+                    "train": os.path.join(stage_dir, "train.parquet"),
+                    "test": os.path.join(stage_dir, "test.parquet"),
+                }
+                write_frame(train_set, outputs["train"])
+                write_frame(test_set, outputs["test"])
+                return outputs, {}
+
+            def load_splits(outputs, _):
+                if config.streaming:
+                    # Part files, read by the transformation stage only if it runs
+                    return tuple(
+                        [path for name, path in sorted(outputs.items()) if name.startswith(f"{split}/")]
+                        for split in ("train", "test")
+                    )
+                return read_frame(outputs["train"]), read_frame(outputs["test"])
+
+            (train_set, test_set), ingestion_key = self._run_stage(
+                "data_ingestion",
+                inputs={
+                    "sources": {
+                        path: file_digest(path)
+                        for path in (config.clinical_data_path, config.molecular_data_path, config.target_data_path)
+                    },
+                    "config": config_values(config),
+                    "code": code_digest(data_ingestion, datasets),
+                },
+                run=obj.initiate_data_ingestion,
+                save=save_splits,
+                load=load_splits,
+            )
 
             print(">> 2. Starting Data Transformation")
-            data_transformation = DataTransformation()
-            train_arr, test_arr, _ = data_transformation.initiate_data_transformation(train_data_path, test_data_path)
+            data_transformation_obj = DataTransformation()
+            transformation_config = data_transformation_obj.data_transformation_config
+
+            def save_datasets(result, stage_dir):
+                outputs = {"preprocessor": result.preprocessor_path}
+                outputs.update(result.train.save(stage_dir, "train"))
+                outputs.update(result.test.save(stage_dir, "test"))
+                return outputs, {}
+
+            transformed, transformation_key = self._run_stage(
+                "data_transformation",
+                inputs={
+                    # Ingestion outputs are determined by its key (content-addressed chain)
+                    "data": ingestion_key or "uncached",
+                    "molecular": (
+                        file_digest(transformation_config.molecular_data_path)
+                        if transformation_config.molecular_data_path else None
+                    ),
+                    "config": config_values(transformation_config),
+                    "code": code_digest(data_transformation, cytogenetics_features, molecular_features, datasets, utils),
+                },
+                run=lambda: data_transformation_obj.initiate_data_transformation(train_set, test_set),
+                save=save_datasets,
+                load=lambda outputs, _: TransformedData(
+                    train=SurvivalDataset.load(outputs, "train"),
+                    test=SurvivalDataset.load(outputs, "test"),
+                    preprocessor_path=outputs["preprocessor"],
+                ),
+            )
 
             print(">> 3. Starting Model Training")
-            model_trainer = ModelTrainer()
-            score = model_trainer.initiate_model_trainer(train_arr, test_arr)
+            model_trainer_obj = ModelTrainer()
+            trainer_config = model_trainer_obj.model_trainer_config
+            if self.search_strategy is not None:
+                trainer_config.search_strategy = self.search_strategy
+            score = self._run_stage(
+                "model_trainer",
+                inputs={
+                    "data": transformation_key or "uncached",
+                    "config": config_values(trainer_config),
+                    "code": code_digest(
+                        model_trainer, model_leaderboard, model_evaluation, hyperparameter_search,
+                        forest_engine, forest_compression, model_explanation, utils
+                    ),
+                },
+                run=lambda: model_trainer_obj.initiate_model_trainer(transformed.train, transformed.test),
+                save=lambda result, _: (
+                    # The engine files only exist when the selected model is a survival forest
+                    {name: path for name, path in {
+                        "model": trainer_config.trained_model_file_path,
+                        "engine": trainer_config.engine_file_path,
+                        "report": trainer_config.training_report_file_path,
+                        "evaluation": trainer_config.evaluation_config.report_file_path,
+                        "compressed_engine": trainer_config.compression_config.compressed_engine_file_path,
+                        "compression_report": trainer_config.compression_config.report_file_path,
+                        "explainer": trainer_config.explanation_config.explainer_file_path,
+                        "permutation_importance": trainer_config.explanation_config.report_file_path,
+                    }.items() if os.path.exists(path)},
+                    {"score": result},
+                ),
+                load=lambda _, metadata: metadata["score"],
+            )[0]
 
             print("\n" + "="*50)
             print(f" TRAINING PIPELINE COMPLETED SUCCESSFULL")
             print(f" Final C-Index Score: {score:.4f}")
             print("="*50 + "\n")
-            
+
         except Exception as e:
             raise CustomException(e, sys)
 
 if __name__=="__main__":
-    pipeline = TrainPipeline()
-    pipeline.run_pipeline()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the training pipeline.")
+    parser.add_argument("--no-cache", action="store_true", help="Re-run every stage, even if its inputs are unchanged")
+    parser.add_argument("--streaming", action="store_true", help="Chunked, out-of-core ingestion (partitioned Parquet output)")
+    parser.add_argument("--search", choices=["warm_start", "halving", "leaderboard"],
+                        help="Model search (default: ModelTrainerConfig.search_strategy)")
+    args = parser.parse_args()
+
+    pipeline = TrainPipeline(
+        use_cache=not args.no_cache, streaming_ingestion=args.streaming, search_strategy=args.search
+    )
+    pipeline.run_pipeline()
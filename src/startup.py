@@ -0,0 +1,165 @@
+import os
+import re
+import gc
+import sys
+import time
+import argparse
+import importlib
+import subprocess
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from src.logger import logging
+from src.metrics import metrics
+
+# Modules behind most of the serving cold start (pandas, scikit-learn, scikit-survival, the model code)
+HEAVY_MODULES = (
+    "numpy",
+    "pandas",
+    "sklearn",
+    "sksurv",
+    "src.pipeline.predict_pipeline",
+    "src.pipeline.batch_predict_pipeline",
+)
+
+IMPORT_TIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def process_start_time():
+    '''
+    Wall-clock start time of this process (from /proc on Linux, import time elsewhere).
+    '''
+    try:
+        with open("/proc/self/stat") as file_obj:
+            # Field 22 (starttime, in clock ticks after boot); the process name may contain spaces
+            start_ticks = int(file_obj.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as file_obj:
+            uptime = float(file_obj.read().split()[0])
+        return time.time() - uptime + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+# Origin of time_to_first_prediction_seconds (reset to the fork time in forked workers)
+_process_start = process_start_time()
+_first_prediction_done = False
+
+
+@dataclass
+class StartupConfig:
+    # "preload": heavy modules and model loaded when the app is imported (once in the gunicorn
+    # master with --preload, then shared copy-on-write with the workers), "lazy": on the first request
+    mode: str = field(default_factory=lambda: os.environ.get("STARTUP_MODE", "preload"))
+    # Predict one patient after loading, so the first real request does not pay one-off costs
+    warmup: bool = field(default_factory=lambda: os.environ.get("STARTUP_WARMUP", "1") == "1")
+
+
+@contextmanager
+def startup_phase(phase):
+    '''
+    Times one step of the startup (imports, model_load, warmup) into the startup_seconds gauge.
+    '''
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.gauge("startup_seconds", "Duration of the startup phases", labels={"phase": phase}).set(elapsed)
+        logging.info(f"[startup] {phase}: {elapsed:.3f}s")
+
+
+def timed_import(name):
+    '''
+    Imports a module and records its import time (dependencies not imported yet included).
+    '''
+    already_loaded = name in sys.modules
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    if not already_loaded:
+        metrics.gauge(
+            "module_import_seconds", "Import time of the heavy modules, in import order", labels={"module": name}
+        ).set(time.perf_counter() - start)
+    return module
+
+
+def import_heavy_modules(modules=HEAVY_MODULES):
+    with startup_phase("imports"):
+        for name in modules:
+            timed_import(name)
+
+
+def record_first_prediction():
+    '''
+    Called after every successful prediction: the first one sets time_to_first_prediction_seconds
+    (from process start, or from fork for a preloaded worker).
+    '''
+    global _first_prediction_done
+    if _first_prediction_done:
+        return
+    _first_prediction_done = True
+    elapsed = time.time() - _process_start
+    metrics.gauge(
+        "time_to_first_prediction_seconds", "Time from process (or worker) start to the first prediction served"
+    ).set(elapsed)
+    logging.info(f"[startup] first prediction after {elapsed:.3f}s")
+
+
+def freeze_for_fork():
+    '''
+    Called in the master just before the workers are forked: moves every object
+    allocated so far (modules, model, preprocessor) to the permanent GC generation.
+    The workers' collections then never write to those pages, which stay shared.
+    '''
+    gc.collect()
+    gc.freeze()
+
+
+def _reset_after_fork():
+    global _process_start, _first_prediction_done
+    _process_start = time.time()
+    _first_prediction_done = False
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def import_times(target="app"):
+    '''
+    Import time of every module imported by `import target`, measured in a fresh
+    interpreter with -X importtime. Returns [(module, self_seconds, cumulative_seconds, depth)].
+    '''
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    times = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            times.append((module, int(self_us) / 1e6, int(cumulative_us) / 1e6, len(indent) // 2))
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import time per module of a cold start.")
+    parser.add_argument("target", nargs="?", default="app", help="Module to import (default: app)")
+    parser.add_argument("--top", type=int, default=20, help="Number of modules shown")
+    parser.add_argument("--depth", type=int, default=1, help="Only modules imported at most this deep")
+    args = parser.parse_args(argv)
+
+    times = import_times(args.target)
+    total = max(cumulative for _, _, cumulative, _ in times)
+    print(f"import {args.target}: {total * 1000:.0f} ms")
+    shown = sorted((entry for entry in times if entry[3] <= args.depth), key=lambda entry: -entry[2])
+    for module, self_seconds, cumulative, depth in shown[:args.top]:
+        print(f"{cumulative * 1000:9.1f} ms  {self_seconds * 1000:8.1f} ms self  {'  ' * depth}{module}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
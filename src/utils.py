@@ -1,68 +1,163 @@
 import os
 import sys
+import json
+import hashlib
 
 import numpy as np 
 import pandas as pd
 import dill
 import pickle
 
-from sklearn.model_selection import GridSearchCV
 
 from src.exception import CustomException
+from src.artifact_store import save_artifact, load_artifact, is_artifact_file, read_header
+from src.instrumentation import span
+from src.components.forest_engine import CompiledForest
+from src.components.hyperparameter_search import (
+    GridSearchConfig, WarmStartSearchConfig, grid_search, search_hyperparameters, warm_start_search
+)
 
-def save_object(file_path, obj):
+def save_object(file_path, obj, artifact_format="pickle", compress=None):
     """
-    save python object (model, preprocessor) in a pickle file.
+    save python object (model, preprocessor) in a pickle file,
+    or in the memory-mappable artifact format (artifact_format="mmap", see artifact_store).
     """
     try:
+        if artifact_format == "mmap":
+            save_artifact(file_path, obj, compress=compress)
+            return
+
         dir_path = os.path.dirname(file_path)
 
         os.makedirs(dir_path, exist_ok=True)
 
-        with open(file_path, "wb") as file_obj:
+        # Write to a temporary file then rename, so a reader never sees a half-written artifact
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, "wb") as file_obj:
             pickle.dump(obj, file_obj)
 
+        os.replace(tmp_path, file_path)
+
     except Exception as e:
         raise CustomException(e, sys)
     
-def evaluate_models(X_train, y_train, X_test, y_test, models, param):
+def evaluate_models(X_train, y_train, X_test, y_test, models, param, search_config=None):
     """
-    train and evaluate a list of models 
-    return dictionnary with the name of the model and score (C-Index).
+    tune and evaluate a list of models
+    (warm-start n_estimators curves, exhaustive grid, or successive halving + random search, depending on search_config)
+    return dictionnary with the name of the model and score (C-Index),
+    and dictionnary with the name of the model and search report.
+    models[model_name] is replaced by the refitted best estimator.
     """
     try:
         report = {}
+        search_reports = {}
 
-        for i in range(len(list(models))):
-            model_name = list(models.keys())[i]
-            model = list(models.values())[i]
-            
+        for model_name, model in list(models.items()):
             para = param[model_name]
 
-            gs = GridSearchCV(model, para, cv=3, n_jobs=-1)
-            gs.fit(X_train, y_train)
+            if isinstance(search_config, WarmStartSearchConfig):
+                search = warm_start_search(model, para, X_train, y_train, config=search_config)
+            elif isinstance(search_config, GridSearchConfig):
+                search = grid_search(model, para, X_train, y_train, config=search_config)
+            else:
+                search = search_hyperparameters(model, para, X_train, y_train, config=search_config)
 
-            model.set_params(**gs.best_params_)
-            
-            model.fit(X_train, y_train)
+            # the best configuration is already trained on the whole training set
+            best_model = search.best_estimator_
+            models[model_name] = best_model
 
             # --- EVALUATION (C-Index) ---
-            
-            train_model_score = model.score(X_train, y_train)
-            test_model_score = model.score(X_test, y_test)
+            test_model_score = best_model.score(X_test, y_test)
 
             report[model_name] = test_model_score
+            search_reports[model_name] = dict(search.report, test_c_index=test_model_score)
 
-        return report
+        return report, search_reports
 
     except Exception as e:
         raise CustomException(e, sys)
     
-def load_object(file_path):
+def survival_at_horizons(model, X, horizons):
+    """
+    evaluate the survival curves of a whole batch at several horizons in one vectorized pass.
+    return the risk scores (n_patients,) and the survival matrix (n_patients, n_horizons).
+    """
+    try:
+        horizons = np.atleast_1d(np.asarray(horizons, dtype=np.float64))
+        unique_times = model.unique_times_
+
+        # Same semantics as StepFunction: value at the last event time <= horizon,
+        # first value before the first event time, last value after the last one
+        horizon_idx = np.searchsorted(unique_times, horizons, side="right") - 1
+        horizon_idx = np.clip(horizon_idx, 0, len(unique_times) - 1)
+
+        if isinstance(model, CompiledForest):
+            # Fast path: one traversal of the flat node arrays, then the leaf values are reduced
+            with span("predict"):
+                leaves = model.apply(X)
+            with span("survival_evaluation"):
+                return model.reduce_at_horizons(leaves, horizon_idx)
+
+        with span("predict"):
+            risk_scores = model.predict(X)
+        with span("survival_evaluation"):
+            survival = model.predict_survival_function(X, return_array=True)[:, horizon_idx]
+
+        return risk_scores, survival
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+def save_json(file_path, obj):
+    """
+    save a report (dict) as JSON, numpy scalars and arrays included.
+    """
+    try:
+        def to_builtin(value):
+            if hasattr(value, "tolist"):
+                return value.tolist()
+            return str(value)
+
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, "w") as file_obj:
+            json.dump(obj, file_obj, indent=2, default=to_builtin)
+
+        os.replace(tmp_path, file_path)
+
+    except Exception as e:
+        raise CustomException(e, sys)
+
+def file_digest(file_path):
     """
-    Charge un objet Python depuis un fichier pickle.
+    sha256 of a file, read in 1 MB blocks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file_obj:
+        for block in iter(lambda: file_obj.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def content_digest(file_path):
+    """
+    sha256 identifying a saved object: the checksum stored in the header of artifact files
+    (nothing else is read), file_digest of the whole file for plain pickles.
+    """
+    if is_artifact_file(file_path):
+        return read_header(file_path)["sha256"]
+    return file_digest(file_path)
+
+def load_object(file_path, mmap_mode="r", verify=False):
+    """
+    Charge un objet Python depuis un fichier pickle
+    ou depuis le format artifact (détecté automatiquement, tableaux mappés en mémoire).
     """
     try:
+        if is_artifact_file(file_path):
+            return load_artifact(file_path, mmap_mode=mmap_mode, verify=verify)
+
         with open(file_path, "rb") as file_obj:
             return pickle.load(file_obj)
 
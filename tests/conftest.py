@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+from sksurv.ensemble import RandomSurvivalForest
+from sksurv.util import Surv
+
+
+@pytest.fixture(scope="session")
+def survival_data():
+    '''
+    Small synthetic cohort: risk driven by the first two features, about 30% censored,
+    with a few missing values (the forest routes them like sklearn's trees).
+    '''
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, 5)).astype(np.float32)
+    event_time = rng.exponential(np.exp(-(X[:, 0] + 0.5 * X[:, 1]))) * 5
+    event = rng.random(300) < 0.7
+    # Follow-up times repeat in the real data
+    event_time = np.round(event_time, 1) + 0.1
+    X[rng.random(X.shape) < 0.02] = np.nan
+    return X, Surv.from_arrays(event, event_time)
+
+
+@pytest.fixture(scope="session")
+def forest(survival_data):
+    X, y = survival_data
+    return RandomSurvivalForest(n_estimators=20, min_samples_leaf=5, random_state=0).fit(X[:200], y[:200])
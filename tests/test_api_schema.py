@@ -0,0 +1,101 @@
+import pytest
+
+from src.pipeline.api_schema import (
+    SchemaError, validate_batch_request, validate_explain_request, validate_form, validate_patient,
+    validate_single_request,
+)
+
+
+def patient(**overrides):
+    record = dict(
+        BM_BLAST=5.0, WBC=4.0, ANC=2.0, MONOCYTES=0.3, HB=10.0, PLT=150.0,
+        CENTER="CHU", CYTOGENETICS="46,xy[20]",
+        mutations=[dict(GENE="TP53", EFFECT="non_synonymous_codon", VAF=0.4)],
+    )
+    record.update(overrides)
+    return record
+
+
+def error_fields(validate, payload, *args):
+    with pytest.raises(SchemaError) as info:
+        validate(payload, *args)
+    return {error["field"]: error["message"] for error in info.value.errors}
+
+
+def test_valid_patient_gets_nmut_from_mutations():
+    record = validate_patient(patient())
+    assert record["Nmut"] == 1.0
+    assert record["mutations"] == [{"GENE": "TP53", "EFFECT": "non_synonymous_codon", "VAF": 0.4}]
+
+
+def test_patient_without_mutations():
+    assert validate_patient(patient(mutations=[]))["Nmut"] == 0.0
+
+
+def test_mutations_are_required():
+    record = patient()
+    del record["mutations"]
+    assert error_fields(validate_patient, record) == {"mutations": "is required"}
+
+
+def test_nmut_must_match_the_mutations():
+    assert "Nmut" in error_fields(validate_patient, patient(Nmut=3))
+    assert validate_patient(patient(Nmut=1))["Nmut"] == 1.0
+
+
+def test_mutation_errors_have_item_paths():
+    errors = error_fields(validate_patient, patient(mutations=[dict(GENE="TP53", VAF=1.5), dict(VAF=0.1)]))
+    assert errors == {"mutations[0].VAF": "must be <= 1", "mutations[1].GENE": "is required"}
+
+
+@pytest.mark.parametrize("value, message", [
+    ("5", "must be a number"),
+    (True, "must be a number"),
+    (-1, "must be >= 0"),
+    (101, "must be <= 100"),
+    (10 ** 400, "must be finite"),
+])
+def test_number_rules(value, message):
+    assert error_fields(validate_patient, patient(BM_BLAST=value)) == {"BM_BLAST": message}
+
+
+def test_nulls_unknown_fields_and_body_type():
+    assert validate_patient(patient(WBC=None))["WBC"] is None
+    assert error_fields(validate_patient, patient(CENTER=None)) == {"CENTER": "must not be null"}
+    assert error_fields(validate_patient, patient(AGE=60)) == {"AGE": "unknown field"}
+    assert error_fields(validate_patient, [patient()]) == {"body": "must be a JSON object"}
+
+
+def test_form_coerces_strings():
+    form = {key: str(value) for key, value in patient().items() if key != "mutations"}
+    form.update(WBC="", mutations="TP53, non_synonymous_codon, 0.4\nTET2,stop_gained,0.2\n")
+    record = validate_form(form)
+    assert record["BM_BLAST"] == 5.0
+    assert record["WBC"] is None
+    assert [mutation["GENE"] for mutation in record["mutations"]] == ["TP53", "TET2"]
+    assert record["Nmut"] == 2.0
+
+
+def test_horizons_and_top():
+    record = validate_single_request(patient(time_horizons=[1, 2.5]))
+    assert record["time_horizons"] == [1.0, 2.5]
+    assert error_fields(validate_single_request, patient(time_horizons=[0])) == {"time_horizons": "items must be > 0"}
+    assert error_fields(validate_single_request, patient(time_horizons=[])) == {
+        "time_horizons": "must be a non-empty array of numbers"
+    }
+    assert validate_explain_request(patient(top=5))["top"] == 5.0
+    assert "top" in error_fields(validate_explain_request, patient(top=0))
+
+
+def test_batch_request():
+    records, horizons = validate_batch_request([patient(), patient(mutations=[])], max_patients=10)
+    assert [record["Nmut"] for record in records] == [1.0, 0.0]
+    assert horizons is None
+
+    records, horizons = validate_batch_request({"patients": [patient()], "time_horizons": [3]}, max_patients=10)
+    assert horizons == [3.0]
+
+    errors = error_fields(validate_batch_request, {"patients": [patient(), patient(HB=-1)]}, 10)
+    assert errors == {"patients[1].HB": "must be >= 0"}
+    assert "patients" in error_fields(validate_batch_request, [patient()] * 3, 2)
+    assert "patients" in error_fields(validate_batch_request, {"patients": []}, 10)
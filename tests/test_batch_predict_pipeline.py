@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+
+from src.pipeline.api_schema import (
+    CLINICAL_SCHEMA, PATIENT_FIELDS, SchemaError, validate_batch_request, validate_cohort_patient
+)
+from src.pipeline.batch_predict_pipeline import attach_mutations, check_table, cohort_frames, mutation_table, read_table
+
+COHORT = pd.DataFrame({"ID": ["A", "B", "C"], "BM_BLAST": [5.0, 2.0, 1.0], "Nmut": [2, 0, None]})
+MUTATIONS = mutation_table([
+    {"ID": "A", "GENE": "TP53", "EFFECT": "stop_gained", "VAF": 0.4},
+    {"ID": "A", "GENE": "TET2", "EFFECT": "frameshift_variant", "VAF": 0.2},
+    {"ID": "Z", "GENE": "ASXL1", "EFFECT": "stop_gained", "VAF": 0.3},
+])
+
+
+def error_fields(*args):
+    with pytest.raises(SchemaError) as info:
+        attach_mutations(*args)
+    return [error["field"] for error in info.value.errors]
+
+
+def test_nmut_is_set_from_the_mutation_rows():
+    df = attach_mutations(COHORT, MUTATIONS, required=True)
+    assert df.set_index("ID")["Nmut"].to_dict() == {"A": 2, "B": 0, "C": 0}
+
+
+def test_mutations_are_required_by_a_molecular_model():
+    assert error_fields(COHORT, None, True) == ["mutations"]
+    # Clinical-only model: the cohort is used as it is
+    assert attach_mutations(COHORT, None, required=False) is COHORT
+
+
+def test_nmut_without_mutation_rows_is_rejected():
+    assert error_fields(COHORT.assign(Nmut=[2, 1, None]), MUTATIONS, True) == ["Nmut"]
+    assert error_fields(COHORT, MUTATIONS.iloc[:0], True) == ["Nmut"]
+
+
+def test_ids_are_required_and_unique():
+    assert error_fields(COHORT.drop(columns="ID"), MUTATIONS, True) == ["ID"]
+    assert error_fields(COHORT.assign(ID=["A", "A", "C"], Nmut=None), MUTATIONS, True) == ["ID"]
+
+
+def test_unreadable_file_is_a_schema_error(tmp_path):
+    path = tmp_path / "cohort.parquet"
+    path.write_bytes(b"not parquet")
+    with pytest.raises(SchemaError) as info:
+        read_table(str(path))
+    assert info.value.errors[0]["field"] == "file"
+    with pytest.raises(SchemaError):
+        read_table(str(path), file_format="xls")
+
+
+def test_check_table_reports_columns_types_and_ranges():
+    df = pd.DataFrame({"BM_BLAST": ["5", "abc", 120], "WBC": [1.0, None, 2.0], "CENTER": ["A", "B", 3]})
+    with pytest.raises(SchemaError) as info:
+        check_table(df, CLINICAL_SCHEMA)
+    errors = [(error["field"], error["message"]) for error in info.value.errors]
+    assert ("file.BM_BLAST", "must be a number (1 rows, first at row 1)") in errors
+    assert ("file.BM_BLAST", "must be <= 100 (1 rows, first at row 2)") in errors
+    assert ("file.ANC", "column is missing") in errors
+    # Optional columns may be absent
+    assert "file.CYTOGENETICS" not in dict(errors)
+
+    clean = check_table(df.assign(BM_BLAST=["5", None, 12]).reindex(columns=PATIENT_FIELDS), CLINICAL_SCHEMA)
+    assert clean["BM_BLAST"].tolist()[::2] == [5.0, 12.0]
+    assert clean["CENTER"].tolist() == ["A", "B", "3"]
+
+
+def test_cohort_frames_keep_ids_and_mutations():
+    patient = dict(
+        BM_BLAST=5.0, WBC=4.0, ANC=2.0, MONOCYTES=0.3, HB=10.0, PLT=150.0, CENTER="CHU", CYTOGENETICS=None,
+        mutations=[{"GENE": "TP53", "EFFECT": None, "VAF": 0.4}],
+    )
+    records, _ = validate_batch_request([dict(patient, ID="A"), patient], 10, validate=validate_cohort_patient)
+    df, molecular = cohort_frames(records)
+    assert df["ID"].tolist() == ["A", "P1"]
+    assert molecular["ID"].tolist() == ["A", "P1"]
+    assert attach_mutations(df, molecular, required=True)["Nmut"].tolist() == [1, 1]
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from src.components.cytogenetics_features import CYTOGENETICS_FEATURES, cytogenetics_features, parse_karyotype
+
+
+def features(karyotype):
+    return dict(zip(CYTOGENETICS_FEATURES, parse_karyotype(karyotype)))
+
+
+def test_normal_karyotype():
+    parsed = features("46,xy[20]")
+    assert parsed["CYTO_NORMAL"] == 1
+    assert parsed["CYTO_N_ABNORMALITIES"] == 0
+    assert parsed["CYTO_N_CLONES"] == 1
+
+
+def test_monosomy_7_without_sex_chromosomes():
+    parsed = features("45,-7[20]")
+    assert parsed["CYTO_MONOSOMY_7"] == 1
+    assert parsed["CYTO_N_MONOSOMIES"] == 1
+    assert parsed["CYTO_NORMAL"] == 0
+
+
+def test_trisomy_8_repeated_in_idem_subclone():
+    parsed = features("47,xy,+8[10]/47,idem,+8[5]")
+    assert parsed["CYTO_TRISOMY_8"] == 1
+    assert parsed["CYTO_N_TRISOMIES"] == 1
+    assert parsed["CYTO_N_CLONES"] == 2
+
+
+def test_deletion_5q_with_monosomy_7_is_monosomal():
+    parsed = features("46,xx,del(5)(q13q33)[10]/45,sl,-7[8]")
+    assert parsed["CYTO_DEL_5Q"] == 1
+    assert parsed["CYTO_MONOSOMY_7"] == 1
+    assert parsed["CYTO_MONOSOMAL"] == 1
+    assert parsed["CYTO_N_DELETIONS"] == 1
+
+
+def test_loss_of_y_is_not_an_autosomal_monosomy():
+    parsed = features("45,x,-y[20]")
+    assert parsed["CYTO_LOSS_Y"] == 1
+    assert parsed["CYTO_N_MONOSOMIES"] == 0
+    assert parsed["CYTO_MONOSOMAL"] == 0
+
+
+def test_complex_karyotype():
+    parsed = features("44,xy,del(5)(q13q33),-7,t(3;7)(q26;q21),del(17)(p11.2),-18[15]/46,xy[5]")
+    assert parsed["CYTO_COMPLEX"] == 1
+    assert parsed["CYTO_N_TRANSLOCATIONS"] == 1
+    assert parsed["CYTO_ABN_17P"] == 1
+    assert parsed["CYTO_N_ABNORMALITIES"] == 5
+
+
+@pytest.mark.parametrize("karyotype", ["", "  "])
+def test_empty_karyotype_is_missing(karyotype):
+    assert features(karyotype)["CYTO_MISSING"] == 1
+
+
+def test_feature_matrix_rows_follow_the_column():
+    values = ["45,-7[20]", None, "46,xy[20]", "45,-7[20]"]
+    matrix = cytogenetics_features(values)
+    assert matrix.shape == (4, len(CYTOGENETICS_FEATURES))
+    assert matrix.dtype == np.float32
+    np.testing.assert_array_equal(matrix[0], matrix[3])
+    assert matrix[1, CYTOGENETICS_FEATURES.index("CYTO_MISSING")] == 1
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+from src.components.forest_engine import CompiledForest
+from src.utils import survival_at_horizons
+
+
+@pytest.fixture(scope="module")
+def engine(forest):
+    return CompiledForest.from_forest(forest)
+
+
+def test_compiled_forest_matches_sksurv(forest, engine, survival_data):
+    X = survival_data[0][200:]
+    np.testing.assert_array_equal(engine.predict(X), forest.predict(X))
+    np.testing.assert_array_equal(
+        engine.predict_survival_function(X), forest.predict_survival_function(X, return_array=True)
+    )
+    np.testing.assert_array_equal(
+        engine.predict_cumulative_hazard_function(X),
+        forest.predict_cumulative_hazard_function(X, return_array=True),
+    )
+
+
+def test_compiled_forest_accepts_sparse_input(engine, survival_data):
+    X = np.nan_to_num(survival_data[0][200:])
+    np.testing.assert_array_equal(engine.predict(sparse.csr_matrix(X)), engine.predict(X))
+
+
+def test_compiled_forest_rejects_wrong_width(engine):
+    with pytest.raises(ValueError):
+        engine.apply(np.zeros((2, engine.n_features_in_ + 1)))
+
+
+def test_survival_at_horizons_step_semantics(forest, survival_data):
+    X = survival_data[0][200:]
+    times = forest.unique_times_
+    curves = forest.predict_survival_function(X, return_array=True)
+    horizons = [
+        times[0] / 2,                    # before the first event time: first value
+        times[3],                        # on an event time: value at that time
+        (times[3] + times[4]) / 2,       # between two event times: value at the previous one
+        times[-1] * 2,                   # after the last event time: last value
+    ]
+    risk_scores, survival = survival_at_horizons(forest, X, horizons)
+
+    np.testing.assert_array_equal(risk_scores, forest.predict(X))
+    np.testing.assert_array_equal(survival, curves[:, [0, 3, 3, len(times) - 1]])
+    # Same values as sksurv's StepFunction inside its domain
+    step_functions = forest.predict_survival_function(X[:5])
+    np.testing.assert_allclose(survival[:5, 2], [fn(horizons[2]) for fn in step_functions])
+
+
+def test_survival_at_horizons_compiled_matches_forest(forest, engine, survival_data):
+    X = survival_data[0][200:]
+    horizons = np.quantile(forest.unique_times_, [0.1, 0.5, 0.9])
+    for expected, actual in zip(survival_at_horizons(forest, X, horizons), survival_at_horizons(engine, X, horizons)):
+        np.testing.assert_array_equal(actual, expected)
@@ -0,0 +1,97 @@
+import threading
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.pipeline.inference_pool import InferencePool, InferencePoolConfig, InferenceTimeout, PoolOverloaded
+
+
+@pytest.fixture
+def pool():
+    pool = InferencePool(InferencePoolConfig(max_workers=1, max_queue=0, timeout_s=0.05))
+    yield pool
+    pool.shutdown()
+
+
+def test_run_returns_the_result(pool):
+    assert pool.run(sum, [1, 2, 3]) == 6
+
+
+def test_full_pool_is_rejected(pool):
+    release = threading.Event()
+    with pytest.raises(InferenceTimeout):
+        pool.run(release.wait)
+    # The timed-out call still holds the only slot until it actually ends
+    with pytest.raises(PoolOverloaded):
+        pool.run(sum, [1])
+    release.set()
+    pool.shutdown()
+    assert pool.run(sum, [1], timeout=1) == 1
+
+
+def test_run_future_timeout_cancels_and_frees_the_slot(pool):
+    future = Future()
+    with pytest.raises(InferenceTimeout):
+        pool.run_future(lambda: future)
+    assert future.cancelled()
+    done = Future()
+    done.set_result(42)
+    assert pool.run_future(lambda: done) == 42
+
+
+def test_submit_error_frees_the_slot(pool):
+    def submit():
+        raise RuntimeError("queue closed")
+
+    with pytest.raises(RuntimeError):
+        pool.run_future(submit)
+    assert pool.run(sum, [2]) == 2
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("STARTUP_MODE", "lazy")
+    import app as app_module
+
+    def predict_survival(features, time_horizons, molecular=None):
+        wait.wait(1)
+        return np.zeros(len(features)), np.full((len(features), len(time_horizons)), 0.5)
+
+    wait = threading.Event()
+    wait.set()
+    pool = InferencePool(InferencePoolConfig(max_workers=1, max_queue=0, timeout_s=0.05))
+    services = SimpleNamespace(
+        predict_pipeline=SimpleNamespace(predict_survival=predict_survival),
+        model_registry=SimpleNamespace(version="test"),
+        inference_pool=pool,
+    )
+    monkeypatch.setattr(app_module, "_services", services)
+    yield app_module.app.test_client(), wait
+    wait.set()
+    pool.shutdown()
+
+
+PATIENT = dict(
+    BM_BLAST=5.0, WBC=4.0, ANC=2.0, MONOCYTES=0.3, HB=10.0, PLT=150.0, CENTER="CHU",
+    CYTOGENETICS="46,xy[20]", mutations=[dict(GENE="TP53", EFFECT="stop_gained", VAF=0.4)],
+)
+
+
+def test_api_returns_200_429_and_504(client):
+    client, wait = client
+    response = client.post("/api/v1/predict", json=PATIENT)
+    assert response.status_code == 200
+    assert response.get_json()["predictions"][0]["survival"] == {"3": 0.5}
+
+    # The only worker is busy: the request times out, then its slot is still held
+    wait.clear()
+    response = client.post("/api/v1/predict", json=PATIENT)
+    assert response.status_code == 504
+    assert response.get_json()["error"] == "timeout"
+
+    response = client.post("/api/v1/predict", json=PATIENT)
+    assert response.status_code == 429
+    assert response.get_json()["error"] == "overloaded"
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,48 @@
+import numpy as np
+from sksurv.metrics import (
+    brier_score, concordance_index_censored, concordance_index_ipcw, cumulative_dynamic_auc, integrated_brier_score
+)
+
+from src.components.model_evaluation import EvaluationStatistics, bootstrap_weights
+from src.utils import survival_at_horizons
+
+
+def _statistics(forest, survival_data):
+    X, y = survival_data
+    y_train, y_test = y[:200], y[200:]
+    event_time = y_test["time"]
+    horizons = list(np.quantile(event_time, [0.25, 0.5, 0.75]))
+    ibs_times = np.linspace(horizons[0], horizons[-1], 20)
+    risk_scores, survival = survival_at_horizons(forest, X[200:], np.concatenate([horizons, ibs_times]))
+    survival, ibs_survival = survival[:, :len(horizons)], survival[:, len(horizons):]
+    statistics = EvaluationStatistics(y_train, y_test, risk_scores, survival, horizons, ibs_times, ibs_survival)
+    return statistics, y_train, y_test, risk_scores, survival, horizons, ibs_times, ibs_survival
+
+
+def test_unit_weights_match_sksurv(forest, survival_data):
+    statistics, y_train, y_test, risk_scores, survival, horizons, ibs_times, ibs_survival = _statistics(
+        forest, survival_data
+    )
+    point = {name: values[0] for name, values in statistics.evaluate(np.ones((1, len(y_test)))).items()}
+
+    harrell = concordance_index_censored(y_test["event"], y_test["time"], risk_scores)[0]
+    uno = concordance_index_ipcw(y_train, y_test, risk_scores, tau=max(horizons))[0]
+    auc, _ = cumulative_dynamic_auc(y_train, y_test, risk_scores, horizons)
+    _, brier = brier_score(y_train, y_test, survival, horizons)
+    ibs = integrated_brier_score(y_train, y_test, ibs_survival, ibs_times)
+
+    np.testing.assert_allclose(point["harrell_c_index"], harrell)
+    np.testing.assert_allclose(point["uno_c_index"], uno)
+    np.testing.assert_allclose(point["auc"], auc)
+    np.testing.assert_allclose(point["brier_score"], brier)
+    np.testing.assert_allclose(point["integrated_brier_score"], ibs)
+
+
+def test_bootstrap_weights_are_draw_counts(forest, survival_data):
+    statistics, *_ = _statistics(forest, survival_data)
+    weights = bootstrap_weights(100, 7, np.random.default_rng(0))
+    assert weights.shape == (7, 100)
+    np.testing.assert_array_equal(weights.sum(1), 100)
+    metrics = statistics.evaluate(weights)
+    assert metrics["harrell_c_index"].shape == (7,)
+    assert metrics["auc"].shape == (7, 3)
@@ -0,0 +1,38 @@
+import threading
+
+from sklearn.preprocessing import StandardScaler
+
+from src.pipeline.model_registry import ModelRegistry, ModelRegistryConfig
+from src.utils import save_object
+
+
+def test_reload_runs_in_the_background(tmp_path, forest):
+    config = ModelRegistryConfig(
+        model_file_path=str(tmp_path / "model.pkl"), preprocessor_file_path=str(tmp_path / "preprocessor.pkl"),
+        engine_file_path=None, explainer_file_path=None, check_interval_seconds=0.0,
+    )
+    save_object(config.model_file_path, forest, artifact_format="mmap")
+    save_object(config.preprocessor_file_path, StandardScaler(), artifact_format="mmap")
+    registry = ModelRegistry(config)
+    first = registry.load()
+
+    # A new model file (other format, other digest) whose load blocks until released
+    save_object(config.model_file_path, forest, artifact_format="pickle")
+    release, loading = threading.Event(), threading.Event()
+    load_bundle = registry._load_bundle
+
+    def slow_load_bundle(*args):
+        loading.set()
+        release.wait(5)
+        return load_bundle(*args)
+
+    registry._load_bundle = slow_load_bundle
+
+    # The request that triggers the check gets the current bundle at once
+    assert registry.get() is first
+    assert loading.wait(5)
+    assert registry.get() is first
+
+    release.set()
+    registry._checker.join(5)
+    assert registry.get().version != first.version
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from src.pipeline.prediction_cache import FileCacheBackend, PredictionCache, PredictionCacheConfig
+
+FEATURES = pd.DataFrame(
+    {"BM_BLAST": [5.0, 5.0], "WBC": [4.0, 4.0], "ANC": [2.0, 2.0], "MONOCYTES": [0.3, 0.3], "HB": [10.0, 10.0],
+     "PLT": [150.0, 150.0], "Nmut": [1.0, 1.0], "CENTER": ["CHU", "CHU"], "CYTOGENETICS": ["46,xy[20]", None]},
+    index=["P0", "P1"],
+)
+MOLECULAR = pd.DataFrame({"ID": ["P0", "P1"], "GENE": ["TP53", "TET2"], "EFFECT": ["stop_gained"] * 2, "VAF": [0.4, 0.4]})
+
+
+def compute_counting(calls):
+    def compute(rows):
+        calls.append(len(rows))
+        return np.arange(len(rows), dtype=float), np.full((len(rows), 1), 0.5)
+    return compute
+
+
+def test_only_missing_rows_are_computed():
+    cache = PredictionCache(PredictionCacheConfig(backend="memory"))
+    calls = []
+    cache.get_or_compute(FEATURES, "v1", [3], compute_counting(calls), MOLECULAR)
+    risk, survival = cache.get_or_compute(FEATURES, "v1", [3], compute_counting(calls), MOLECULAR)
+    assert calls == [2]
+    assert risk.tolist() == [0.0, 1.0]
+    # Other mutations, horizons or model version: new keys
+    cache.get_or_compute(FEATURES, "v1", [3], compute_counting(calls), MOLECULAR.assign(VAF=0.41))
+    cache.get_or_compute(FEATURES, "v1", [1], compute_counting(calls), MOLECULAR)
+    cache.get_or_compute(FEATURES, "v2", [3], compute_counting(calls), MOLECULAR)
+    assert calls == [2, 2, 2, 2]
+    # A process-local cache is emptied on a model change
+    assert len(cache.backend) == 2
+
+
+def test_file_backend_trims_every_eviction_interval(tmp_path):
+    backend = FileCacheBackend(str(tmp_path / "cache.sqlite"), max_entries=5, ttl_seconds=60, eviction_interval=4)
+    for i in range(7):
+        backend.set(str(i), [float(i), [0.5]])
+    # Not trimmed yet at the 7th insert, trimmed at the 8th
+    assert backend._count() == 7
+    backend.set("7", [7.0, [0.5]])
+    assert backend._count() == len(backend) == 5
+    # Least recently used entries went first
+    assert backend.get("0") is None and backend.get("7") == [7.0, [0.5]]